@@ -1,40 +1,353 @@
-import os, json, hashlib
+import os, io, re, hashlib, asyncio, contextvars, struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
-from PIL import Image
-import imagehash
+
+from utils.run_store import RunLog
+from utils.tracing import span, traced
+
+# Off-loop workers shared by every run in the process (hashing, decoding, file writes)
+CAPTURE_WORKERS = int(os.getenv("CAPTURE_WORKERS", "4"))
+# Captures a single run may have in flight before the step loop waits (bounds memory)
+CAPTURE_MAX_PENDING = int(os.getenv("CAPTURE_MAX_PENDING", "8"))
+
+# "always" captures every step; "changed" only screenshots when the in-page DOM fingerprint changes
+CAPTURE_MODE = os.getenv("CAPTURE_MODE", "always")
+
+# Whole profile in one setting, "format[:quality][:full|viewport]" (overrides the three below)
+CAPTURE_PROFILE = os.getenv("CAPTURE_PROFILE", "")
+# Screenshot encoding: "png" (lossless, as captured), "png_opt" (lossless, recompressed),
+# "jpeg" (encoded by the browser) or "webp" (re-encoded in the capture worker)
+CAPTURE_FORMAT = os.getenv("CAPTURE_FORMAT", "png")
+CAPTURE_QUALITY = int(os.getenv("CAPTURE_QUALITY", "80"))
+# "full" captures the whole scrollable page, "viewport" only what is on screen
+CAPTURE_AREA = os.getenv("CAPTURE_AREA", "full")
+# Write a downscaled <name>.thumb.jpg next to every screenshot (0 disables)
+CAPTURE_THUMBNAILS = os.getenv("CAPTURE_THUMBNAILS", "1") != "0"
+
+# Width of the downscaled previews shown by the Streamlit app
+THUMBNAIL_WIDTH = int(os.getenv("THUMBNAIL_WIDTH", "320"))
+
+# WebP cannot store images taller or wider than this; such captures fall back to JPEG
+WEBP_MAX_SIDE = 16383
+
+_EXTENSIONS = {"png": ".png", "png_opt": ".png", "jpeg": ".jpg", "webp": ".webp"}
+
+
+@dataclass(frozen=True)
+class CaptureProfile:
+    """How screenshots are taken and stored for a run."""
+    format: str = "png"
+    quality: int = 80          # jpeg / webp only
+    full_page: bool = True
+    thumbnails: bool = True
+
+    def __post_init__(self):
+        if self.format not in _EXTENSIONS:
+            raise ValueError(f"Unknown capture format '{self.format}' (expected one of {', '.join(_EXTENSIONS)})")
+
+    @classmethod
+    def from_env(cls) -> "CaptureProfile":
+        if CAPTURE_PROFILE:
+            return cls.parse(CAPTURE_PROFILE)
+        return cls(CAPTURE_FORMAT, CAPTURE_QUALITY, CAPTURE_AREA != "viewport", CAPTURE_THUMBNAILS)
+
+    @classmethod
+    def parse(cls, spec: str) -> "CaptureProfile":
+        """`format[:quality][:full|viewport]`, e.g. "webp:75:viewport" or "png_opt"."""
+        fmt, *rest = spec.split(":")
+        quality, full_page = CAPTURE_QUALITY, CAPTURE_AREA != "viewport"
+        for part in rest:
+            if part.isdigit():
+                quality = int(part)
+            else:
+                full_page = part != "viewport"
+        return cls(fmt, quality, full_page, CAPTURE_THUMBNAILS)
+
+    @property
+    def name(self) -> str:
+        lossy = f"-q{self.quality}" if self.format in ("jpeg", "webp") else ""
+        return f"{self.format}{lossy}-{'full' if self.full_page else 'viewport'}"
+
+    def format_for(self, size) -> str:
+        """Format actually written for a capture of `size` (width, height) pixels."""
+        if self.format == "webp" and size and max(size) > WEBP_MAX_SIDE:
+            return "jpeg"
+        return self.format
+
+    def screenshot_options(self) -> dict:
+        # JPEG is encoded by the browser; every other format starts from its lossless PNG
+        if self.format == "jpeg":
+            return {"full_page": self.full_page, "type": "jpeg", "quality": self.quality}
+        return {"full_page": self.full_page, "type": "png"}
+
+    def encode(self, image, raw: bytes, fmt: str) -> bytes:
+        """Bytes to write for the decoded `image` (`raw` as returned by the browser)."""
+        if fmt == self.screenshot_options()["type"]:
+            return raw
+        out = io.BytesIO()
+        if fmt == "png_opt":
+            image.save(out, "PNG", optimize=True)
+        elif fmt == "webp":
+            image.save(out, "WEBP", quality=self.quality, method=4)
+        else:
+            image.convert("RGB").save(out, "JPEG", quality=self.quality, optimize=True)
+        return out.getvalue()
+
+
+def _png_size(data: bytes):
+    """(width, height) from a PNG's IHDR chunk without decoding it (None if not a PNG)."""
+    if data[:8] != b"\x89PNG\r\n\x1a\n" or len(data) < 24:
+        return None
+    return struct.unpack(">II", data[16:24])
+
+_executor = None
+
+# Structural fingerprint of the rendered DOM, computed in the page with one evaluate():
+# tags, classes, state attributes, form values and text, plus URL and scroll position.
+# Two 32-bit hashes (FNV-1a and djb2) are combined to keep collisions negligible.
+_FINGERPRINT_JS = """
+() => {
+    let fnv = 0x811c9dc5, djb = 5381;
+    const mix = (s) => {
+        for (let i = 0; i < s.length; i++) {
+            const c = s.charCodeAt(i);
+            fnv = Math.imul(fnv ^ c, 16777619) >>> 0;
+            djb = (Math.imul(djb, 33) + c) >>> 0;
+        }
+        fnv = Math.imul(fnv ^ 124, 16777619) >>> 0;
+    };
+    const root = document.body || document.documentElement;
+    const walker = document.createTreeWalker(root, NodeFilter.SHOW_ELEMENT | NodeFilter.SHOW_TEXT);
+    let nodes = 0;
+    for (let node = walker.currentNode; node; node = walker.nextNode()) {
+        if (node.nodeType === Node.TEXT_NODE) {
+            const text = node.nodeValue.trim();
+            if (text) mix(text);
+            continue;
+        }
+        nodes++;
+        mix(node.tagName);
+        for (const attr of ["class", "style", "hidden", "aria-hidden", "aria-expanded", "open", "disabled"]) {
+            const v = node.getAttribute(attr);
+            if (v !== null) mix(attr + "=" + v);
+        }
+        if (typeof node.value === "string") mix("value=" + node.value);
+        if (node.checked) mix("checked");
+    }
+    mix(location.href);
+    mix(String(Math.round(window.scrollY)));
+    return {
+        fingerprint: fnv.toString(16).padStart(8, "0") + djb.toString(16).padStart(8, "0"),
+        nodes: nodes,
+        url: location.href,
+        title: document.title,
+    };
+}
+"""
+
+
+async def page_state(page) -> dict:
+    """DOM fingerprint, URL and title of the page in one round trip (empty fingerprint if it cannot run)."""
+    try:
+        return await page.evaluate(_FINGERPRINT_JS)
+    except Exception:
+        return {"fingerprint": "", "nodes": 0, "url": page.url, "title": ""}
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=CAPTURE_WORKERS, thread_name_prefix="capture")
+    return _executor
+
 
 def _hash_dom(page_content: str) -> str:
     """Create a quick hash of the DOM to detect changes."""
     return hashlib.md5(page_content.encode("utf-8")).hexdigest()
 
-async def capture_state(page, step_idx: int, label: str, app_name: str, base_dir):
-    """Capture a screenshot + metadata for the current UI state."""
-    os.makedirs(base_dir, exist_ok=True)
 
-    # Screenshot path (single consistent folder)
-    img_path = base_dir / f"{step_idx:02d}_{label}.png"
-    await page.screenshot(path=img_path, full_page=True)
+def _safe_label(label: str) -> str:
+    """Labels embed selectors (e.g. a[href='#/completed']); keep them valid as file names."""
+    return re.sub(r'[\\/:*?"<>|\s]+', "_", label)[:80]
+
+
+def _thumbnail_bytes(image, width: int = THUMBNAIL_WIDTH) -> bytes:
+    from PIL import Image
+
+    height = max(1, round(image.height * width / image.width))
+    small = image.resize((width, height), Image.Resampling.LANCZOS) if image.width > width else image
+    out = io.BytesIO()
+    small.convert("RGB").save(out, "JPEG", quality=80)
+    return out.getvalue()
+
+
+def _process_capture(raw: bytes, html: str, img_path, meta: dict, record, profile: CaptureProfile) -> dict:
+    """
+    Worker half of a capture, all from memory: the screenshot is decoded once and that
+    image feeds the perceptual hash, the thumbnail and any re-encoding before the writes.
+    """
+    # PIL/imagehash are imported lazily
+    from PIL import Image
+    import imagehash
+
+    with span("capture.decode", "capture"):
+        image = Image.open(io.BytesIO(raw))
+        image.load()
+
+    with span("capture.hash", "capture"):
+        if html is not None:
+            meta["dom_hash"] = _hash_dom(html)
+        # Perceptual hash to catch near-duplicates
+        meta["phash"] = str(imagehash.phash(image))
+
+    with span("capture.encode", "capture", format=meta["format"]):
+        data = profile.encode(image, raw, meta["format"])
+        thumb = _thumbnail_bytes(image) if profile.thumbnails else None
+
+    with span("capture.write", "io", bytes=len(data)):
+        with open(img_path, "wb") as f:
+            f.write(data)
+        meta["bytes"] = len(data)
+        if thumb is not None:
+            thumb_path = img_path.with_name(img_path.stem + ".thumb.jpg")
+            with open(thumb_path, "wb") as f:
+                f.write(thumb)
+            meta["thumb"] = thumb_path.name
+        record(meta)
+    return meta
+
+
+def thumbnail(img_path, width: int = THUMBNAIL_WIDTH) -> bytes:
+    """Downscaled JPEG preview of a capture (for runs saved without .thumb.jpg files)."""
+    from PIL import Image
+
+    with Image.open(img_path) as im:
+        return _thumbnail_bytes(im, width)
 
-    # DOM + hash
-    html = await page.content()
-    dom_hash = _hash_dom(html)
 
-    # Perceptual hash to catch near-duplicates
-    phash = str(imagehash.phash(Image.open(img_path)))
+class CapturePipeline:
+    """
+    Per-run queue of capture jobs processed on the shared worker pool.
+    The step loop only awaits the browser-side work; submit() blocks only when
+    `max_pending` captures are already in flight. flush() waits for all of them.
+    """
+
+    def __init__(self, base_dir, max_pending=CAPTURE_MAX_PENDING, app_name: str = None, on_capture=None,
+                 profile: CaptureProfile = None):
+        self.base_dir = base_dir
+        self.profile = profile or CaptureProfile.from_env()
+        # Step records are appended to the run's steps.jsonl (and CSV summary) as captures land
+        self.run_log = RunLog(base_dir, app_name)
+        # Called with each step record once it is on disk (from a worker thread)
+        self.on_capture = on_capture
+        self.max_pending = max(1, max_pending)
+        self._pending = deque()
+        self.errors = []
+        # Change gating state: fingerprint and file of the last real screenshot
+        self.last_fingerprint = None
+        self.last_image = None
+        self.screenshots = 0
+        self.reused = 0
+
+    def record(self, meta: dict):
+        self.run_log.append(meta)
+        if self.on_capture is not None:
+            try:
+                self.on_capture(dict(meta))
+            except Exception as e:
+                print(f"[yellow] Capture listener failed: {e}[/yellow]")
+
+    async def submit(self, fn, *args):
+        while len(self._pending) >= self.max_pending:
+            await self._wait_oldest()
+        # Copy the context so worker-side spans land in this run's trace
+        ctx = contextvars.copy_context()
+        future = asyncio.get_running_loop().run_in_executor(_get_executor(), ctx.run, fn, *args)
+        self._pending.append(future)
+
+    async def _wait_oldest(self):
+        future = self._pending.popleft()
+        try:
+            await future
+        except Exception as e:
+            self.errors.append(e)
+            print(f"[red] Capture write failed: {e}[/red]")
+
+    async def flush(self):
+        """Wait until every submitted capture is hashed and on disk."""
+        with span("capture.flush", "capture", pending=len(self._pending)):
+            while self._pending:
+                await self._wait_oldest()
+            self.run_log.close()
+        if self.reused:
+            print(f"[blue] Captures: {self.screenshots} screenshot(s), {self.reused} unchanged step(s) reused an earlier one[/blue]")
+        written = self.bytes_written()
+        if self.screenshots:
+            print(f"[blue] Capture profile {self.profile.name}: {written / 1024:.0f} KB written, "
+                  f"{written / self.screenshots / 1024:.1f} KB per screenshot[/blue]")
+
+    def bytes_written(self) -> int:
+        """Screenshot bytes written so far (thumbnails not included)."""
+        return sum(row.get("bytes") or 0 for row in self.run_log.rows)
+
+
+@traced("capture_state", "capture")
+async def capture_state(page, step_idx: int, label: str, app_name: str, base_dir, pipeline: CapturePipeline = None,
+                        mode: str = None):
+    """
+    Capture a screenshot + metadata for the current UI state.
+    In "changed" mode (CAPTURE_MODE=changed) an in-page DOM fingerprint is taken first; if it
+    matches the previous capture, no screenshot or DOM transfer happens and the step's
+    metadata references the earlier image instead.
+    """
+    os.makedirs(base_dir, exist_ok=True)
+    mode = mode or CAPTURE_MODE
+
+    profile = pipeline.profile if pipeline is not None else CaptureProfile.from_env()
+    # Screenshot path (single consistent folder); the extension follows the capture profile
+    img_path = base_dir / f"{step_idx:02d}_{_safe_label(label)}"
 
     # Metadata
     meta = {
         "step": step_idx,
         "action": label,
         "timestamp": datetime.now().isoformat(),
-        "url": page.url,
-        "title": await page.title(),
-        "dom_hash": dom_hash,
-        "phash": phash,
     }
 
-    meta_path = img_path.with_suffix(".json")
-    with open(meta_path, "w") as f:
-        json.dump(meta, f, indent=2)
+    if mode == "changed" and pipeline is not None:
+        with span("capture.fingerprint", "browser"):
+            state = await page.evaluate(_FINGERPRINT_JS)
+        # dom_hash is reserved for the md5 of the HTML ("always" mode); the in-page fingerprint has its own field
+        meta.update({"url": state["url"], "title": state["title"], "dom_fingerprint": state["fingerprint"]})
+        if state["fingerprint"] == pipeline.last_fingerprint and pipeline.last_image is not None:
+            meta.update({"file": pipeline.last_image, "changed": False, "bytes": 0})
+            if profile.thumbnails:
+                meta["thumb"] = pipeline.last_image.rsplit(".", 1)[0] + ".thumb.jpg"
+            pipeline.reused += 1
+            await pipeline.submit(pipeline.record, meta)
+            print(f"Unchanged: step {step_idx} → {pipeline.last_image}")
+            return
+        html = None
+    else:
+        with span("capture.dom", "browser"):
+            meta.update({"url": page.url, "title": await page.title()})
+            html = await page.content()
+
+    # Browser-side work stays on the loop: screenshot bytes (and DOM in "always" mode)
+    with span("capture.screenshot", "browser", profile=profile.name):
+        raw = await page.screenshot(**profile.screenshot_options())
+    fmt = profile.format_for(_png_size(raw))
+    img_path = img_path.with_name(img_path.name + _EXTENSIONS[fmt])
+    meta.update({"file": img_path.name, "changed": True, "format": fmt})
+
+    if pipeline is not None:
+        pipeline.last_fingerprint = meta.get("dom_fingerprint")
+        pipeline.last_image = img_path.name
+        pipeline.screenshots += 1
+        await pipeline.submit(_process_capture, raw, html, img_path, meta, pipeline.record, profile)
+    else:
+        await asyncio.to_thread(_process_capture, raw, html, img_path, meta, RunLog(base_dir, app_name).append, profile)
 
     print(f"Captured: {img_path}")
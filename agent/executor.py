@@ -1,179 +1,251 @@
 # agent/executor.py
 import asyncio
+import json
 import os
 import re
+import time
+from dataclasses import dataclass
+from typing import List, Optional
 from rich import print
+from rich.table import Table
 from pathlib import Path
 from datetime import datetime
 
-from browser.playwright_setup import get_browser_context, save_cookies_and_state
-from agent.capture import capture_state
+from browser.playwright_setup import get_browser_context, save_cookies_and_state, seed_context
+from browser.session_snapshot import fork_session
+from agent.capture import capture_state, CapturePipeline, page_state
+from agent.selector_memory import get_selector_memory, resolve_locator
+from agent.waits import (settle, wait_for_count_below, wait_for_load, wait_for_target, wait_options,
+                         parse_duration_ms)
 from utils.dataset_summary import generate_summary
-from agent.planner import repair_plan
-from dsl.parser import load_dsl_from_dict
+from utils.catalog import get_catalog
+from utils.tracing import TRACE_FILE, begin_span, current_trace, ensure_trace, span
+from agent.planner import REPAIR_MODE, arepair_plan_tail, astream_plan, repair_plan
+from dsl.parser import infer_app_name, load_dsl_from_dict
+from dsl.optimizer import optimize_plan, optimize_step
 
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-
-async def execute_plan(
-    plan,
-    app_name="todomvc",
-    task_description=None,
-    repair_attempts=0,
-    max_repairs=3,
-):
-    """Execute DSL plan in browser with robust error handling and persistence."""
-
-    async_playwright, browser, context, page, cookie_path = await get_browser_context(app_name)
-
-    # ─────────────────────────────────────────────────────────────
-    # Dataset directory setup
-    # ─────────────────────────────────────────────────────────────
-    base_app_dir = Path(f"dataset/{app_name}")
-    base_app_dir.mkdir(parents=True, exist_ok=True)
-
-    def sanitize_name(text: str):
-        import re
-        text = re.sub(r"[^a-zA-Z0-9]+", "_", (text or "").lower()).strip("_")
-        return text[:60] if text else "run"
-
-    label = sanitize_name(task_description or getattr(plan, "task_description", "run"))
-    existing_runs = [p for p in base_app_dir.glob("run_*") if p.is_dir()]
-    next_index = len(existing_runs) + 1
-    base_dir = base_app_dir / f"run_{next_index:02d}_{label}"
-    base_dir.mkdir(parents=True, exist_ok=True)
-    print(f"[blue] Starting dataset capture: {base_dir}[/blue]")
-
-    # ─────────────────────────────────────────────────────────────
-    # LocalStorage persistence (per domain)
-    # ─────────────────────────────────────────────────────────────
-    domain = "demo.playwright.dev" if "todo" in app_name.lower() else "www.saucedemo.com"
-    storage_path = f"{os.path.expanduser('~')}/.softlight/localstorage/{domain}_storage.json"
-    os.makedirs(os.path.dirname(storage_path), exist_ok=True)
-
-    # Restore localStorage (after real navigation)
+# Keep a headed browser open this long after a run (0 closes it straight away)
+EXECUTOR_LINGER_MS = int(os.getenv("EXECUTOR_LINGER_MS", "0"))
+
+
+@dataclass
+class PlanRunResult:
+    """Outcome of executing one plan."""
+    task: str
+    app_name: str
+    run_dir: Optional[str]
+    status: str                 # "ok", "failed" (step error not repaired) or "error" (run crashed)
+    steps_total: int
+    steps_executed: int = 0
+    wall_time: float = 0.0
+    error: Optional[str] = None
+
+
+# ─────────────────────────────────────────────────────────────
+# Dataset directory setup
+# ─────────────────────────────────────────────────────────────
+def allocate_run_dir(app_name: str, task_description=None, steps_total=None) -> Path:
+    """
+    Claim the next dataset/<app>/run_NN_<label> directory.
+    The run catalog hands out numbers atomically, so concurrent runs never share a folder.
+    """
+    return get_catalog().allocate_run(app_name, task_description, steps_total)
+
+
+def record_run(result: PlanRunResult):
+    """Store a finished run's status, step count and timing in the catalog."""
+    if result.run_dir:
+        get_catalog().finish_run(result.run_dir, result.status, result.steps_executed, result.wall_time, result.error)
+
+
+# ─────────────────────────────────────────────────────────────
+#  Execute each DSL step
+# ─────────────────────────────────────────────────────────────
+async def _run_steps(page, plan, app_name, base_dir, repair_attempts=0, max_repairs=3, incoming=None,
+                     on_progress=None):
+    """
+    Run the plan on `page`, capturing every step. Returns (steps executed, last unrepaired error).
+    With `incoming` (a StepStream), steps still being generated are appended to `plan` as they arrive.
+    `on_progress(event, data)` receives a "capture" event with each step record once it is on disk.
+    """
+    on_capture = (lambda meta: on_progress("capture", meta)) if on_progress is not None else None
+    # Hashing and disk writes for captures run off the event loop; flushed before returning
+    pipeline = CapturePipeline(base_dir, app_name=app_name, on_capture=on_capture)
     try:
-        if os.path.exists(storage_path):
-            with open(storage_path, "r") as f:
-                local_data = f.read().strip()
-            if local_data:
-                start_url = (
-                    "https://demo.playwright.dev/todomvc"
-                    if "todo" in app_name.lower()
-                    else "https://www.saucedemo.com/"
-                )
-                await page.goto(start_url)
-                await page.evaluate(f"""
-                    () => {{
-                        const data = {local_data};
-                        for (const [k,v] of Object.entries(data)) {{
-                            localStorage.setItem(k, v);
-                        }}
-                    }}
-                """)
-                await page.reload()
-                print(f"[green] Restored localStorage for {app_name}[/green]")
-    except Exception as e:
-        print(f"[yellow] Failed to restore localStorage: {e}[/yellow]")
-
-    # ─────────────────────────────────────────────────────────────
-    #  Special handling for SauceDemo (reset stale sessions)
-    # ─────────────────────────────────────────────────────────────
-    if "sauce" in app_name.lower():
+        return await _run_step_loop(page, plan, app_name, base_dir, pipeline, repair_attempts, max_repairs, incoming)
+    finally:
+        await pipeline.flush()
+        memory = get_selector_memory()
+        # Snapshot on the loop, where pooled runs mutate the entries; only the write is off-loop
+        snapshot = memory.snapshot() if memory is not None else None
+        if snapshot is not None:
+            try:
+                memory.adopt(await asyncio.to_thread(memory.write, *snapshot))
+            except Exception as e:
+                memory.restore(snapshot)
+                print(f"[yellow] Could not save selector memory: {e}[/yellow]")
+
+
+def _optimize(plan):
+    """Run the dsl.optimizer passes and log every rewrite."""
+    plan, rewrites = optimize_plan(plan)
+    for rewrite in rewrites:
+        print(f"[magenta] optimizer: {rewrite}[/magenta]")
+    return plan
+
+
+class StepStream:
+    """Steps of a plan that is still being generated, handed from the planner to the executor through a queue."""
+
+    def __init__(self, steps):
+        self.queue = asyncio.Queue()
+        self.done = False
+        self.error = None
+        self._producer = asyncio.create_task(self._produce(steps))
+
+    async def _produce(self, steps):
         try:
-            await page.goto("https://www.saucedemo.com/")
-            await page.wait_for_selector("#user-name", timeout=10000)
-            await page.evaluate("localStorage.clear()")
-            await page.wait_for_timeout(500)
-            print("[blue] Cleared stale session for SauceDemo and ready at login screen[/blue]")
+            async for step in steps:
+                await self.queue.put(step)
         except Exception as e:
-            print(f"[yellow] Could not reset SauceDemo session: {e}[/yellow]")
-
-    # ─────────────────────────────────────────────────────────────
-    #  Execute each DSL step
-    # ─────────────────────────────────────────────────────────────
+            self.error = f"{type(e).__name__}: {e}"
+            print(f"[red] Plan stream failed: {e}[/red]")
+        finally:
+            await self.queue.put(None)
+
+    async def next_into(self, plan) -> bool:
+        """Wait for the next step and append it to `plan`; False once the stream has ended."""
+        if self.done:
+            return False
+        step = await self.queue.get()
+        if step is None:
+            self.done = True
+            return False
+        plan.append(optimize_step(step))
+        return True
+
+    async def drain_into(self, plan):
+        while await self.next_into(plan):
+            pass
+
+    async def aclose(self):
+        if not self._producer.done():
+            self._producer.cancel()
+            await asyncio.gather(self._producer, return_exceptions=True)
+
+
+async def _run_step_loop(page, plan, app_name, base_dir, pipeline, repair_attempts, max_repairs, incoming=None):
     step_index = 0
-    while step_index < len(plan):
+    steps_executed = 0
+    error = None
+    while step_index < len(plan) or (incoming is not None and await incoming.next_into(plan)):
         step = plan[step_index]
         action = (step.action or "").strip().lower()
         target = (step.target or "").strip()
         value = (step.value or "").strip()
 
         print(f"[cyan]{step_index + 1}. Executing:[/cyan] {action} → {target or ''} {value or ''}")
-
-        # Normalize selectors BEFORE action branching
-        if action in {"find_and_click", "expect", "fill"}:
-            target = target.strip().replace("BUTTON:", "button:").replace("A.", "a.")
-            target = target.replace(":HAS-TEXT", ":has-text")
+        end_step = begin_span(f"step {step_index + 1}: {action}", "step", target=target)
 
         try:
             # ---------- OPEN ----------
             if action == "open":
                 try:
-                    await page.goto(target, wait_until="domcontentloaded", timeout=60000)
-                    await page.wait_for_timeout(1500)
+                    opts = wait_options(step, timeout=60000)
+                    with span("navigate", "browser", url=target):
+                        await page.goto(target, wait_until=opts.wait_until, timeout=opts.timeout)
+                        await wait_for_load(page, "load", timeout=min(opts.timeout, 10000))
+                    await settle(page, opts)
                     print(f"[green]Opened {target}[/green]")
                 except Exception as e:
                     print(f"[red] Failed to open {target}: {e}[/red]")
-                await capture_state(page, step_index + 1, "open", app_name, base_dir)
+                await capture_state(page, step_index + 1, "open", app_name, base_dir, pipeline)
 
             # ---------- FIND AND CLICK ----------
             elif action == "find_and_click":
                 try:
-                    locator = page.locator(target)
-                    if not await locator.count():
-                        locator = page.get_by_text(target.strip().replace("'", "").replace('"', ""))
-                    if not await locator.count():
+                    locator = await resolve_locator(page, app_name, target, [
+                        ("css", target),
+                        ("text", target.strip().replace("'", "").replace('"', "")),
+                    ])
+                    if locator is None:
                         print(f"[yellow] Element not found for '{target}'. Skipping.[/yellow]")
                     else:
+                        opts = wait_options(step, timeout=5000)
                         await locator.first.scroll_into_view_if_needed()
-                        await locator.first.click(timeout=5000)
+                        await locator.first.click(timeout=opts.timeout)
+                        await settle(page, opts)
                         print(f"[green]Clicked '{target}'[/green]")
                 except Exception as e:
                     print(f"[red] Click failed for '{target}': {e}[/red]")
-                await capture_state(page, step_index + 1, f"click_{target}", app_name, base_dir)
+                await capture_state(page, step_index + 1, f"click_{target}", app_name, base_dir, pipeline)
 
             # ---------- FILL ----------
             elif action == "fill":
                 try:
                     locator = page.locator(target if target else "input.new-todo, input, textarea").first
-                    if await locator.count():
+                    batch = (step.extra or {}).get("batch")
+                    if await locator.count() and batch:
+                        # Optimizer-merged fill + press pairs: one lookup, one capture
+                        for item in batch:
+                            await locator.fill(item)
+                            await locator.press(step.extra.get("submit", "Enter"))
+                        # The merged presses would each have settled; settle once before the capture
+                        await settle(page, wait_options(step))
+                        print(f"[green]Filled and submitted {len(batch)} values in '{target}'[/green]")
+                    elif await locator.count():
                         await locator.fill(value)
                         print(f"[green]Filled '{target}' with '{value}'[/green]")
                     else:
                         print(f"[yellow] No input field found for '{target}'[/yellow]")
                 except Exception as e:
                     print(f"[red] Fill failed: {e}[/red]")
-                await capture_state(page, step_index + 1, f"fill_{target}", app_name, base_dir)
+                await capture_state(page, step_index + 1, f"fill_{target}", app_name, base_dir, pipeline)
 
             # ---------- PRESS ----------
             elif action == "press":
                 try:
                     key = target.capitalize() if target else "Enter"
                     await page.keyboard.press(key)
+                    await settle(page, wait_options(step))
                     print(f"[green]Pressed {key}[/green]")
                 except Exception as e:
                     print(f"[red] Press failed: {e}[/red]")
-                await capture_state(page, step_index + 1, f"press_{target}", app_name, base_dir)
+                await capture_state(page, step_index + 1, f"press_{target}", app_name, base_dir, pipeline)
 
             # ---------- EXPECT ----------
             elif action == "expect":
                 try:
-                    locator = page.locator(target)
-                    if not await locator.count():
-                        locator = page.get_by_text(target)
-                    if await locator.count():
+                    if (step.extra or {}).get("wait"):
+                        # wait_for merged into this expect by the optimizer
+                        opts = wait_options(step)
+                        await wait_for_target(page, target, opts.state, opts.timeout)
+                    locator = await resolve_locator(page, app_name, target, [("css", target), ("text", target)])
+                    if locator is not None:
                         print(f"[green] Verified visible: '{target}'[/green]")
                     else:
                         print(f"[yellow] Expect failed — '{target}' not found[/yellow]")
                 except Exception as e:
                     print(f"[red] Expect lookup error for '{target}': {e}[/red]")
-                await capture_state(page, step_index + 1, f"expect_{target}", app_name, base_dir)
+                await capture_state(page, step_index + 1, f"expect_{target}", app_name, base_dir, pipeline)
 
             # ---------- WAIT ----------
             elif action == "wait_for":
-                await page.wait_for_timeout(1000)
-                print(f"[yellow]Waited briefly ({target or '1s'})[/yellow]")
+                opts = wait_options(step)
+                duration = parse_duration_ms(target)
+                if not target:
+                    await settle(page, opts)
+                    print("[green]Page settled[/green]")
+                elif duration is not None:
+                    # The plan asked for an explicit pause
+                    await page.wait_for_timeout(min(duration, opts.timeout))
+                    print(f"[yellow]Waited {duration} ms[/yellow]")
+                elif await wait_for_target(page, target, opts.state, opts.timeout):
+                    print(f"[green]'{target}' is {opts.state}[/green]")
+                else:
+                    print(f"[yellow] Timed out after {opts.timeout} ms waiting for '{target}' to be {opts.state}[/yellow]")
 
             # ---------- MARK COMPLETED ----------
             elif action == "mark_completed" and app_name == "todomvc":
@@ -187,7 +259,7 @@ async def execute_plan(
                         print(f"[yellow] Todo '{target}' not found to mark complete[/yellow]")
                 except Exception as e:
                     print(f"[red] mark_completed failed: {e}[/red]")
-                await capture_state(page, step_index + 1, f"mark_{target}", app_name, base_dir)
+                await capture_state(page, step_index + 1, f"mark_{target}", app_name, base_dir, pipeline)
 
             # ---------- DELETE TODO ----------
             elif action == "delete_todo" and app_name == "todomvc":
@@ -202,7 +274,7 @@ async def execute_plan(
                         print(f"[yellow] Todo '{target}' not found to delete[/yellow]")
                 except Exception as e:
                     print(f"[red] delete_todo failed: {e}[/red]")
-                await capture_state(page, step_index + 1, f"delete_{target}", app_name, base_dir)
+                await capture_state(page, step_index + 1, f"delete_{target}", app_name, base_dir, pipeline)
 
             # ---------- CLEAR COMPLETED ----------
             elif action == "clear_completed" and app_name == "todomvc":
@@ -221,30 +293,46 @@ async def execute_plan(
                                 await item.hover()
                                 destroy_btn = item.locator("button.destroy")
                                 await destroy_btn.click()
-                                await page.wait_for_timeout(300)
+                                await wait_for_count_below(page, "ul.todo-list li", count - i)
                             print(f"[green] Deleted {count} todos manually[/green]")
                         else:
                             print(f"[blue] No todos to delete[/blue]")
                 except Exception as e:
                     print(f"[red] clear_completed failed: {e}[/red]")
-                await capture_state(page, step_index + 1, "clear_completed", app_name, base_dir)
+                await capture_state(page, step_index + 1, "clear_completed", app_name, base_dir, pipeline)
 
             # ---------- UNKNOWN ----------
             else:
                 print(f"[yellow] Unknown action '{action}', skipping...[/yellow]")
 
             step_index += 1
+            steps_executed += 1
+            end_step(status="ok")
 
         except Exception as e:
             print(f"[red]Step failed: {action} → {target} | {e}[/red]")
-            await capture_state(page, step_index + 1, f"error_{action}", app_name, base_dir)
+            error = f"step {step_index + 1} ({action}): {e}"
+            await capture_state(page, step_index + 1, f"error_{action}", app_name, base_dir, pipeline)
+            end_step(status="error")
+            if incoming is not None:
+                # A repair rewrites the rest of the plan, so it needs all of it
+                await incoming.drain_into(plan)
             if repair_attempts < max_repairs:
                 print(f"[yellow] Attempting plan repair ({repair_attempts + 1}/{max_repairs})...[/yellow]")
+                # Count every attempt, so a repair that returns nothing cannot loop forever
+                repair_attempts += 1
                 try:
-                    new_plan = repair_plan(step, str(e), plan)
+                    if REPAIR_MODE == "full":
+                        # Legacy: regenerate the whole plan (kept off the event loop)
+                        new_plan = await asyncio.to_thread(repair_plan, step, str(e), plan)
+                        new_plan = _optimize(new_plan) if new_plan else None
+                    else:
+                        # Patch the failing step and the rest; the completed prefix is kept as is
+                        tail = await arepair_plan_tail(plan, step_index, e, await page_state(page))
+                        new_plan = list(plan[:step_index]) + _optimize(tail) if tail else None
                     if new_plan and new_plan != plan:
                         plan = new_plan
-                        repair_attempts += 1
+                        error = None
                         print("[cyan] Retrying repaired plan...[/cyan]")
                         continue
                 except Exception as re:
@@ -254,31 +342,244 @@ async def execute_plan(
                 print(f"[red] Max repair attempts reached, aborting further repairs.[/red]")
                 break
 
-    # ─────────────────────────────────────────────────────────────
-    #  Wrap up & persist state
-    # ─────────────────────────────────────────────────────────────
-    print("[cyan]Execution complete — check logs for warnings or expectations.[/cyan]")
+    return steps_executed, error
 
-    # Save localStorage snapshot
-    try:
-        local_data = await page.evaluate("() => Object.fromEntries(Object.entries(localStorage))")
-        with open(storage_path, "w") as f:
-            import json
-            json.dump(local_data, f)
-        print(f"[blue] localStorage saved to {storage_path}[/blue]")
-    except Exception as e:
-        print(f"[yellow] Failed to save localStorage: {e}[/yellow]")
 
-    await save_cookies_and_state(context, app_name, cookie_path)
-    await page.wait_for_timeout(5000)
-    await browser.close()
-    await async_playwright.stop()
+
+async def _wrap_up(async_playwright, browser, context, page, app_name, state_version, base_dir):
+    """Persist state, close the browser and write the dataset summary."""
+    print("[cyan]Execution complete — check logs for warnings or expectations.[/cyan]")
+
+    with span("state.save", "io"):
+        await save_cookies_and_state(context, app_name, state_version)
+    if EXECUTOR_LINGER_MS:
+        await page.wait_for_timeout(EXECUTOR_LINGER_MS)
+    with span("browser.close", "browser"):
+        # Closing the context first flushes a HAR being recorded (NETWORK_MODE=record)
+        await context.close()
+        await browser.close()
+        await async_playwright.stop()
 
     generate_summary(base_dir)
     print(f"[green] Dataset summary generated at: {base_dir}/dataset_summary.csv[/green]")
 
 
+async def execute_plan(
+    plan,
+    app_name="todomvc",
+    task_description=None,
+    repair_attempts=0,
+    max_repairs=3,
+    pool=None,
+):
+    """Execute DSL plan in browser with robust error handling and persistence."""
+    if pool is not None:
+        return await execute_pooled(pool, plan, app_name, task_description, max_repairs)
+
+    with ensure_trace() as trace:
+        started = time.perf_counter()
+        plan = _optimize(plan)
+
+        # Saved cookies/localStorage are seeded into the context itself; no extra page loads
+        with span("browser.launch", "browser"):
+            async_playwright, browser, context, page, state_version = await get_browser_context(app_name)
+        with span("session.fork", "browser"):
+            plan, _ = await fork_session(context, app_name, plan)
+
+        base_dir = allocate_run_dir(app_name, task_description or getattr(plan, "task_description", "run"), len(plan))
+        print(f"[blue] Starting dataset capture: {base_dir}[/blue]")
+
+        steps_executed, error = await _run_steps(page, plan, app_name, base_dir, repair_attempts, max_repairs)
+
+        await _wrap_up(async_playwright, browser, context, page, app_name, state_version, base_dir)
+
+        result = PlanRunResult(
+            task=task_description or "",
+            app_name=app_name,
+            run_dir=str(base_dir),
+            status="failed" if error else "ok",
+            steps_total=len(plan),
+            steps_executed=steps_executed,
+            wall_time=time.perf_counter() - started,
+            error=error,
+        )
+        record_run(result)
+        trace.save(base_dir / TRACE_FILE)
+    return result
+
+
+async def _close_quietly(context, browser, async_playwright):
+    for close in (getattr(context, "close", None), getattr(browser, "close", None), getattr(async_playwright, "stop", None)):
+        if close is not None:
+            try:
+                await close()
+            except Exception:
+                pass
+
+
+async def execute_streamed(steps, app_name=None, task_description=None, max_repairs=3) -> PlanRunResult:
+    """
+    Execute a plan while it is still being generated. `steps` is an async iterator of
+    DSLActions (agent.planner.astream_plan): the browser launches while the planner
+    retrieves and prompts, and each step runs as soon as its YAML item is complete.
+    Whole-plan optimizer passes and session forking need the full plan and are skipped.
+    """
+    with ensure_trace() as trace:
+        started = time.perf_counter()
+        incoming = StepStream(steps)
+        plan = []
+        async_playwright = browser = context = None
+        try:
+            if app_name is None:
+                # Unknown app: its first step (normally the `open`) decides which state to seed
+                await incoming.next_into(plan)
+                app_name = infer_app_name(plan)
+
+            with span("browser.launch", "browser"):
+                async_playwright, browser, context, page, state_version = await get_browser_context(app_name)
+            base_dir = allocate_run_dir(app_name, task_description or "run")
+            print(f"[blue] Starting dataset capture: {base_dir}[/blue]")
+
+            steps_executed, error = await _run_steps(page, plan, app_name, base_dir, 0, max_repairs, incoming)
+            error = error or incoming.error or (None if plan else "planner produced no steps")
+        except BaseException:
+            # The run cannot be wrapped up: close whatever was opened and let the real error through
+            await _close_quietly(context, browser, async_playwright)
+            raise
+        finally:
+            await incoming.aclose()
+
+        await _wrap_up(async_playwright, browser, context, page, app_name, state_version, base_dir)
+
+        result = PlanRunResult(
+            task=task_description or "",
+            app_name=app_name,
+            run_dir=str(base_dir),
+            status="failed" if error else "ok",
+            steps_total=len(plan),
+            steps_executed=steps_executed,
+            wall_time=time.perf_counter() - started,
+            error=error,
+        )
+        record_run(result)
+        trace.save(base_dir / TRACE_FILE)
+    return result
+
+
+# ─────────────────────────────────────────────────────────────
+#  Pooled / concurrent execution on shared Chromium
+# ─────────────────────────────────────────────────────────────
+async def _execute_on_context(context, page, plan, app_name, task_description, max_repairs=3, on_progress=None,
+                              state_version=None):
+    """Run one plan on a borrowed context; its state is saved to the run folder and the state store."""
+    started = time.perf_counter()
+    plan = _optimize(plan)
+    result = PlanRunResult(task=task_description or "", app_name=app_name, run_dir=None,
+                           status="error", steps_total=len(plan))
+    try:
+        with span("session.fork", "browser"):
+            plan, _ = await fork_session(context, app_name, plan)
+        result.steps_total = len(plan)
+        base_dir = await asyncio.to_thread(allocate_run_dir, app_name, task_description, len(plan))
+        result.run_dir = str(base_dir)
+        print(f"[blue] Starting dataset capture: {base_dir}[/blue]")
+        if on_progress is not None:
+            on_progress("run_started", {"run_dir": result.run_dir, "steps_total": result.steps_total})
+
+        result.steps_executed, result.error = await _run_steps(page, plan, app_name, base_dir, 0, max_repairs,
+                                                               on_progress=on_progress)
+        result.status = "failed" if result.error else "ok"
+
+        with span("state.save", "io"):
+            await context.storage_state(path=str(base_dir / "storage_state.json"))
+            try:
+                await save_cookies_and_state(context, app_name, state_version)
+            except Exception as e:
+                print(f"[yellow] Could not save state for {app_name}: {e}[/yellow]")
+        await asyncio.to_thread(generate_summary, base_dir)
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+        print(f"[red] Run failed for '{task_description}': {e}[/red]")
+    finally:
+        result.wall_time = time.perf_counter() - started
+    await asyncio.to_thread(record_run, result)
+    trace = current_trace()
+    if trace is not None and result.run_dir:
+        await asyncio.to_thread(trace.save, Path(result.run_dir) / TRACE_FILE)
+    return result
+
+
+async def execute_pooled(pool, plan, app_name, task_description=None, max_repairs=3, on_progress=None) -> PlanRunResult:
+    """
+    Execute one plan on a warm context borrowed from a browser.pool.BrowserPool.
+    `on_progress(event, data)` is told when the run folder is allocated ("run_started")
+    and when each step's capture is written ("capture"; called from a capture worker thread).
+    """
+    with ensure_trace():
+        acquiring = begin_span("pool.acquire", "browser")
+        async with pool.acquire() as lease:
+            acquiring(slot=lease.slot)
+            with span("context.seed", "browser"):
+                state_version = await seed_context(lease.context, app_name)
+            return await _execute_on_context(lease.context, lease.page, load_dsl_from_dict(plan),
+                                             app_name, task_description, max_repairs, on_progress, state_version)
+
+
+async def execute_plans(jobs, max_workers=4, headless=True, max_repairs=3, pool=None) -> List[PlanRunResult]:
+    """
+    Execute many plans concurrently as isolated BrowserContexts of shared Chromium.
+    `jobs` is a list of (plan, app_name, task_description); at most `max_workers` run at once.
+    Without a `pool`, a temporary one with a single browser is started for the batch.
+    """
+    from browser.pool import BrowserPool
+
+    started = time.perf_counter()
+    own_pool = pool is None
+    if own_pool:
+        pool = await BrowserPool(browsers=1, contexts=max_workers, headless=headless).start()
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+
+    async def worker(plan, app_name, task_description):
+        async with semaphore:
+            return await execute_pooled(pool, plan, app_name, task_description, max_repairs)
+
+    try:
+        results = await asyncio.gather(*(worker(*job) for job in jobs))
+        metrics = pool.metrics()
+    finally:
+        if own_pool:
+            await pool.close()
+
+    print_run_report(results, time.perf_counter() - started)
+    print(f"[cyan] Pool: {metrics['acquisitions']} acquisitions, "
+          f"acquire p50 {metrics['acquire_ms_p50']:.1f} ms / p95 {metrics['acquire_ms_p95']:.1f} ms[/cyan]")
+    return results
+
+
+def print_run_report(results: List[PlanRunResult], total_time: float):
+    table = Table(title=f"{len(results)} plan(s) in {total_time:.1f}s")
+    for col in ("Task", "App", "Status", "Steps", "Wall time (s)", "Run folder"):
+        table.add_column(col)
+    for r in results:
+        colour = "green" if r.status == "ok" else "red"
+        table.add_row(r.task[:50], r.app_name, f"[{colour}]{r.status}[/{colour}]",
+                      f"{r.steps_executed}/{r.steps_total}", f"{r.wall_time:.1f}", r.run_dir or "-")
+    print(table)
+    if results and total_time > 0:
+        print(f"[cyan] Throughput: {len(results) / total_time * 60:.1f} plans/minute[/cyan]")
+
+
 def run_executor(plan_data, app_name="todomvc", task_description=None):
     """Helper to launch async executor from synchronous main.py."""
     plan = load_dsl_from_dict(plan_data)
-    asyncio.run(execute_plan(plan, app_name, task_description))
+    return asyncio.run(execute_plan(plan, app_name, task_description))
+
+
+def run_executor_streamed(task, app_name=None, base_url=None):
+    """Plan and execute `task` with the plan streamed into the running executor."""
+    return asyncio.run(execute_streamed(astream_plan(task, base_url), app_name, task_description=task))
+
+
+def run_executor_batch(jobs, max_workers=4, headless=True):
+    """Synchronous wrapper around execute_plans."""
+    return asyncio.run(execute_plans(jobs, max_workers=max_workers, headless=headless))
@@ -0,0 +1,193 @@
+# agent/jobs.py
+"""
+In-process job queue for interactive front ends (the Streamlit app).
+
+Tasks are submitted without blocking and run by a fixed set of workers on the
+BrowserPoolService event loop: planning goes through the async planner and
+execution borrows a warm context from the shared pool, so the retriever model,
+plan cache and browsers stay loaded across jobs and sessions. Each Job is
+updated in place as it runs (status, run folder and one record per captured
+step), so callers can poll it for live progress.
+"""
+import asyncio
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import List, Optional
+
+from rich import print
+
+from browser.pool import BROWSER_POOL_CONTEXTS
+from utils.tracing import ensure_trace, span
+
+# Jobs running at once; more than the pool has contexts would only wait in pool.acquire()
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", str(BROWSER_POOL_CONTEXTS)))
+# Finished jobs kept for display before the oldest are forgotten
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "200"))
+
+DONE_STATUSES = ("ok", "failed", "error")
+
+
+@dataclass
+class Job:
+    """One submitted task and its progress."""
+    id: str
+    task: str
+    owner: Optional[str] = None          # e.g. the Streamlit session that submitted it
+    status: str = "queued"               # queued, planning, running, then ok / failed / error
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    plan_source: Optional[str] = None    # "template", "cache", "semantic" or "llm"
+    app_name: Optional[str] = None
+    run_dir: Optional[str] = None
+    steps_total: int = 0
+    captures: List[dict] = field(default_factory=list)   # step records, in the order they were written
+    error: Optional[str] = None
+    result: object = None                # PlanRunResult once execution has finished
+
+    @property
+    def done(self) -> bool:
+        return self.status in DONE_STATUSES
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class JobQueue:
+    """
+    FIFO of Jobs served by `workers` coroutines on the pool service's loop.
+    Safe to call from any thread; get() and jobs() return snapshots.
+    """
+
+    def __init__(self, service, workers: int = JOB_WORKERS, history: int = JOB_HISTORY):
+        self.service = service
+        self.history = max(1, history)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._queue = asyncio.Queue()
+        self._workers = []
+        self.service.submit(self._start(max(1, workers)))
+
+    async def _start(self, workers: int):
+        # Load the retriever model before taking jobs, off the loop so pooled runs are not blocked
+        try:
+            from rag.retriever import get_retriever
+            await asyncio.to_thread(get_retriever)
+        except Exception as e:
+            print(f"[yellow] Retriever warm-up failed ({e}); it will load with the first LLM-planned job[/yellow]")
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(workers)]
+        print(f"[green] Job queue ready: {workers} worker(s)[/green]")
+
+    # ─────────────────────────────────────────────
+    # Caller side (any thread)
+    # ─────────────────────────────────────────────
+    def submit(self, task: str, owner: Optional[str] = None) -> Job:
+        """Queue `task` and return straight away."""
+        job = Job(id=f"job-{next(self._ids):04d}", task=task, owner=owner)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._forget_finished()
+        self.service.loop.call_soon_threadsafe(self._queue.put_nowait, job)
+        return self._snapshot(job)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job is not None else None
+
+    def jobs(self, owner: Optional[str] = None) -> List[Job]:
+        """Snapshots of known jobs, oldest first (only `owner`'s when given)."""
+        with self._lock:
+            return [self._snapshot(j) for j in self._jobs.values() if owner is None or j.owner == owner]
+
+    def position(self, job_id: str) -> int:
+        """Jobs queued ahead of `job_id` (0 once it has started)."""
+        with self._lock:
+            ahead = 0
+            for job in self._jobs.values():
+                if job.id == job_id:
+                    return ahead if job.status == "queued" else 0
+                ahead += job.status == "queued"
+        return 0
+
+    def metrics(self) -> dict:
+        with self._lock:
+            statuses = [j.status for j in self._jobs.values()]
+        return {
+            "workers": len(self._workers),
+            "queued": statuses.count("queued"),
+            "active": statuses.count("planning") + statuses.count("running"),
+            "finished": sum(s in DONE_STATUSES for s in statuses),
+        }
+
+    def close(self):
+        for worker in self._workers:
+            self.service.loop.call_soon_threadsafe(worker.cancel)
+
+    def _snapshot(self, job: Job) -> Job:
+        # The caller's copy must not change under it while the worker keeps appending captures
+        return replace(job, captures=list(job.captures))
+
+    def _forget_finished(self):
+        finished = [j.id for j in self._jobs.values() if j.done]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    # ─────────────────────────────────────────────
+    # Worker side (pool loop)
+    # ─────────────────────────────────────────────
+    def _update(self, job: Job, **changes):
+        with self._lock:
+            for name, value in changes.items():
+                setattr(job, name, value)
+
+    def _progress(self, job: Job, event: str, data: dict):
+        """execute_pooled callback; "capture" events arrive from the capture worker threads."""
+        with self._lock:
+            if event == "run_started":
+                job.run_dir = data["run_dir"]
+                job.steps_total = data["steps_total"]
+            elif event == "capture":
+                job.captures.append(data)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except Exception as e:
+                self._update(job, status="error", error=f"{type(e).__name__}: {e}")
+            finally:
+                self._update(job, finished_at=time.time())
+                self._queue.task_done()
+
+    async def _run(self, job: Job):
+        from agent.executor import execute_pooled
+        from agent.planner import agenerate_plans
+        from dsl.parser import infer_app_name
+
+        self._update(job, status="planning", started_at=time.time())
+        print(f"[cyan] {job.id}: planning '{job.task}'[/cyan]")
+        with ensure_trace():
+            with span("plan", "plan", job=job.id):
+                planned = (await agenerate_plans([job.task]))[0]
+            if planned.plan is None:
+                self._update(job, status="error", error=planned.error or "planner returned no plan")
+                return
+            app_name = infer_app_name(planned.plan)
+            self._update(job, status="running", plan_source=planned.source, app_name=app_name,
+                         steps_total=len(planned.plan))
+
+            result = await execute_pooled(self.service.pool, planned.plan, app_name, job.task,
+                                          on_progress=lambda event, data: self._progress(job, event, data))
+        self._update(job, status=result.status, result=result, error=result.error,
+                     run_dir=result.run_dir or job.run_dir)
+        print(f"[cyan] {job.id}: {result.status} in {job.elapsed:.1f}s[/cyan]")
@@ -0,0 +1,354 @@
+# agent/plan_cache.py
+import asyncio
+import atexit
+import functools
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+PLAN_CACHE_PATH = Path(os.getenv("PLAN_CACHE_PATH", Path.home() / ".softlight" / "plan_cache.json"))
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "500"))
+PLAN_CACHE_TTL_HOURS = float(os.getenv("PLAN_CACHE_TTL_HOURS", str(24 * 7)))
+# Cosine similarity above which a near-duplicate task may reuse a cached plan
+PLAN_CACHE_SIM_THRESHOLD = float(os.getenv("PLAN_CACHE_SIM_THRESHOLD", "0.93"))
+REPAIR_CACHE_PATH = Path(os.getenv("REPAIR_CACHE_PATH", Path.home() / ".softlight" / "repair_patches.json"))
+
+_QUOTED = re.compile(r"(?<!\w)[\"']([^\"']+)[\"'](?!\w)")
+_NUMBER = re.compile(r"\b\d+\b")
+
+
+def normalize_task(task: str) -> str:
+    """Lower-case, unify quotes and collapse whitespace/trailing punctuation."""
+    text = (task or "").lower().replace("“", '"').replace("”", '"').replace("’", "'")
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" .!?")
+
+
+def task_literals(task: str) -> list:
+    """Quoted strings and numbers in a task; near-duplicates must agree on these to share a plan."""
+    text = normalize_task(task)
+    return sorted(set(_QUOTED.findall(text)) | set(_NUMBER.findall(text)))
+
+
+# Words that do not change what a task does; every other word must match for a semantic hit
+_STOPWORDS = frozenset("""
+a an the to of in on into onto at for from with and or then also please my our your me us it its
+this that these those some all any is are be as by up out now just can could would will should
+i we you page app site list item items
+""".split())
+_WORD = re.compile(r"[a-z][a-z0-9_-]*")
+
+
+def _stem(word: str) -> str:
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+@functools.lru_cache(maxsize=4096)
+def task_signature(task: str) -> tuple:
+    """
+    (app, content words) of a task: the app named in it (template registry keywords) and
+    its words minus stopwords, quoted values and numbers. Embeddings of tasks that differ
+    in one unquoted entity ("add the backpack" / "add the bike light") are close, so a
+    semantic hit also requires both of these to agree.
+    """
+    from agent.template_registry import get_registry
+
+    text = normalize_task(task)
+    app = get_registry().detect_app(text)
+    unquoted = _QUOTED.sub(" ", text)
+    words = {_stem(w) for w in _WORD.findall(unquoted) if w not in _STOPWORDS}
+    return (app.app if app is not None else None), tuple(sorted(words))
+
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+# Newest cache object per file; the single exit hook registered for a file saves it
+_latest = {}
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """Exclusive lock on `path` across threads and processes (a sibling .lock file)."""
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(str(path), threading.Lock())
+    with thread_lock:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path.with_name(path.name + ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _save_at_exit(key: str):
+    cache = _latest.get(key)
+    if cache is not None:
+        cache.save()
+
+
+def kb_fingerprint(kb_path="rag/knowledge_base") -> str:
+    """Hash of every knowledge-base file, so editing the KB invalidates cached plans."""
+    h = hashlib.sha256()
+    for f in sorted(Path(kb_path).glob("*.txt")):
+        h.update(f.name.encode("utf-8"))
+        h.update(f.read_bytes())
+    return h.hexdigest()[:16]
+
+
+class PlanCache:
+    """
+    Persistent two-tier cache of validated DSL plans.
+
+    - exact tier: key = fingerprint + normalized task string
+    - semantic tier: cosine similarity of task embeddings >= threshold,
+      restricted to entries with the same fingerprint, literals, app and content words
+      (so it catches rephrasings, not tasks about a different item or filter)
+
+    Entries are evicted least-recently-used beyond `max_entries` and after `ttl_hours`.
+    """
+
+    def __init__(self, fingerprint: str, path=PLAN_CACHE_PATH, max_entries=PLAN_CACHE_MAX_ENTRIES,
+                 ttl_hours=PLAN_CACHE_TTL_HOURS, threshold=PLAN_CACHE_SIM_THRESHOLD):
+        self.fingerprint = fingerprint
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl = ttl_hours * 3600
+        self.threshold = threshold
+        self.entries = OrderedDict()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._dirty = False
+        self._removed = set()       # keys evicted here, so a merge does not bring them back from disk
+        self._load()
+        self._register_exit_hook()
+
+    def _register_exit_hook(self):
+        key = str(self.path.resolve())
+        with _thread_locks_guard:
+            previous = _latest.get(key)
+            if previous is None:
+                atexit.register(_save_at_exit, key)
+            _latest[key] = self
+        if previous is not None and previous is not self:
+            # Replaced (e.g. the fingerprint changed); keep what it learned
+            previous.save()
+
+    # ─────────────────────────────────────────────
+    # Persistence
+    # ─────────────────────────────────────────────
+    def _read_entries(self) -> dict:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f).get("entries", {})
+        except Exception as e:
+            print(f"[yellow] Ignoring unreadable plan cache {self.path}: {e}[/yellow]")
+            return {}
+
+    def _load(self):
+        self.entries = OrderedDict(sorted(self._read_entries().items(), key=lambda kv: kv[1].get("last_used", 0)))
+        self._evict()
+
+    def _snapshot(self):
+        """(entries copy, evicted keys) to persist, or None if nothing changed."""
+        if not self._dirty:
+            return None
+        removed, self._removed = self._removed, set()
+        self._dirty = False
+        return OrderedDict((key, dict(entry)) for key, entry in self.entries.items()), removed
+
+    def _write_merged(self, entries: OrderedDict, removed: set) -> OrderedDict:
+        """
+        Merge `entries` into the file under a lock and rewrite it atomically. Entries other
+        processes saved since this cache loaded are kept; for a key both sides hold, the
+        more recently used entry wins. Works on the given copy only, so it may run off-loop.
+        """
+        with _file_lock(self.path):
+            for key, entry in self._read_entries().items():
+                if key in removed:
+                    continue
+                mine = entries.get(key)
+                if mine is None or entry.get("last_used", 0) > mine.get("last_used", 0):
+                    entries[key] = entry
+            entries = OrderedDict(sorted(entries.items(), key=lambda kv: kv[1].get("last_used", 0)))
+            self._trim(entries)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".json")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"entries": entries}, f)
+            os.replace(tmp_path, self.path)
+        return entries
+
+    def _restore(self, snapshot):
+        """Mark a snapshot whose write failed as unsaved again, so the next save retries it."""
+        self._removed.update(snapshot[1])
+        self._dirty = True
+
+    def _adopt(self, merged: OrderedDict):
+        """Take the merged entries, unless this cache changed again while the write ran."""
+        if not self._dirty:
+            self.entries = merged
+
+    def save(self):
+        """Merge into the cache file and rewrite it, if anything changed."""
+        snapshot = self._snapshot()
+        if snapshot is not None:
+            try:
+                self._adopt(self._write_merged(*snapshot))
+            except Exception:
+                self._restore(snapshot)
+                raise
+
+    async def asave(self):
+        """save() for event-loop callers: the copy is taken on the loop, the merge and write run on a thread."""
+        snapshot = self._snapshot()
+        if snapshot is not None:
+            try:
+                merged = await asyncio.to_thread(self._write_merged, *snapshot)
+            except Exception:
+                self._restore(snapshot)
+                raise
+            self._adopt(merged)
+
+    def _trim(self, entries: OrderedDict) -> list:
+        """Drop expired and least-recently-used entries from `entries`; returns their keys."""
+        now = time.time()
+        dropped = [k for k, e in entries.items() if now - e.get("created", 0) > self.ttl]
+        for k in dropped:
+            del entries[k]
+        while len(entries) > self.max_entries:
+            key, _ = entries.popitem(last=False)
+            dropped.append(key)
+        return dropped
+
+    def _evict(self):
+        dropped = self._trim(self.entries)
+        if dropped:
+            self._removed.update(dropped)
+            self.stats["evictions"] += len(dropped)
+            self._dirty = True
+
+    # ─────────────────────────────────────────────
+    # Lookup / store
+    # ─────────────────────────────────────────────
+    def _key(self, task: str) -> str:
+        return hashlib.sha256(f"{self.fingerprint}\n{normalize_task(task)}".encode("utf-8")).hexdigest()
+
+    def _touch(self, key: str):
+        entry = self.entries[key]
+        entry["last_used"] = time.time()
+        entry["hits"] = entry.get("hits", 0) + 1
+        self.entries.move_to_end(key)
+        self._dirty = True
+        return entry["plan"]
+
+    def get(self, task: str):
+        """Exact tier: return the cached plan (list of dicts) or None."""
+        key = self._key(task)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry.get("created", 0) > self.ttl:
+            del self.entries[key]
+            self._removed.add(key)
+            self._dirty = True
+            return None
+        self.stats["exact_hits"] += 1
+        return self._touch(key)
+
+    def get_similar(self, task: str, embedding):
+        """Semantic tier: return the plan of the most similar cached task above the threshold, or None."""
+        literals = task_literals(task)
+        signature = task_signature(task)
+        query = np.asarray(embedding, dtype=np.float32)
+        best_key, best_score = None, self.threshold
+        for key, entry in self.entries.items():
+            if entry.get("fingerprint") != self.fingerprint or entry.get("embedding") is None:
+                continue
+            if entry.get("literals", []) != literals or task_signature(entry.get("task", "")) != signature:
+                continue
+            score = float(np.dot(query, np.asarray(entry["embedding"], dtype=np.float32)))
+            if score >= best_score:
+                best_key, best_score = key, score
+        if best_key is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["semantic_hits"] += 1
+        print(f"[green] Reusing plan of similar task '{self.entries[best_key]['task']}' (similarity {best_score:.3f})[/green]")
+        return self._touch(best_key)
+
+    def put(self, task: str, plan: list, embedding=None, save: bool = True):
+        now = time.time()
+        self.entries[self._key(task)] = {
+            "task": normalize_task(task),
+            "fingerprint": self.fingerprint,
+            "literals": task_literals(task),
+            "plan": plan,
+            "embedding": [round(float(x), 5) for x in embedding] if embedding is not None else None,
+            "created": now,
+            "last_used": now,
+            "hits": 0,
+        }
+        self.entries.move_to_end(self._key(task))
+        self.stats["stores"] += 1
+        self._dirty = True
+        self._evict()
+        if save:
+            self.save()
+
+    def summary(self) -> str:
+        s = self.stats
+        lookups = s["exact_hits"] + s["semantic_hits"] + s["misses"]
+        rate = (s["exact_hits"] + s["semantic_hits"]) / lookups if lookups else 0.0
+        return (f"plan cache: {s['exact_hits']} exact / {s['semantic_hits']} semantic hits, "
+                f"{s['misses']} misses ({rate:.0%} hit rate), {len(self.entries)} entries")
+
+
+def repair_patch_key(failed_step: dict, remaining: list, error_class: str, page_fingerprint: str) -> str:
+    """Identity of a failure: the failing step (and the steps it would replace), error class and page state."""
+    payload = json.dumps([failed_step, remaining, error_class, page_fingerprint], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RepairPatchCache(PlanCache):
+    """
+    Replacement plan tails produced by incremental repair, keyed by repair_patch_key().
+    Shares persistence, LRU and TTL handling with PlanCache; entries carry the prompt
+    fingerprint so changing the repair prompt invalidates them.
+    """
+
+    def __init__(self, fingerprint: str, path=REPAIR_CACHE_PATH, **kwargs):
+        super().__init__(fingerprint, path, **kwargs)
+
+    def get_patch(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None or entry.get("fingerprint") != self.fingerprint or time.time() - entry.get("created", 0) > self.ttl:
+            self.stats["misses"] += 1
+            return None
+        self.stats["exact_hits"] += 1
+        return self._touch(key)
+
+    def put_patch(self, key: str, tail: list):
+        now = time.time()
+        self.entries[key] = {"fingerprint": self.fingerprint, "plan": tail, "created": now, "last_used": now, "hits": 0}
+        self.entries.move_to_end(key)
+        self.stats["stores"] += 1
+        self._dirty = True
+        self._evict()
+        self.save()
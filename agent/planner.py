@@ -1,9 +1,38 @@
-import os, yaml, re
-from openai import OpenAI
-from rag.retriever import SimpleRetriever
-from dsl.parser import load_dsl_from_dict
+import os, yaml, re, hashlib, asyncio, random, textwrap
+from dataclasses import dataclass
+from typing import List, Optional
+from dsl.parser import load_dsl_from_dict, dump_dsl_to_dicts
+from dsl.schema import DSLAction
+from agent.prompt_builder import PlanPrompt, build_prompt, prompt_fingerprint
+from utils.tracing import begin_span, span, traced
+
+_client = None
+_async_clients = {}
+
+
+def get_client():
+    """Create the OpenAI client on first use (importing openai is slow)."""
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
+
+
+def get_async_client(base_url: Optional[str] = None):
+    """
+    AsyncOpenAI client per base URL (defaults to OPENAI_BASE_URL / api.openai.com).
+    SDK retries are disabled; callers apply their own rate-limit-aware backoff.
+    """
+    if base_url not in _async_clients:
+        from openai import AsyncOpenAI
+        _async_clients[base_url] = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY") or "not-needed-for-mock",
+            base_url=base_url,
+            max_retries=0,
+        )
+    return _async_clients[base_url]
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 # ─────────────────────────────────────────────
 # YAML Cleaning Utilities
@@ -27,69 +56,70 @@ def safe_str(x):
     return str(x).strip() if x is not None else ""
 
 
+# ─────────────────────────────────────────────
+# Smart corrections (app-specific)
+# ─────────────────────────────────────────────
+def sanitize_step(step: dict, task_l: str) -> dict:
+    """Normalize one LLM step; TodoMVC steps get default selectors where they are missing."""
+    a = safe_str(step.get("action")).lower()
+    t = safe_str(step.get("target"))
+    v = safe_str(step.get("value"))
+
+    # ---------- TODO MVC ----------
+    if "todo" in task_l and "sauce" not in task_l:
+        if a == "fill" and not t:
+            t = "input.new-todo"
+        elif a == "expect" and not t and v:
+            t = f"li:has-text('{v}')"
+    return {"action": a, "target": t, "value": v}
+
+
+def sanitize_plan_dict(plan_dict, task: str):
+    """Apply app-specific corrections to a parsed LLM plan (list of dicts)."""
+    task_l = task.lower()
+    return [sanitize_step(step, task_l) for step in plan_dict]
+
+
 # ─────────────────────────────────────────────
 # Plan Generator (LLM + RAG)
 # ─────────────────────────────────────────────
-def generate_plan(task: str):
-    retriever = SimpleRetriever()
-    retrieved = retriever.retrieve(task)
-    context = "\n\n".join([f"{a.upper()}:\n{text}" for a, text in retrieved])
+PLANNER_MODEL = "gpt-4o-mini"
 
-    # Context-aware prompt for both SauceDemo and TodoMVC
-    prompt = f"""
-You are Agent B, a precise automation planner.
-Convert the user's natural language task into a YAML DSL plan.
-
-Available actions:
-  - open → open a URL
-  - fill → type text into an input field (selector + value)
-  - press → press a keyboard key (e.g., ENTER)
-  - find_and_click → click a button or link
-  - expect → verify a selector or text is visible
-  - mark_completed → mark a todo as completed
-  - delete_todo → delete a todo item
-  - clear_completed → clear completed todos
-  - wait_for → wait briefly or for a selector
-
-Task: {task}
-Context from knowledge base:
-{context}
-
- SauceDemo Rules:
-- URL: https://www.saucedemo.com/
-- For login always use:
-    fill → #user-name  value: standard_user
-    fill → #password   value: secret_sauce
-    find_and_click → #login-button
-    expect → .inventory_list
-- Only include add/remove cart steps if explicitly asked.
-- Cart icon selector: a.shopping_cart_link
-- Product add button: button.btn_inventory:has-text('Add to cart')
-- Cart item selector: .cart_item
-
- TodoMVC Rules:
-- URL: https://demo.playwright.dev/todomvc
-- To add tasks:
-    fill → input.new-todo
-    press → ENTER
-- To mark tasks done:
-    mark_completed → <task name>
-- To clear done tasks:
-    clear_completed → 
-- Never use visible text like “What needs to be done?” as a selector.
-
-Return ONLY valid YAML (no markdown fences).
-Each step must include 'action' and 'target', and 'value' when needed.
-"""
+_plan_cache = None
 
-    # Generate with GPT-4o-mini
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
-    )
 
-    plan_yaml = clean_yaml_block(response.choices[0].message.content.strip())
+def get_plan_cache():
+    """Plan cache bound to the current KB + prompt fingerprint (None when PLAN_CACHE=0)."""
+    global _plan_cache
+    if os.getenv("PLAN_CACHE", "1") == "0":
+        return None
+    from agent.plan_cache import PlanCache, kb_fingerprint
+    fingerprint = f"{kb_fingerprint()}-{prompt_fingerprint(PLANNER_MODEL)}"
+    if _plan_cache is None or _plan_cache.fingerprint != fingerprint:
+        _plan_cache = PlanCache(fingerprint)
+    return _plan_cache
+
+
+def build_plan_prompt(task: str, retrieved) -> PlanPrompt:
+    """Stable prefix + detected app's rules + budgeted context + task (see agent/prompt_builder.py)."""
+    prompt = build_prompt(task, retrieved, PLANNER_MODEL)
+    print(f"[blue] Prompt for {prompt.app or 'unknown app'}: {prompt.summary()}[/blue]")
+    return prompt
+
+
+def log_usage(usage):
+    """Print the provider-reported token usage of a completion (cached prompt tokens when reported)."""
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) if details is not None else None
+    cached_note = f", {cached} cached" if cached is not None else ""
+    print(f"[blue] Token usage: {usage.prompt_tokens} prompt{cached_note}, {usage.completion_tokens} completion[/blue]")
+
+
+def plan_from_completion(task: str, content: str) -> List[DSLAction]:
+    """Parse, sanitize and validate the YAML returned by the LLM."""
+    plan_yaml = clean_yaml_block(content.strip())
 
     # Parse safely
     try:
@@ -101,184 +131,424 @@ Each step must include 'action' and 'target', and 'value' when needed.
 
     plan_dict = normalize_plan_dict(plan_dict)
 
-    # ─────────────────────────────────────────────
-    # Smart corrections (app-specific)
-    # ─────────────────────────────────────────────
-    fixed = []
-    task_l = task.lower()
+    fixed = sanitize_plan_dict(plan_dict, task)
+
+    print("[blue] Plan sanitized for app context[/blue]")
+    return load_dsl_from_dict(fixed)
+
+
+def plan_without_llm(task: str, cache=None):
+    """Return (plan, source) from a template or the exact cache tier, or (None, None)."""
+    # Known intents (agent/templates/*.yaml) never reach the cache, retriever or LLM
+    from agent.template_registry import match_template
+    template, template_plan = match_template(task)
+    if template is not None:
+        print(f"[green] Matched plan template {template.app}/{template.name} — skipping LLM[/green]")
+        return load_dsl_from_dict(template_plan), "template"
+
+    if cache is not None:
+        cached = cache.get(task)
+        if cached is not None:
+            print(f"[green] Plan cache hit (exact) — {cache.summary()}[/green]")
+            return load_dsl_from_dict(cached), "cache"
+    return None, None
+
+
+@traced("generate_plan", "plan")
+def generate_plan(task: str):
+    with span("plan.template_or_cache", "plan"):
+        cache = get_plan_cache()
+        plan, _ = plan_without_llm(task, cache)
+    if plan is not None:
+        return plan
+
+    from rag.retriever import get_retriever
+    from agent.plan_cache import normalize_task
+    with span("retriever.load", "rag"):
+        retriever = get_retriever()
+    # One query encode serves both the semantic cache tier and retrieval
+    task_embedding = retriever.embed(normalize_task(task))
+
+    if cache is not None:
+        cached = cache.get_similar(task, task_embedding)
+        if cached is not None:
+            print(f"[green] Plan cache hit (semantic) — {cache.summary()}[/green]")
+            return load_dsl_from_dict(cached)
+
+    prompt = build_plan_prompt(task, retriever.retrieve_by_vector(task_embedding))
+
+    # Generate with GPT-4o-mini
+    with span("llm.completion", "llm", model=PLANNER_MODEL, prompt_tokens=prompt.tokens):
+        response = get_client().chat.completions.create(
+            model=PLANNER_MODEL,
+            messages=[{"role": "user", "content": prompt.text}],
+            temperature=0.2,
+        )
+    log_usage(response.usage)
+
+    with span("plan.parse", "plan"):
+        plan = plan_from_completion(task, response.choices[0].message.content)
+    if cache is not None:
+        cache.put(task, dump_dsl_to_dicts(plan), task_embedding)
+        print(f"[blue] Plan cached — {cache.summary()}[/blue]")
+    return plan
+
+
+# ─────────────────────────────────────────────
+# Batch Planner (concurrent AsyncOpenAI calls)
+# ─────────────────────────────────────────────
+PLAN_BATCH_CONCURRENCY = int(os.getenv("PLAN_BATCH_CONCURRENCY", "8"))
+PLAN_BATCH_MAX_ATTEMPTS = int(os.getenv("PLAN_BATCH_MAX_ATTEMPTS", "6"))
+
+
+@dataclass
+class BatchPlanResult:
+    task: str
+    plan: Optional[List[DSLAction]] = None
+    source: Optional[str] = None   # "template", "cache", "semantic" or "llm"
+    error: Optional[str] = None
+
+
+def _retry_after_seconds(error) -> Optional[float]:
+    """Honour retry-after(-ms) headers on rate-limit responses."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
 
-    for step in plan_dict:
-        a = safe_str(step.get("action")).lower()
-        t = safe_str(step.get("target"))
-        v = safe_str(step.get("value"))
-
-        # ---------- SAUCE DEMO ----------
-        # if "sauce" in task_l:
-        #     # Case 1: Login only
-        #     if "login" in task_l and not any(k in task_l for k in ["add", "cart", "open"]):
-        #         fixed = [
-        #             {"action": "open", "target": "https://www.saucedemo.com/"},
-        #             {"action": "fill", "target": "#user-name", "value": "standard_user"},
-        #             {"action": "fill", "target": "#password", "value": "secret_sauce"},
-        #             {"action": "find_and_click", "target": "#login-button"},
-        #             {"action": "expect", "target": ".inventory_list"},
-        #         ]
-        #         break
-
-        #     # Case 2: Add to cart only
-        #     elif all(k in task_l for k in ["add", "open", "cart", "remove"]):
-        #         fixed = [
-        #             {"action": "open", "target": "https://www.saucedemo.com/"},
-        #             {"action": "fill", "target": "#user-name", "value": "standard_user"},
-        #             {"action": "fill", "target": "#password", "value": "secret_sauce"},
-        #             {"action": "find_and_click", "target": "#login-button"},
-        #             {"action": "find_and_click", "target": "button.btn_inventory:has-text('Add to cart')"},
-        #             {"action": "find_and_click", "target": "a.shopping_cart_link"},
-        #             {"action": "find_and_click", "target": "button:has-text('Remove')"},
-        #             {"action": "expect", "target": "text=Continue Shopping"},
-        #         ]
-        #         break
-
-
-        #     # Case 3: Add to cart and open cart page
-        #     elif "add" in task_l and "open" in task_l and "cart" in task_l:
-        #         fixed = [
-        #             {"action": "open", "target": "https://www.saucedemo.com/"},
-        #             {"action": "fill", "target": "#user-name", "value": "standard_user"},
-        #             {"action": "fill", "target": "#password", "value": "secret_sauce"},
-        #             {"action": "find_and_click", "target": "#login-button"},
-        #             {"action": "find_and_click", "target": "button.btn_inventory:has-text('Add to cart')"},
-        #             {"action": "find_and_click", "target": "a.shopping_cart_link"},
-        #             {"action": "expect", "target": ".cart_item"},
-        #         ]
-        #         break
-
-        #     # Case 4: Open side menu and capture options (non-URL UI state)
-        #     elif "open" in task_l and "menu" in task_l and "sauce" in task_l:
-        #         fixed = [
-        #             {"action": "open", "target": "https://www.saucedemo.com/"},
-        #             {"action": "fill", "target": "#user-name", "value": "standard_user"},
-        #             {"action": "fill", "target": "#password", "value": "secret_sauce"},
-        #             {"action": "find_and_click", "target": "#login-button"},
-        #             {"action": "find_and_click", "target": "#react-burger-menu-btn"},
-        #             {"action": "expect", "target": ".bm-menu"},
-        #         ]
-        #         break
-
-
-        if "sauce" in task_l:
-            # Case 1: Login only
-            if "login" in task_l and not any(k in task_l for k in ["add", "cart", "open"]):
-                fixed = [
-                    {"action": "open", "target": "https://www.saucedemo.com/"},
-                    {"action": "fill", "target": "#user-name", "value": "standard_user"},
-                    {"action": "fill", "target": "#password", "value": "secret_sauce"},
-                    {"action": "find_and_click", "target": "#login-button"},
-                    {"action": "expect", "target": ".inventory_list"},
-                ]
-                break
-
-            # 🆕 Case 2A: Add to cart only (no “open cart” mentioned)
-            elif "add" in task_l and "cart" in task_l and "remove" not in task_l and "open" not in task_l:
-                fixed = [
-                    {"action": "open", "target": "https://www.saucedemo.com/"},
-                    {"action": "fill", "target": "#user-name", "value": "standard_user"},
-                    {"action": "fill", "target": "#password", "value": "secret_sauce"},
-                    {"action": "find_and_click", "target": "#login-button"},
-                    {"action": "expect", "target": ".inventory_list"},
-                    {"action": "find_and_click", "target": "button.btn_inventory:has-text('Add to cart')"},
-                    {"action": "expect", "target": "button.btn_inventory:has-text('Remove')"},
-                ]
-                break
-
-            # Case 3: Add to cart and open cart page
-            elif "add" in task_l and "open" in task_l and "cart" in task_l and "remove" not in task_l:
-                fixed = [
-                    {"action": "open", "target": "https://www.saucedemo.com/"},
-                    {"action": "fill", "target": "#user-name", "value": "standard_user"},
-                    {"action": "fill", "target": "#password", "value": "secret_sauce"},
-                    {"action": "find_and_click", "target": "#login-button"},
-                    {"action": "expect", "target": ".inventory_list"},
-                    {"action": "find_and_click", "target": "button.btn_inventory:has-text('Add to cart')"},
-                    {"action": "find_and_click", "target": "a.shopping_cart_link"},
-                    {"action": "expect", "target": ".cart_item"},
-                ]
-                break
-
-            # Case 4: Add to cart, open cart, and remove item
-            elif all(k in task_l for k in ["add", "open", "cart", "remove"]):
-                fixed = [
-                    {"action": "open", "target": "https://www.saucedemo.com/"},
-                    {"action": "fill", "target": "#user-name", "value": "standard_user"},
-                    {"action": "fill", "target": "#password", "value": "secret_sauce"},
-                    {"action": "find_and_click", "target": "#login-button"},
-                    {"action": "expect", "target": ".inventory_list"},
-                    {"action": "find_and_click", "target": "button.btn_inventory:has-text('Add to cart')"},
-                    {"action": "find_and_click", "target": "a.shopping_cart_link"},
-                    {"action": "find_and_click", "target": "button.cart_button:has-text('Remove')"},
-                    {"action": "expect", "target": "text=Continue Shopping"},
-                ]
-                break
-
-            # Case 5: Open side menu and capture options (non-URL UI state)
-            elif "open" in task_l and "menu" in task_l and "sauce" in task_l:
-                fixed = [
-                    {"action": "open", "target": "https://www.saucedemo.com/"},
-                    {"action": "fill", "target": "#user-name", "value": "standard_user"},
-                    {"action": "fill", "target": "#password", "value": "secret_sauce"},
-                    {"action": "find_and_click", "target": "#login-button"},
-                    {"action": "find_and_click", "target": "#react-burger-menu-btn"},
-                    {"action": "expect", "target": ".bm-menu"},
-                ]
-                break
-
-
-
-        # ---------- TODO MVC ----------
-        elif "todo" in task_l:
-
-            # Case: Filter to show only completed todos
-            if "filter" in task_l and "completed" in task_l:
-                fixed = [
-                    {"action": "open", "target": "https://demo.playwright.dev/todomvc"},
-                    {"action": "wait_for", "target": "footer", "value": ""},
-                    {"action": "find_and_click", "target": "a[href='#/completed']"},
-                    {"action": "wait_for", "target": "ul.todo-list li.completed", "value": ""},
-                    {"action": "expect", "target": "ul.todo-list li.completed", "value": ""},
-                ]
-                break
-
-            # Case: Filter to show only active todos (optional)
-            elif "filter" in task_l and "active" in task_l:
-                fixed = [
-                    {"action": "open", "target": "https://demo.playwright.dev/todomvc"},
-                    {"action": "wait_for", "target": "footer", "value": ""},
-                    {"action": "find_and_click", "target": "a[href='#/active']"},
-                    {"action": "wait_for", "target": "ul.todo-list li:not(.completed)", "value": ""},
-                    {"action": "expect", "target": "ul.todo-list li:not(.completed)", "value": ""},
-                ]
-                break
-
-            # Generic fallback for TodoMVC
-            if a == "fill" and not t:
-                t = "input.new-todo"
-            elif a == "expect" and not t and v:
-                t = f"li:has-text('{v}')"
-            fixed.append({"action": a, "target": t, "value": v})
 
+async def _complete_with_backoff(client, prompt: str, gate: dict, max_attempts: int = PLAN_BATCH_MAX_ATTEMPTS) -> str:
+    """
+    One chat completion with exponential backoff on 429/5xx/connection errors.
+    `gate` is shared by all workers: a rate limit seen by one pauses the others too.
+    """
+    from openai import RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+
+    delay = 1.0
+    for attempt in range(1, max_attempts + 1):
+        pause = gate.get("paused_until", 0) - asyncio.get_running_loop().time()
+        if pause > 0:
+            await asyncio.sleep(pause)
+        try:
+            response = await client.chat.completions.create(
+                model=PLANNER_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.2,
+            )
+            return response.choices[0].message.content
+        except (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError) as e:
+            if attempt == max_attempts:
+                raise
+            wait = _retry_after_seconds(e) or delay * (1 + random.random())
+            if isinstance(e, RateLimitError):
+                gate["paused_until"] = max(gate.get("paused_until", 0), asyncio.get_running_loop().time() + wait)
+            print(f"[yellow] {type(e).__name__} — retrying in {wait:.1f}s ({attempt}/{max_attempts})[/yellow]")
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, 30)
+
+
+async def agenerate_plans(tasks: List[str], concurrency: int = PLAN_BATCH_CONCURRENCY,
+                          base_url: Optional[str] = None) -> List[BatchPlanResult]:
+    """
+    Plan many tasks at once. Templates and cached plans are resolved first; the
+    remaining tasks share one retriever and one batched query encode, and their
+    LLM calls run concurrently (at most `concurrency` in flight).
+    """
+    cache = get_plan_cache()
+    results = [BatchPlanResult(task) for task in tasks]
+
+    pending = []
+    for i, task in enumerate(tasks):
+        plan, source = plan_without_llm(task, cache)
+        if plan is not None:
+            results[i].plan, results[i].source = plan, source
         else:
-            fixed.append({"action": a, "target": t, "value": v})
+            pending.append(i)
+
+    if pending:
+        from rag.retriever import get_retriever
+        from agent.plan_cache import normalize_task
+        # Model load, encoding and index search are CPU-bound: keep them off the loop, which
+        # may be shared with running browsers (agent.jobs)
+        retriever = await asyncio.to_thread(get_retriever)
+        vectors = await asyncio.to_thread(retriever.embed_many, [normalize_task(tasks[i]) for i in pending])
+
+        llm_jobs = []
+        for i, vector in zip(pending, vectors):
+            cached = cache.get_similar(tasks[i], vector) if cache is not None else None
+            if cached is not None:
+                results[i].plan, results[i].source = load_dsl_from_dict(cached), "semantic"
+            else:
+                llm_jobs.append((i, vector))
+
+        client = get_async_client(base_url)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        gate = {}
+
+        async def plan_one(i, vector):
+            prompt = build_plan_prompt(tasks[i], await asyncio.to_thread(retriever.retrieve_by_vector, vector))
+            async with semaphore:
+                content = await _complete_with_backoff(client, prompt.text, gate)
+            plan = plan_from_completion(tasks[i], content)
+            if cache is not None:
+                cache.put(tasks[i], dump_dsl_to_dicts(plan), vector, save=False)
+            return plan
+
+        print(f"[cyan] Planning {len(llm_jobs)} task(s) with the LLM (concurrency {concurrency})...[/cyan]")
+        outcomes = await asyncio.gather(*(plan_one(i, v) for i, v in llm_jobs), return_exceptions=True)
+        for (i, _), outcome in zip(llm_jobs, outcomes):
+            if isinstance(outcome, Exception):
+                results[i].error = f"{type(outcome).__name__}: {outcome}"
+            else:
+                results[i].plan, results[i].source = outcome, "llm"
+
+    if cache is not None:
+        await cache.asave()
+        print(f"[blue] {cache.summary()}[/blue]")
+    return results
+
+
+def generate_plans(tasks: List[str], concurrency: int = PLAN_BATCH_CONCURRENCY,
+                   base_url: Optional[str] = None) -> List[BatchPlanResult]:
+    """Synchronous wrapper around agenerate_plans for CLI use."""
+    return asyncio.run(agenerate_plans(tasks, concurrency=concurrency, base_url=base_url))
 
-    if not fixed:
-        fixed = plan_dict
 
-    print("[blue] Plan sanitized for app context[/blue]")
-    return load_dsl_from_dict(fixed)
+# ─────────────────────────────────────────────
+# Streaming Planner (steps yielded while the LLM is still generating)
+# ─────────────────────────────────────────────
+class StreamingPlanParser:
+    """
+    Incremental parser for a plan arriving as YAML text chunks. A list item is
+    complete once the next item at the same indentation starts (or the stream
+    ends); each complete item is parsed, sanitized and validated on its own.
+    """
+
+    def __init__(self, task: str):
+        self.task = task
+        self.steps: List[DSLAction] = []
+        self._partial = ""       # text after the last newline
+        self._item = []          # lines of the list item being received
+        self._indent = None      # indentation of top-level "- " items
+
+    def feed(self, text: str) -> List[DSLAction]:
+        """Add a chunk; returns the steps completed by it."""
+        *lines, self._partial = (self._partial + text).split("\n")
+        done = []
+        for line in lines:
+            done += self._line(line)
+        return done
+
+    def close(self) -> List[DSLAction]:
+        """End of stream: returns the remaining steps."""
+        done = self._line(self._partial) if self._partial.strip() else []
+        self._partial = ""
+        return done + self._emit()
+
+    def _line(self, line: str) -> List[DSLAction]:
+        if line.strip().startswith("```"):
+            return []
+        stripped = line.lstrip(" ")
+        indent = len(line) - len(stripped)
+        if stripped == "-" or stripped.startswith("- "):
+            if self._indent is None:
+                self._indent = indent
+            if indent == self._indent:
+                done = self._emit()
+                self._item = [line]
+                return done
+        if self._item:
+            self._item.append(line)
+        return []
+
+    def _emit(self) -> List[DSLAction]:
+        if not self._item:
+            return []
+        text, self._item = textwrap.dedent("\n".join(self._item)), []
+        try:
+            plan_dict = normalize_plan_dict(yaml.safe_load(text))
+            steps = load_dsl_from_dict(sanitize_plan_dict(plan_dict, self.task))
+        except Exception as e:
+            print(f"[yellow] Skipping unparsable streamed step: {e}[/yellow]")
+            return []
+        self.steps += steps
+        return steps
+
+
+async def astream_plan(task: str, base_url: Optional[str] = None):
+    """
+    Async iterator over the plan's steps, yielded as soon as each is known.
+    Templates and cache hits yield the whole plan at once; otherwise the LLM
+    completion is requested with stream=True and parsed item by item.
+    """
+    with span("plan.template_or_cache", "plan"):
+        cache = get_plan_cache()
+        plan, _ = plan_without_llm(task, cache)
+    if plan is not None:
+        for step in plan:
+            yield step
+        return
+
+    from rag.retriever import get_retriever
+    from agent.plan_cache import normalize_task
+    # Model load and encoding are CPU-bound: keep them off the loop so the browser can start meanwhile
+    with span("retriever.load", "rag"):
+        retriever = await asyncio.to_thread(get_retriever)
+    task_embedding = await asyncio.to_thread(retriever.embed, normalize_task(task))
+
+    if cache is not None:
+        cached = cache.get_similar(task, task_embedding)
+        if cached is not None:
+            print(f"[green] Plan cache hit (semantic) — {cache.summary()}[/green]")
+            for step in load_dsl_from_dict(cached):
+                yield step
+            return
+
+    prompt = build_plan_prompt(task, await asyncio.to_thread(retriever.retrieve_by_vector, task_embedding))
+    client = get_async_client(base_url)
+    parser = StreamingPlanParser(task)
+    end_stream = begin_span("llm.stream", "llm", model=PLANNER_MODEL, prompt_tokens=prompt.tokens)
+    started = asyncio.get_running_loop().time()
+    try:
+        try:
+            stream = await client.chat.completions.create(
+                model=PLANNER_MODEL,
+                messages=[{"role": "user", "content": prompt.text}],
+                temperature=0.2,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            first_step_s = None
+            async for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    log_usage(chunk.usage)
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                for step in parser.feed(delta or ""):
+                    if first_step_s is None:
+                        first_step_s = asyncio.get_running_loop().time() - started
+                        print(f"[blue] First streamed step after {first_step_s:.2f}s[/blue]")
+                    yield step
+        except Exception as e:
+            if parser.steps:
+                raise
+            # Nothing executed yet: fall back to a regular completion (with rate-limit backoff)
+            print(f"[yellow] Streaming failed ({type(e).__name__}: {e}) — requesting the full completion[/yellow]")
+            content = await _complete_with_backoff(client, prompt.text, {}, max_attempts=3)
+            for step in parser.feed(content):
+                yield step
+        for step in parser.close():
+            yield step
+    finally:
+        # Also on errors and when the consumer stops early, so the trace has no open span
+        end_stream(steps=len(parser.steps))
+
+    if cache is not None and parser.steps:
+        cache.put(task, dump_dsl_to_dicts(parser.steps), task_embedding, save=False)
+        await cache.asave()
+        print(f"[blue] Plan cached — {cache.summary()}[/blue]")
 
 
 # ─────────────────────────────────────────────
 # Plan Repairer
 # ─────────────────────────────────────────────
+# "incremental" patches the failing step and the rest of the plan; "full" regenerates the whole plan
+REPAIR_MODE = os.getenv("REPAIR_MODE", "incremental")
+
+REPAIR_PATCH_PROMPT_TEMPLATE = """
+You are a YAML DSL repair agent for a Playwright-based automation system.
+
+Valid actions:
+  - open
+  - find_and_click
+  - fill
+  - press
+  - expect
+  - wait_for
+
+The steps below already ran successfully and must NOT be repeated:
+{completed}
+
+This step failed:
+{failed}
+
+Error ({error_class}):
+{error}
+
+The browser is now at: {url} (title: {title})
+
+Steps that were planned after the failed step:
+{remaining}
+
+Return ONLY a YAML list of steps that replaces the failed step and everything after it,
+continuing from the current page (no markdown fences, no prose).
+"""
+
+_repair_cache = None
+
+
+def get_repair_cache():
+    """Patch cache bound to the repair prompt (None when PLAN_CACHE=0)."""
+    global _repair_cache
+    if os.getenv("PLAN_CACHE", "1") == "0":
+        return None
+    from agent.plan_cache import RepairPatchCache
+    fingerprint = hashlib.sha256(f"{PLANNER_MODEL}\n{REPAIR_PATCH_PROMPT_TEMPLATE}".encode("utf-8")).hexdigest()[:16]
+    if _repair_cache is None or _repair_cache.fingerprint != fingerprint:
+        _repair_cache = RepairPatchCache(fingerprint)
+    return _repair_cache
+
+
+async def arepair_plan_tail(plan: List[DSLAction], step_index: int, error: Exception, page_state: dict,
+                            base_url: Optional[str] = None) -> Optional[List[DSLAction]]:
+    """
+    Incremental repair: return replacement steps for plan[step_index:], or None.
+    The completed prefix is sent as context only. Patches are cached per (failing step +
+    remaining steps, error class, page fingerprint), so a repeated failure needs no LLM call.
+    """
+    from agent.plan_cache import repair_patch_key
+
+    steps = dump_dsl_to_dicts(plan)
+    error_class = type(error).__name__
+    cache = get_repair_cache()
+    key = repair_patch_key(steps[step_index], steps[step_index + 1:], error_class, page_state.get("fingerprint", ""))
+    cached = cache.get_patch(key) if cache is not None else None
+    if cached is not None:
+        print("[green] Reusing cached repair patch[/green]")
+        return load_dsl_from_dict(cached)
+
+    prompt = REPAIR_PATCH_PROMPT_TEMPLATE.format(
+        completed=yaml.safe_dump(steps[:step_index], sort_keys=False) if step_index else "(none)",
+        failed=yaml.safe_dump([steps[step_index]], sort_keys=False),
+        error_class=error_class,
+        error=str(error),
+        url=page_state.get("url", ""),
+        title=page_state.get("title", ""),
+        remaining=yaml.safe_dump(steps[step_index + 1:], sort_keys=False) if step_index + 1 < len(steps) else "(none)",
+    )
+    with span("llm.repair", "llm", model=PLANNER_MODEL):
+        content = await _complete_with_backoff(get_async_client(base_url), prompt, {}, max_attempts=3)
+
+    patch_yaml = clean_yaml_block((content or "").strip())
+    try:
+        tail = load_dsl_from_dict(normalize_plan_dict(yaml.safe_load(patch_yaml) or []))
+    except Exception as e:
+        print(f"[red]Failed to parse repair patch: {e}[/red]")
+        print(f"[yellow]Raw YAML from LLM:[/yellow]\n{patch_yaml}\n")
+        return None
+    if not tail:
+        print("[red]⚠️ LLM returned an empty patch — skipping repair.[/red]")
+        return None
+    if cache is not None:
+        cache.put_patch(key, dump_dsl_to_dicts(tail))
+    return tail
+
+
 def repair_plan(failed_step, error_message, current_plan):
     """Ask the LLM to repair or regenerate the plan after a failure."""
     prompt = f"""
@@ -306,8 +576,8 @@ Current plan:
 Return ONLY the corrected YAML (no markdown fences, no prose).
     """
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+    response = get_client().chat.completions.create(
+        model=PLANNER_MODEL,
         messages=[{"role": "user", "content": prompt}],
         temperature=0.2,
     )
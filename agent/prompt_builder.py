@@ -0,0 +1,184 @@
+# agent/prompt_builder.py
+"""
+Planner prompt assembly.
+
+Layout, from most to least stable, so providers can reuse the cached prefix:
+
+    STATIC_PREFIX            identical for every call
+    APP_RULES[app]           identical for every task of one app
+    retrieved context        trimmed to PROMPT_CONTEXT_TOKENS
+    Task: <task>             last
+
+Only the rule block of the app detected in the task is included (all blocks when
+no app is detected). Token counts come from tiktoken, falling back to a
+characters/4 estimate when tiktoken or its encoding files are unavailable.
+"""
+import hashlib
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+# Token budget for retrieved knowledge-base passages
+PROMPT_CONTEXT_TOKENS = int(os.getenv("PROMPT_CONTEXT_TOKENS", "400"))
+
+STATIC_PREFIX = """You are Agent B, a precise automation planner.
+Convert the user's natural language task into a YAML DSL plan.
+
+Available actions:
+  - open → open a URL
+  - fill → type text into an input field (selector + value)
+  - press → press a keyboard key (e.g., ENTER)
+  - find_and_click → click a button or link
+  - expect → verify a selector or text is visible
+  - mark_completed → mark a todo as completed
+  - delete_todo → delete a todo item
+  - clear_completed → clear completed todos
+  - wait_for → wait briefly or for a selector
+
+Return ONLY valid YAML (no markdown fences): a list of steps.
+Each step must include 'action' and 'target', and 'value' when needed.
+"""
+
+APP_RULES = {
+    "saucedemo": """
+SauceDemo Rules:
+- URL: https://www.saucedemo.com/
+- For login always use:
+    fill → #user-name  value: standard_user
+    fill → #password   value: secret_sauce
+    find_and_click → #login-button
+    expect → .inventory_list
+- Only include add/remove cart steps if explicitly asked.
+- Cart icon selector: a.shopping_cart_link
+- Product add button: button.btn_inventory:has-text('Add to cart')
+- Cart item selector: .cart_item
+""",
+    "todomvc": """
+TodoMVC Rules:
+- URL: https://demo.playwright.dev/todomvc
+- To add tasks:
+    fill → input.new-todo
+    press → ENTER
+- To mark tasks done:
+    mark_completed → <task name>
+- To clear done tasks:
+    clear_completed →
+- Never use visible text like “What needs to be done?” as a selector.
+""",
+}
+
+VARIABLE_TEMPLATE = """
+Context from knowledge base:
+{context}
+
+Task: {task}
+"""
+
+
+@dataclass
+class PlanPrompt:
+    text: str
+    app: Optional[str]
+    tokens: int                  # whole prompt
+    prefix_tokens: int           # static prefix + app rules (the cacheable part)
+    context_tokens: int
+    passages: List[str] = field(default_factory=list)   # ids of the passages included
+    dropped: List[str] = field(default_factory=list)    # ids cut by the token budget
+
+    def summary(self) -> str:
+        trimmed = f", dropped {len(self.dropped)} passage(s) over budget" if self.dropped else ""
+        return (f"{self.tokens} prompt tokens ({self.prefix_tokens} stable prefix, "
+                f"{self.context_tokens} context from {len(self.passages)} passage(s){trimmed})")
+
+
+class TokenCounter:
+    """tiktoken encoding for a model, or a characters/4 estimate if it cannot be loaded."""
+
+    def __init__(self, model: str):
+        self.encoding = None
+        try:
+            import tiktoken
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            print(f"[yellow] tiktoken unavailable ({e}); estimating tokens as characters/4[/yellow]")
+
+    def count(self, text: str) -> int:
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self.encoding is None:
+            return text[:max_tokens * 4]
+        return self.encoding.decode(self.encoding.encode(text)[:max_tokens])
+
+
+_counters = {}
+
+
+def get_counter(model: str) -> TokenCounter:
+    if model not in _counters:
+        _counters[model] = TokenCounter(model)
+    return _counters[model]
+
+
+def detect_app(task: str) -> Optional[str]:
+    """App named in the task, using the template registry's keywords."""
+    from agent.template_registry import get_registry
+    app = get_registry().detect_app(task)
+    return app.app if app is not None and app.app in APP_RULES else None
+
+
+def stable_prefix(app: Optional[str]) -> str:
+    rules = [APP_RULES[app]] if app else [APP_RULES[name] for name in sorted(APP_RULES)]
+    return STATIC_PREFIX + "".join(rules)
+
+
+def fit_context(retrieved: List[Tuple[str, str]], budget: int, counter: TokenCounter):
+    """
+    Keep passages in rank order while they fit in `budget` tokens. If the best
+    passage alone is over budget it is truncated rather than dropped.
+    Returns (context text, tokens used, included ids, dropped ids).
+    """
+    blocks, used, included, dropped = [], 0, [], []
+    for source_id, text in retrieved:
+        block = f"{source_id.upper()}:\n{text}"
+        tokens = counter.count(block + "\n\n")
+        if used + tokens <= budget:
+            blocks.append(block)
+            used += tokens
+            included.append(source_id)
+        elif not blocks and budget > 0:
+            block = counter.truncate(block, budget)
+            blocks.append(block)
+            used += counter.count(block)
+            included.append(source_id)
+        else:
+            dropped.append(source_id)
+    return "\n\n".join(blocks), used, included, dropped
+
+
+def build_prompt(task: str, retrieved, model: str, budget: int = PROMPT_CONTEXT_TOKENS) -> PlanPrompt:
+    counter = get_counter(model)
+    app = detect_app(task)
+    prefix = stable_prefix(app)
+    context, context_tokens, included, dropped = fit_context(list(retrieved), budget, counter)
+    text = prefix + VARIABLE_TEMPLATE.format(context=context or "(none)", task=task)
+    return PlanPrompt(
+        text=text,
+        app=app,
+        tokens=counter.count(text),
+        prefix_tokens=counter.count(prefix),
+        context_tokens=context_tokens,
+        passages=included,
+        dropped=dropped,
+    )
+
+
+def prompt_fingerprint(model: str, budget: int = PROMPT_CONTEXT_TOKENS) -> str:
+    """Changes whenever the prompt layout, rules or budget change (keys the plan cache)."""
+    parts = [model, str(budget), STATIC_PREFIX, VARIABLE_TEMPLATE] + [APP_RULES[name] for name in sorted(APP_RULES)]
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,198 @@
+# agent/selector_memory.py
+import atexit
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from playwright.async_api import Error as PlaywrightError
+
+from agent.plan_cache import _file_lock
+from utils.tracing import traced
+
+SELECTOR_MEMORY_PATH = Path(os.getenv("SELECTOR_MEMORY_PATH", Path.home() / ".softlight" / "selectors.json"))
+SELECTOR_MEMORY_MAX_ENTRIES = int(os.getenv("SELECTOR_MEMORY_MAX_ENTRIES", "2000"))
+
+
+def page_key(url: str) -> str:
+    """Host, path and hash route of a URL; query strings (session ids, tracking) are ignored."""
+    parts = urlsplit(url or "")
+    return f"{parts.netloc}{parts.path}" + (f"#{parts.fragment}" if parts.fragment else "")
+
+
+def build_locator(page, strategy: str, selector: str):
+    if strategy == "text":
+        return page.get_by_text(selector)
+    return page.locator(selector)
+
+
+class SelectorMemory:
+    """
+    Persistent record of which locator strategy resolved a DSL target on a given page.
+
+    Key: app + page (host, path, hash route) + DSL target. Value: the strategy ("css" or
+    "text") and the concrete selector that matched. resolve() tries the remembered
+    selector first and only walks the full strategy list when it no longer matches,
+    in which case the entry is dropped and relearned.
+    """
+
+    def __init__(self, path=SELECTOR_MEMORY_PATH, max_entries=SELECTOR_MEMORY_MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "learned": 0}
+        self._dirty = False
+        self._removed = set()       # keys forgotten here, so a merge does not bring them back from disk
+        self._load()
+        atexit.register(self.save)
+
+    def _read_entries(self) -> dict:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f).get("entries", {})
+        except Exception as e:
+            print(f"[yellow] Ignoring unreadable selector memory {self.path}: {e}[/yellow]")
+            return {}
+
+    def _load(self):
+        self.entries = OrderedDict(sorted(self._read_entries().items(), key=lambda kv: kv[1].get("last_used", 0)))
+
+    def snapshot(self):
+        """
+        (entries copy, forgotten keys) to write, or None if nothing changed.
+        Take it on the thread that mutates the entries; restore() it if the write fails.
+        """
+        if not self._dirty:
+            return None
+        removed, self._removed = self._removed, set()
+        self._dirty = False
+        return OrderedDict((key, dict(entry)) for key, entry in self.entries.items()), removed
+
+    def restore(self, snapshot):
+        """Mark a snapshot whose write failed as unsaved again, so the next save retries it."""
+        self._removed.update(snapshot[1])
+        self._dirty = True
+
+    def write(self, entries: OrderedDict, removed: set) -> OrderedDict:
+        """
+        Merge a snapshot into the memory file under a lock and rewrite it atomically
+        (safe to run on a worker thread). Entries other processes saved in the meantime
+        are kept; for a key both sides hold, the more recently used entry wins.
+        Returns the merged entries.
+        """
+        with _file_lock(self.path):
+            for key, entry in self._read_entries().items():
+                if key in removed:
+                    continue
+                mine = entries.get(key)
+                if mine is None or entry.get("last_used", 0) > mine.get("last_used", 0):
+                    entries[key] = entry
+            entries = OrderedDict(sorted(entries.items(), key=lambda kv: kv[1].get("last_used", 0)))
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".json")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"entries": entries}, f)
+            os.replace(tmp_path, self.path)
+        return entries
+
+    def adopt(self, merged: OrderedDict):
+        """Take the entries write() merged, unless this memory changed again while it ran."""
+        if not self._dirty:
+            self.entries = merged
+
+    def save(self):
+        """Merge into the memory file and rewrite it, if anything changed."""
+        snapshot = self.snapshot()
+        if snapshot is not None:
+            try:
+                self.adopt(self.write(*snapshot))
+            except Exception:
+                self.restore(snapshot)
+                raise
+
+    @staticmethod
+    def key(app_name: str, url: str, target: str) -> str:
+        return f"{app_name}|{page_key(url)}|{target}"
+
+    def remember(self, key: str, strategy: str, selector: str):
+        self.entries[key] = {"strategy": strategy, "selector": selector, "hits": 0, "last_used": time.time()}
+        self.entries.move_to_end(key)
+        self._removed.discard(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self.stats["learned"] += 1
+        self._dirty = True
+
+    def forget(self, key: str):
+        if self.entries.pop(key, None) is not None:
+            self._removed.add(key)
+            self.stats["invalidations"] += 1
+            self._dirty = True
+
+    async def resolve(self, page, app_name: str, target: str, strategies):
+        """
+        Return a locator with at least one match, or None.
+        `strategies` is the ordered fallback list of (strategy, selector) pairs for this target.
+        """
+        key = self.key(app_name, page.url, target)
+        entry = self.entries.get(key)
+        if entry is not None:
+            locator = await _matching(build_locator(page, entry["strategy"], entry["selector"]))
+            if locator is not None:
+                entry["hits"] += 1
+                entry["last_used"] = time.time()
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                self._dirty = True
+                return locator
+            self.forget(key)
+
+        self.stats["misses"] += 1
+        for strategy, selector in strategies:
+            if entry is not None and (strategy, selector) == (entry["strategy"], entry["selector"]):
+                continue  # already tried above
+            locator = await _matching(build_locator(page, strategy, selector))
+            if locator is not None:
+                self.remember(key, strategy, selector)
+                return locator
+        return None
+
+
+async def _matching(locator):
+    try:
+        return locator if await locator.count() else None
+    except PlaywrightError:
+        # e.g. plain text used as a CSS selector
+        return None
+
+
+_memory = None
+
+
+def get_selector_memory():
+    """Process-wide selector memory (None when SELECTOR_MEMORY=0)."""
+    global _memory
+    if os.getenv("SELECTOR_MEMORY", "1") == "0":
+        return None
+    if _memory is None:
+        _memory = SelectorMemory()
+    return _memory
+
+
+@traced("locate", "locate")
+async def resolve_locator(page, app_name: str, target: str, strategies):
+    """Resolve through the selector memory, or try `strategies` in order when it is disabled."""
+    memory = get_selector_memory()
+    if memory is not None:
+        return await memory.resolve(page, app_name, target, strategies)
+    for strategy, selector in strategies:
+        locator = await _matching(build_locator(page, strategy, selector))
+        if locator is not None:
+            return locator
+    return None
@@ -0,0 +1,94 @@
+# agent/template_registry.py
+import copy
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional
+
+import yaml
+
+TEMPLATES_DIR = Path(__file__).parent / "templates"
+
+
+@dataclass
+class PlanTemplate:
+    """A hard-coded plan selected by keyword rules on the lower-cased task."""
+    app: str
+    name: str
+    plan: List[dict]
+    all: List[str] = field(default_factory=list)    # every keyword must appear
+    any: List[str] = field(default_factory=list)    # at least one must appear (if given)
+    none: List[str] = field(default_factory=list)   # none may appear
+
+    def matches(self, task_l: str) -> bool:
+        return (
+            all(k in task_l for k in self.all)
+            and (not self.any or any(k in task_l for k in self.any))
+            and not any(k in task_l for k in self.none)
+        )
+
+
+@dataclass
+class AppTemplates:
+    """All templates for one target app, plus the keywords that select the app."""
+    app: str
+    keywords: List[str]
+    templates: List[PlanTemplate]
+    priority: int = 100
+
+
+class TemplateRegistry:
+    """
+    Data-driven intent matcher loaded from agent/templates/*.yaml.
+    The first app (by priority) whose keywords appear in the task is chosen, then
+    its templates are tried in file order. Matching is plain substring checks.
+    """
+
+    def __init__(self, templates_dir=TEMPLATES_DIR):
+        self.apps: List[AppTemplates] = []
+        for path in sorted(Path(templates_dir).glob("*.yaml")):
+            with open(path, "r") as f:
+                data = yaml.safe_load(f) or {}
+            app = data.get("app", path.stem)
+            templates = [
+                PlanTemplate(
+                    app=app,
+                    name=t["name"],
+                    plan=t["plan"],
+                    all=t.get("all", []),
+                    any=t.get("any", []),
+                    none=t.get("none", []),
+                )
+                for t in data.get("templates", [])
+            ]
+            self.apps.append(AppTemplates(app, data.get("keywords", [app]), templates, data.get("priority", 100)))
+        self.apps.sort(key=lambda a: a.priority)
+
+    def detect_app(self, task: str) -> Optional[AppTemplates]:
+        task_l = task.lower()
+        return next((a for a in self.apps if any(k in task_l for k in a.keywords)), None)
+
+    def match(self, task: str) -> Optional[PlanTemplate]:
+        app = self.detect_app(task)
+        if app is None:
+            return None
+        task_l = task.lower()
+        return next((t for t in app.templates if t.matches(task_l)), None)
+
+
+_registry = None
+
+
+def get_registry() -> TemplateRegistry:
+    """Load the template YAML files once per process."""
+    global _registry
+    if _registry is None:
+        _registry = TemplateRegistry()
+    return _registry
+
+
+def match_template(task: str):
+    """Return (template, plan dicts) for a task, or (None, None) if no template applies."""
+    template = get_registry().match(task)
+    if template is None:
+        return None, None
+    return template, copy.deepcopy(template.plan)
@@ -0,0 +1,144 @@
+# agent/waits.py
+"""
+Condition-based waits for the executor: load state, network idle, selector
+state and DOM quiescence. Per-step overrides come from `DSLAction.extra`:
+
+    - action: wait_for
+      target: .inventory_list
+      extra: {timeout: 8000, state: visible}
+    - action: open
+      target: https://www.saucedemo.com/
+      extra: {wait_until: load, network_idle: true}
+
+Recognised keys: timeout (ms), wait_until (commit|domcontentloaded|load|networkidle),
+state (attached|detached|visible|hidden), network_idle (bool), quiet_ms (ms).
+"""
+import os
+import re
+from dataclasses import dataclass
+
+from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
+
+from utils.tracing import traced
+
+# Default upper bound for any single wait
+WAIT_TIMEOUT_MS = int(os.getenv("WAIT_TIMEOUT_MS", "10000"))
+# The DOM counts as settled once it has not mutated for this long
+WAIT_QUIET_MS = int(os.getenv("WAIT_QUIET_MS", "150"))
+# Cap on the post-action settle, so a page that animates forever does not stall the run
+WAIT_SETTLE_MAX_MS = int(os.getenv("WAIT_SETTLE_MAX_MS", "3000"))
+# Also wait for network idle after navigations (off by default; analytics beacons can keep it busy)
+WAIT_NETWORK_IDLE = os.getenv("WAIT_NETWORK_IDLE", "0") == "1"
+
+# `wait_for` targets that are durations rather than selectors ("2s", "500ms", "1.5 seconds")
+_DURATION = re.compile(r"^(\d+(?:\.\d+)?)\s*(ms|s|sec|secs|second|seconds)?$", re.IGNORECASE)
+
+# Resolves true once no mutation has been observed for `quietMs`, false when `timeoutMs` runs out
+_DOM_QUIET_JS = """
+([quietMs, timeoutMs]) => new Promise((resolve) => {
+    let timer = null;
+    const finish = (quiet) => {
+        observer.disconnect();
+        clearTimeout(timer);
+        clearTimeout(cap);
+        resolve(quiet);
+    };
+    const arm = () => {
+        clearTimeout(timer);
+        timer = setTimeout(() => finish(true), quietMs);
+    };
+    const observer = new MutationObserver(arm);
+    observer.observe(document.documentElement, {subtree: true, childList: true, attributes: true, characterData: true});
+    const cap = setTimeout(() => finish(false), timeoutMs);
+    arm();
+})
+"""
+
+
+@dataclass
+class WaitOptions:
+    timeout: int = WAIT_TIMEOUT_MS
+    wait_until: str = "domcontentloaded"
+    state: str = "visible"
+    network_idle: bool = WAIT_NETWORK_IDLE
+    quiet_ms: int = WAIT_QUIET_MS
+
+
+def wait_options(step, **defaults) -> WaitOptions:
+    """Per-step wait settings: `defaults` for the action, overridden by the step's `extra`."""
+    opts = WaitOptions(**defaults)
+    extra = getattr(step, "extra", None) or {}
+    for key in ("timeout", "quiet_ms"):
+        if extra.get(key) is not None:
+            setattr(opts, key, int(extra[key]))
+    for key in ("wait_until", "state"):
+        if extra.get(key):
+            setattr(opts, key, str(extra[key]))
+    if extra.get("network_idle") is not None:
+        opts.network_idle = bool(extra["network_idle"])
+    return opts
+
+
+def parse_duration_ms(text: str):
+    """'2s' -> 2000, '500ms' -> 500, '3' -> 3000; None if `text` is not a duration."""
+    match = _DURATION.match((text or "").strip())
+    if not match:
+        return None
+    amount, unit = float(match.group(1)), (match.group(2) or "s").lower()
+    return int(amount if unit == "ms" else amount * 1000)
+
+
+async def wait_for_load(page, state="load", timeout=WAIT_TIMEOUT_MS) -> bool:
+    """Wait for a load state; returns False instead of raising on timeout."""
+    try:
+        await page.wait_for_load_state(state, timeout=timeout)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+async def wait_for_dom_quiet(page, quiet_ms=WAIT_QUIET_MS, timeout=WAIT_SETTLE_MAX_MS) -> bool:
+    """Wait until the DOM stops mutating for `quiet_ms`. A navigation mid-wait counts as not quiet."""
+    try:
+        return bool(await page.evaluate(_DOM_QUIET_JS, [quiet_ms, timeout]))
+    except PlaywrightError:
+        return False
+
+
+@traced("wait_for_target", "wait")
+async def wait_for_target(page, target: str, state="visible", timeout=WAIT_TIMEOUT_MS) -> bool:
+    """Wait for a selector (or, failing that, visible text) to reach `state`."""
+    locator = page.locator(target).or_(page.get_by_text(target))
+    try:
+        await locator.first.wait_for(state=state, timeout=timeout)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+    except PlaywrightError:
+        # Not a valid selector (plain text such as "Products"): wait on the text alone
+        try:
+            await page.get_by_text(target).first.wait_for(state=state, timeout=timeout)
+            return True
+        except PlaywrightTimeoutError:
+            return False
+
+
+async def wait_for_count_below(page, selector: str, count: int, timeout=WAIT_TIMEOUT_MS) -> bool:
+    """Wait until fewer than `count` elements match `selector` (e.g. after deleting a list item)."""
+    try:
+        await page.wait_for_function(
+            "([sel, n]) => document.querySelectorAll(sel).length < n", arg=[selector, count], timeout=timeout
+        )
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+@traced("settle", "wait")
+async def settle(page, opts: WaitOptions = None):
+    """After an action: let any navigation reach DOMContentLoaded, then wait for the DOM to go quiet."""
+    opts = opts or WaitOptions()
+    await wait_for_load(page, "domcontentloaded", timeout=opts.timeout)
+    if opts.network_idle:
+        await wait_for_load(page, "networkidle", timeout=opts.timeout)
+    await wait_for_dom_quiet(page, opts.quiet_ms, timeout=min(opts.timeout, WAIT_SETTLE_MAX_MS))
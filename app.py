@@ -1,40 +1,137 @@
 # app.py
-import streamlit as st
 import os
-import glob
-import time
-import subprocess
+import uuid
 from pathlib import Path
 
+import streamlit as st
+from dotenv import load_dotenv
+
+load_dotenv()
+
 st.set_page_config(page_title="Agent B UI Executor", layout="wide")
 
+# How often the job panel polls for new captures while a task is queued or running
+JOB_REFRESH_SECONDS = float(os.getenv("JOB_REFRESH_SECONDS", "1"))
+THUMBNAIL_COLUMNS = 4
+
+
+@st.cache_resource
+def get_pool_service():
+    """One warm browser pool per Streamlit server, shared by every session."""
+    from browser.pool import BrowserPoolService
+    return BrowserPoolService()
+
+
+@st.cache_resource
+def get_job_queue():
+    """Background workers on the pool's loop; every session submits to the same queue."""
+    from agent.jobs import JobQueue
+    return JobQueue(get_pool_service())
+
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def load_thumbnail(run_dir: str, capture: dict) -> bytes:
+    """The .thumb.jpg written at capture time; older runs are downscaled once, on first display."""
+    thumb = Path(run_dir) / capture["thumb"] if capture.get("thumb") else None
+    if thumb is not None and thumb.exists():
+        return thumb.read_bytes()
+    from agent.capture import thumbnail
+    return thumbnail(Path(run_dir) / capture["file"])
+
+
+STATUS_ICONS = {"queued": "⏳", "planning": "🧠", "running": "▶️", "ok": "✅", "failed": "⚠️", "error": "❌"}
+
+
+def render_captures(job):
+    captures = sorted(job.captures, key=lambda c: c.get("step") or 0)
+    if not captures:
+        st.caption("No steps captured yet.")
+        return
+
+    for start in range(0, len(captures), THUMBNAIL_COLUMNS):
+        for column, capture in zip(st.columns(THUMBNAIL_COLUMNS), captures[start:start + THUMBNAIL_COLUMNS]):
+            with column:
+                caption = f"Step {capture['step']}: {capture['action']}"
+                if capture.get("changed") is False:
+                    caption += " (unchanged)"
+                st.image(load_thumbnail(job.run_dir, capture), caption=caption)
+
+    # Full-size screenshots are only loaded for the step being inspected
+    labels = {f"Step {c['step']}: {c['action']}": c for c in captures}
+    choice = st.selectbox("Full-size step", ["—"] + list(labels), key=f"full_{job.id}")
+    if choice in labels:
+        st.image(str(Path(job.run_dir) / labels[choice]["file"]), use_container_width=True)
+
+
+@st.fragment(run_every=JOB_REFRESH_SECONDS)
+def job_panel(session_id: str):
+    queue = get_job_queue()
+    jobs = queue.jobs(owner=session_id)
+    if not jobs:
+        st.caption("No tasks submitted yet.")
+        return
+
+    st.subheader("Your tasks")
+    for job in reversed(jobs):
+        line = f"{STATUS_ICONS.get(job.status, '')} **{job.task}** · {job.status}"
+        if job.status == "queued":
+            line += f" · {queue.position(job.id)} ahead in queue"
+        elif job.started_at is not None:
+            line += f" · {job.elapsed:.0f}s"
+        if job.run_dir:
+            line += f" · `{Path(job.run_dir).name}`"
+        st.markdown(line)
+        if job.status == "running" and job.steps_total:
+            st.progress(min(1.0, len(job.captures) / job.steps_total),
+                        text=f"{len(job.captures)}/{job.steps_total} steps captured")
+        if job.error:
+            st.error(job.error)
+
+    labels = {f"{job.id} · {job.task}": job for job in reversed(jobs)}
+    if st.session_state.get("shown_job") not in labels:
+        st.session_state.pop("shown_job", None)
+    shown = labels[st.radio("Show steps of", list(labels), key="shown_job")]
+    st.divider()
+    if shown.run_dir:
+        render_captures(shown)
+    else:
+        st.caption("Waiting for the run to start...")
+
+
+if "session_id" not in st.session_state:
+    st.session_state["session_id"] = uuid.uuid4().hex
+
 st.title("Agent B — Live Task Executor")
 st.write("Enter a task below, and Agent B will plan, execute, and capture the UI states step-by-step.")
 
-task = st.text_input("Enter task:", placeholder="e.g. add Buy milk and Pay bills to the todo app")
+with st.form("submit_task", clear_on_submit=True):
+    task = st.text_input("Enter task:", placeholder="e.g. add Buy milk and Pay bills to the todo app")
+    submitted = st.form_submit_button("Run Agent")
 
-if st.button("Run Agent"):
+if submitted:
     if not task.strip():
         st.warning("Please enter a task first.")
     else:
-        st.info("Executing... please wait 1–2 minutes depending on browser load.")
-        output = subprocess.run(["python", "main.py", task], capture_output=True, text=True)
-
-        # Locate the most recent run folder
-        dataset_root = Path("dataset")
-        latest_run = max(dataset_root.rglob("run_*"), key=os.path.getmtime, default=None)
-
-        if latest_run:
-            st.success(f"Execution complete! Showing captured steps from: {latest_run}")
-            image_files = sorted(glob.glob(str(latest_run / "*.png")))
-
-            if image_files:
-                for idx, img_path in enumerate(image_files, 1):
-                    st.image(img_path, caption=f"Step {idx}: {os.path.basename(img_path)}", use_container_width=True)
-                    # st.image(img_path, caption=f"Step {idx}: {os.path.basename(img_path)}", use_column_width=True)
-                    st.divider()
-                    time.sleep(0.1)
-            else:
-                st.warning("No screenshots found in the latest run folder.")
-        else:
-            st.error("No dataset folder found.")
+        job = get_job_queue().submit(task.strip(), owner=st.session_state["session_id"])
+        st.session_state["shown_job"] = f"{job.id} · {job.task}"
+        st.toast(f"Queued {job.id}")
+
+job_panel(st.session_state["session_id"])
+
+with st.sidebar:
+    st.subheader("Recent runs")
+    from utils.catalog import get_catalog
+    for run in get_catalog().find_runs(limit=5):
+        st.caption(f"{run['status']} · {run['app']} · {Path(run['run_dir']).name}")
+
+    st.subheader("Job queue")
+    queue_metrics = get_job_queue().metrics()
+    st.metric("Queued / running", f"{queue_metrics['queued']} / {queue_metrics['active']}")
+    st.caption(f"{queue_metrics['workers']} worker(s) · {queue_metrics['finished']} finished")
+
+    st.subheader("Browser pool")
+    metrics = get_pool_service().metrics()
+    st.metric("Occupancy", f"{metrics['in_use']}/{metrics['contexts']}")
+    st.metric("Acquire latency p95", f"{metrics['acquire_ms_p95']:.1f} ms")
+    st.caption(f"{metrics['acquisitions']} acquisitions · {metrics['recycled']} contexts recycled · "
+               f"mean {metrics['acquire_ms_mean']:.1f} ms")
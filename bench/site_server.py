@@ -0,0 +1,57 @@
+# bench/site_server.py
+"""
+Static HTTP server for the offline copies of the demo apps in bench/sites/.
+
+    python -m bench.site_server --port 8090
+    NETWORK_MODE=local LOCAL_SITES_URL=http://127.0.0.1:8090 python main.py "..."
+
+Sites are stored per host (bench/sites/www.saucedemo.com/...), which is the layout
+NETWORK_MODE=local expects: https://<host>/<path> is served from /<host>/<path>.
+"""
+import argparse
+import functools
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+SITES_DIR = Path(__file__).parent / "sites"
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def end_headers(self):
+        # Each benchmark run must load the pages the same way
+        self.send_header("Cache-Control", "no-store")
+        super().end_headers()
+
+
+class SiteServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, sites_dir=SITES_DIR):
+        super().__init__(address, functools.partial(_Handler, directory=str(sites_dir)))
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_site_server(host="127.0.0.1", port=0, sites_dir=SITES_DIR) -> SiteServer:
+    """Start the site server on a background thread (port 0 picks a free port)."""
+    server = SiteServer((host, port), sites_dir)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the offline demo apps")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+
+    server = SiteServer((args.host, args.port))
+    print(f"Serving {SITES_DIR} on {server.base_url}")
+    server.serve_forever()
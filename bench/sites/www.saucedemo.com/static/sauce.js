@@ -0,0 +1,247 @@
+// Offline stand-in for https://www.saucedemo.com/ used by the benchmark suite.
+// Every page is rendered from #root[data-page]; ids, classes, the "session-username"
+// cookie and the "cart-contents" localStorage key follow the live site.
+(() => {
+  const USERS = ["standard_user", "problem_user", "performance_glitch_user", "error_user", "visual_user"];
+  const PASSWORD = "secret_sauce";
+  const PRODUCTS = [
+    {id: 4, name: "Sauce Labs Backpack", price: 29.99, desc: "carry.allTheThings() with the sleek, streamlined Sly Pack."},
+    {id: 0, name: "Sauce Labs Bike Light", price: 9.99, desc: "A red light isn't the desired state in testing but it sure helps when riding your bike at night."},
+    {id: 1, name: "Sauce Labs Bolt T-Shirt", price: 15.99, desc: "Get your testing superhero on with the Sauce Labs bolt T-shirt."},
+    {id: 5, name: "Sauce Labs Fleece Jacket", price: 49.99, desc: "It's not every day that you come across a midweight quarter-zip fleece jacket."},
+    {id: 2, name: "Sauce Labs Onesie", price: 7.99, desc: "Rib snap infant onesie for the junior automation engineer in development."},
+    {id: 3, name: "Test.allTheThings() T-Shirt (Red)", price: 15.99, desc: "This classic Sauce Labs t-shirt is perfect to wear when cozying up to your keyboard."},
+  ];
+  const slug = (p) => p.name.toLowerCase().replace(/ /g, "-");
+  const money = (n) => `$${n.toFixed(2)}`;
+  const root = document.getElementById("root");
+  const page = root.dataset.page;
+
+  const user = () => (document.cookie.match(/(?:^|; )session-username=([^;]*)/) || [])[1];
+  const cart = () => JSON.parse(localStorage.getItem("cart-contents") || "[]");
+  const setCart = (ids) => (ids.length ? localStorage.setItem("cart-contents", JSON.stringify(ids))
+                                       : localStorage.removeItem("cart-contents"));
+  const go = (path) => { location.href = path; };
+
+  function header(title) {
+    const count = cart().length;
+    return `
+      <div class="bm-menu-wrap" hidden>
+        <div class="bm-menu"><nav class="bm-item-list">
+          <a id="inventory_sidebar_link" class="bm-item menu-item" href="/inventory.html">All Items</a>
+          <a id="about_sidebar_link" class="bm-item menu-item" href="https://saucelabs.com/">About</a>
+          <a id="logout_sidebar_link" class="bm-item menu-item" href="#">Logout</a>
+          <a id="reset_sidebar_link" class="bm-item menu-item" href="#">Reset App State</a>
+        </nav></div>
+        <button id="react-burger-cross-btn">Close Menu</button>
+      </div>
+      <div class="primary_header">
+        <button id="react-burger-menu-btn">Open Menu</button>
+        <div class="app_logo">Swag Labs</div>
+        <div id="shopping_cart_container" class="shopping_cart_container">
+          <a class="shopping_cart_link" href="/cart.html" data-test="shopping-cart-link">${
+            count ? `<span class="shopping_cart_badge" data-test="shopping-cart-badge">${count}</span>` : ""}</a>
+        </div>
+      </div>
+      <div class="header_secondary_container"><span class="title" data-test="title">${title}</span>${
+        page === "inventory" ? `
+        <select class="product_sort_container" data-test="product-sort-container">
+          <option value="az">Name (A to Z)</option><option value="za">Name (Z to A)</option>
+          <option value="lohi">Price (low to high)</option><option value="hilo">Price (high to low)</option>
+        </select>` : ""}</div>`;
+  }
+
+  function bindHeader() {
+    const menu = root.querySelector(".bm-menu-wrap");
+    root.querySelector("#react-burger-menu-btn").onclick = () => { menu.hidden = false; };
+    root.querySelector("#react-burger-cross-btn").onclick = () => { menu.hidden = true; };
+    root.querySelector("#logout_sidebar_link").onclick = (e) => {
+      e.preventDefault();
+      document.cookie = "session-username=; path=/; expires=Thu, 01 Jan 1970 00:00:00 GMT";
+      setCart([]);
+      go("/");
+    };
+    root.querySelector("#reset_sidebar_link").onclick = (e) => { e.preventDefault(); setCart([]); render(); };
+  }
+
+  function cartItems(removable) {
+    return cart().map((id) => PRODUCTS.find((p) => p.id === id)).filter(Boolean).map((p) => `
+      <div class="cart_item" data-test="inventory-item">
+        <div class="cart_quantity">1</div>
+        <div class="cart_item_label">
+          <a id="item_${p.id}_title_link" href="#"><div class="inventory_item_name">${p.name}</div></a>
+          <div class="inventory_item_desc">${p.desc}</div>
+          <div class="item_pricebar"><div class="inventory_item_price">${money(p.price)}</div>${
+            removable ? `<button class="btn btn_secondary btn_small cart_button" id="remove-${slug(p)}"
+                                 data-id="${p.id}">Remove</button>` : ""}</div>
+        </div>
+      </div>`).join("");
+  }
+
+  const pages = {
+    login() {
+      root.innerHTML = `
+        <div class="login_container">
+          <div class="login_logo">Swag Labs</div>
+          <div class="login_wrapper"><div class="login-box"><form>
+            <input class="input_error form_input" placeholder="Username" type="text" id="user-name" name="user-name" data-test="username">
+            <input class="input_error form_input" placeholder="Password" type="password" id="password" name="password" data-test="password">
+            <div class="error-message-container"></div>
+            <input type="submit" class="submit-button btn_action" id="login-button" name="login-button" data-test="login-button" value="Login">
+          </form></div></div>
+        </div>`;
+      root.querySelector("form").onsubmit = (e) => {
+        e.preventDefault();
+        const name = root.querySelector("#user-name").value;
+        const password = root.querySelector("#password").value;
+        let error = null;
+        if (!name) error = "Username is required";
+        else if (!password) error = "Password is required";
+        else if (name === "locked_out_user" && password === PASSWORD) error = "Sorry, this user has been locked out.";
+        else if (!USERS.includes(name) || password !== PASSWORD) error = "Username and password do not match any user in this service";
+        if (error) {
+          const box = root.querySelector(".error-message-container");
+          box.classList.add("error");
+          box.innerHTML = `<h3 data-test="error">Epic sadface: ${error}</h3>`;
+          return;
+        }
+        const expires = new Date(Date.now() + 10 * 60 * 1000).toUTCString();
+        document.cookie = `session-username=${name}; path=/; expires=${expires}`;
+        go("/inventory.html");
+      };
+    },
+
+    inventory() {
+      const order = {az: (a, b) => a.name.localeCompare(b.name), za: (a, b) => b.name.localeCompare(a.name),
+                     lohi: (a, b) => a.price - b.price, hilo: (a, b) => b.price - a.price};
+      const sort = sessionStorage.getItem("sort") || "az";
+      const inCart = cart();
+      root.innerHTML = header("Products") + `
+        <div class="inventory_container"><div class="inventory_list" data-test="inventory-list">${
+          [...PRODUCTS].sort(order[sort]).map((p) => {
+            const added = inCart.includes(p.id);
+            return `
+            <div class="inventory_item" data-test="inventory-item">
+              <div class="inventory_item_img"><img alt="${p.name}" class="inventory_item_img" src="/static/media/${slug(p)}.jpg"></div>
+              <div class="inventory_item_description">
+                <div class="inventory_item_label">
+                  <a id="item_${p.id}_title_link" href="#"><div class="inventory_item_name">${p.name}</div></a>
+                  <div class="inventory_item_desc">${p.desc}</div>
+                </div>
+                <div class="pricebar">
+                  <div class="inventory_item_price">${money(p.price)}</div>
+                  <button class="btn ${added ? "btn_secondary" : "btn_primary"} btn_small btn_inventory"
+                          id="${added ? "remove" : "add-to-cart"}-${slug(p)}" data-id="${p.id}">${added ? "Remove" : "Add to cart"}</button>
+                </div>
+              </div>
+            </div>`;
+          }).join("")}</div></div>`;
+      bindHeader();
+      const select = root.querySelector(".product_sort_container");
+      select.value = sort;
+      select.onchange = () => { sessionStorage.setItem("sort", select.value); render(); };
+      root.querySelectorAll(".btn_inventory").forEach((button) => {
+        button.onclick = () => {
+          const id = Number(button.dataset.id);
+          setCart(cart().includes(id) ? cart().filter((i) => i !== id) : [...cart(), id]);
+          render();
+        };
+      });
+    },
+
+    cart() {
+      root.innerHTML = header("Your Cart") + `
+        <div class="cart_contents_container">
+          <div class="cart_list"><div class="cart_quantity_label">QTY</div><div class="cart_desc_label">Description</div>
+            ${cartItems(true)}</div>
+          <div class="cart_footer">
+            <button class="btn btn_secondary back btn_medium" id="continue-shopping">Continue Shopping</button>
+            <button class="btn btn_action btn_medium checkout_button" id="checkout">Checkout</button>
+          </div>
+        </div>`;
+      bindHeader();
+      root.querySelectorAll(".cart_button").forEach((button) => {
+        button.onclick = () => { setCart(cart().filter((i) => i !== Number(button.dataset.id))); render(); };
+      });
+      root.querySelector("#continue-shopping").onclick = () => go("/inventory.html");
+      root.querySelector("#checkout").onclick = () => go("/checkout-step-one.html");
+    },
+
+    "checkout-step-one"() {
+      root.innerHTML = header("Checkout: Your Information") + `
+        <div class="checkout_info_container"><form><div class="checkout_info">
+          <input class="input_error form_input" placeholder="First Name" type="text" id="first-name" data-test="firstName">
+          <input class="input_error form_input" placeholder="Last Name" type="text" id="last-name" data-test="lastName">
+          <input class="input_error form_input" placeholder="Zip/Postal Code" type="text" id="postal-code" data-test="postalCode">
+          <div class="error-message-container"></div>
+        </div>
+        <div class="checkout_buttons">
+          <button type="button" class="btn btn_secondary back btn_medium cart_cancel_link" id="cancel">Cancel</button>
+          <input type="submit" class="submit-button btn btn_primary cart_button btn_action" id="continue" value="Continue">
+        </div></form></div>`;
+      bindHeader();
+      root.querySelector("#cancel").onclick = () => go("/cart.html");
+      root.querySelector("form").onsubmit = (e) => {
+        e.preventDefault();
+        const missing = [["#first-name", "First Name"], ["#last-name", "Last Name"], ["#postal-code", "Postal Code"]]
+          .find(([sel]) => !root.querySelector(sel).value);
+        if (missing) {
+          const box = root.querySelector(".error-message-container");
+          box.classList.add("error");
+          box.innerHTML = `<h3 data-test="error">Error: ${missing[1]} is required</h3>`;
+          return;
+        }
+        go("/checkout-step-two.html");
+      };
+    },
+
+    "checkout-step-two"() {
+      const total = cart().map((id) => PRODUCTS.find((p) => p.id === id)).filter(Boolean).reduce((s, p) => s + p.price, 0);
+      const tax = Math.round(total * 8) / 100;
+      root.innerHTML = header("Checkout: Overview") + `
+        <div class="checkout_summary_container">
+          <div class="cart_list">${cartItems(false)}</div>
+          <div class="summary_info">
+            <div class="summary_info_label">Payment Information:</div>
+            <div class="summary_value_label">SauceCard #31337</div>
+            <div class="summary_subtotal_label" data-test="subtotal-label">Item total: ${money(total)}</div>
+            <div class="summary_tax_label" data-test="tax-label">Tax: ${money(tax)}</div>
+            <div class="summary_total_label" data-test="total-label">Total: ${money(total + tax)}</div>
+            <div class="cart_footer">
+              <button class="btn btn_secondary back btn_medium cart_cancel_link" id="cancel">Cancel</button>
+              <button class="btn btn_action btn_medium cart_button" id="finish">Finish</button>
+            </div>
+          </div>
+        </div>`;
+      bindHeader();
+      root.querySelector("#cancel").onclick = () => go("/inventory.html");
+      root.querySelector("#finish").onclick = () => { setCart([]); go("/checkout-complete.html"); };
+    },
+
+    "checkout-complete"() {
+      root.innerHTML = header("Checkout: Complete!") + `
+        <div class="checkout_complete_container" data-test="checkout-complete-container">
+          <h2 class="complete-header" data-test="complete-header">Thank you for your order!</h2>
+          <div class="complete-text">Your order has been dispatched, and will arrive just as fast as the pony can get there!</div>
+          <button class="btn btn_primary btn_small" id="back-to-products">Back Home</button>
+        </div>`;
+      bindHeader();
+      root.querySelector("#back-to-products").onclick = () => go("/inventory.html");
+    },
+  };
+
+  function render() {
+    if (page !== "login" && !user()) {
+      // Like the live site: inner pages need a session
+      go("/");
+      return;
+    }
+    pages[page]();
+    if (page !== "login") {
+      root.insertAdjacentHTML("beforeend",
+        '<footer class="footer"><div class="footer_copy">© 2025 Sauce Labs. All Rights Reserved.</div></footer>');
+    }
+  }
+
+  render();
+})();
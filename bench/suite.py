@@ -0,0 +1,329 @@
+# bench/suite.py
+"""
+Offline end-to-end benchmark suite.
+
+Every task in bench/tasks.yaml runs through `main.py run` in a fresh process. The
+live sites are replaced by the static copies in bench/sites (NETWORK_MODE=local)
+and OpenAI by utils/mock_openai.py serving the recorded completions. Nothing
+leaves the machine, and all state (dataset, browser state, caches) goes to a
+scratch folder.
+
+    python main.py bench                         # run, compare with the saved baseline
+    python main.py bench --save-baseline         # record a new baseline
+    python main.py bench --repeat 3 --threshold 0.15
+
+Reported per task (median over repeats): execution wall time, time to the first
+action, self time per trace phase, screenshot bytes and peak RSS of the agent and the largest browser
+process. Planning throughput (plans/minute) is measured separately with a warm
+retriever. A metric regresses when it is worse than the baseline by more than
+`threshold` (relative) and by more than its noise floor (absolute).
+
+No baseline is committed: timings and RSS depend on the machine, so a baseline
+recorded elsewhere would flag or hide regressions at random. Record one with
+--save-baseline on the machine that runs the comparison (it is written to
+bench/baselines/baseline.json). Until then `bench` only reports the results.
+"""
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+from rich import print
+from rich.table import Table
+
+BENCH_DIR = Path(__file__).parent
+REPO_ROOT = BENCH_DIR.parent
+TASKS_FILE = BENCH_DIR / "tasks.yaml"
+BASELINE_FILE = BENCH_DIR / "baselines" / "baseline.json"
+RESULTS_FILE = BENCH_DIR / "results" / "latest.json"
+DEFAULT_THRESHOLD = 0.20
+
+# Metrics checked against the baseline: (higher is better, absolute noise floor)
+TASK_METRICS = {
+    "run_wall_s": (False, 0.25),
+    "plan_ms": (False, 50),
+    "first_action_ms": (False, 100),
+    "screenshot_bytes": (False, 20_000),
+    "bytes_per_step": (False, 5_000),
+    "peak_rss_mb": (False, 20),
+    "peak_browser_rss_mb": (False, 40),
+}
+THROUGHPUT_METRICS = {
+    "plans_per_minute": (True, 30),
+    "batch_plans_per_minute": (True, 60),
+}
+
+
+def load_tasks(path=TASKS_FILE) -> list:
+    with open(path, "r") as f:
+        return (yaml.safe_load(f) or {}).get("tasks", [])
+
+
+def _rss_mb(kilobytes_or_bytes: int) -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return kilobytes_or_bytes / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def peak_rss() -> dict:
+    """Peak RSS of this process and of its largest (reaped) child, e.g. the browser."""
+    return {
+        "peak_rss_mb": round(_rss_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss), 1),
+        "peak_browser_rss_mb": round(_rss_mb(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss), 1),
+    }
+
+
+def bench_env(work_dir: Path, sites_url: str, llm_url: str) -> dict:
+    """
+    Environment for worker processes: offline sites and LLM, no plan cache, and every
+    state, cache and import path under `work_dir` so nothing in ~/.softlight is read or written.
+    """
+    env = dict(os.environ)
+    env.update({
+        "NETWORK_MODE": "local",
+        "LOCAL_SITES_URL": sites_url,
+        "OPENAI_BASE_URL": llm_url,
+        "OPENAI_API_KEY": "bench",
+        "HEADLESS": "1",
+        "PLAN_CACHE": "0",
+        "HF_HUB_OFFLINE": "1",
+        "SOFTLIGHT_DATASET_DIR": str(work_dir / "dataset"),
+        "SOFTLIGHT_STATE_DIR": str(work_dir / "state"),
+        "SOFTLIGHT_SNAPSHOT_DIR": str(work_dir / "snapshots"),
+        "SOFTLIGHT_LEGACY_DIR": str(work_dir / "legacy"),
+        "SOFTLIGHT_EMBEDDINGS_DIR": str(work_dir / "embeddings"),
+        "SOFTLIGHT_INDEX_DIR": str(work_dir / "faiss"),
+        "SOFTLIGHT_HAR_DIR": str(work_dir / "har"),
+        "SELECTOR_MEMORY_PATH": str(work_dir / "selectors.json"),
+        "REPAIR_CACHE_PATH": str(work_dir / "repair_patches.json"),
+    })
+    return env
+
+
+# ─────────────────────────────────────────────
+# Worker side (runs inside the spawned process)
+# ─────────────────────────────────────────────
+def run_metrics(run_dir: Path) -> dict:
+    """Phase latencies from the run's trace.json plus capture size."""
+    from agent.capture import CaptureProfile
+    from utils.run_store import read_run_records
+    from utils.tracing import TRACE_FILE, load_trace, phase_times
+
+    metrics = {"phases_ms": {}, "plan_ms": 0.0}
+    trace_path = run_dir / TRACE_FILE
+    if trace_path.exists():
+        events = load_trace(trace_path)
+        if events:
+            metrics["phases_ms"] = {cat: round(us / 1000, 1) for cat, us in phase_times(events).items()}
+            metrics["plan_ms"] = round(sum(e["dur"] for e in events if e["name"] == "plan") / 1000, 1)
+            steps = [e["ts"] for e in events if e["cat"] == "step"]
+            if steps:
+                metrics["first_action_ms"] = round((min(steps) - min(e["ts"] for e in events)) / 1000, 1)
+    # Bytes as recorded per step by the capture worker (thumbnails are not counted)
+    shots = [r for r in read_run_records(run_dir) if r.get("changed", True) and r.get("bytes") is not None]
+    metrics["capture_profile"] = CaptureProfile.from_env().name
+    metrics["screenshots"] = len(shots)
+    metrics["screenshot_bytes"] = sum(r["bytes"] for r in shots)
+    metrics["bytes_per_step"] = round(metrics["screenshot_bytes"] / len(shots)) if shots else 0
+    return metrics
+
+
+def task_worker(task: str, stream: bool = False) -> dict:
+    """Run one task through main.run and measure it."""
+    from main import run
+
+    result = run(task, stream=stream)
+    metrics = {"status": "error", "steps": 0, "run_wall_s": None}
+    if result is not None:
+        metrics.update(status=result.status, steps=result.steps_executed, run_wall_s=round(result.wall_time, 3))
+        if result.run_dir:
+            metrics.update(run_metrics(Path(result.run_dir)))
+    metrics.update(peak_rss())
+    return metrics
+
+
+def throughput_worker(tasks: list, rounds: int = 5) -> dict:
+    """Plans/minute for sequential generate_plan (warm) and for the concurrent batch planner."""
+    from agent.planner import generate_plan, generate_plans
+
+    generate_plan(tasks[0])  # warm-up: embedding model, FAISS index, HTTP client
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for task in tasks:
+            generate_plan(task)
+    sequential = len(tasks) * rounds / (time.perf_counter() - started) * 60
+
+    batch = tasks * rounds
+    started = time.perf_counter()
+    generate_plans(batch, base_url=os.environ["OPENAI_BASE_URL"])
+    concurrent = len(batch) / (time.perf_counter() - started) * 60
+    return {"plans_per_minute": round(sequential, 1), "batch_plans_per_minute": round(concurrent, 1)}
+
+
+# ─────────────────────────────────────────────
+# Driver
+# ─────────────────────────────────────────────
+def _spawn(mode: str, payload: str, env: dict) -> dict:
+    """Run a worker in a fresh process; returns its metrics plus the process wall time."""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as out:
+        out_path = out.name
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-m", "bench.suite", "--worker", mode, payload, out_path],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    wall = time.perf_counter() - started
+    try:
+        with open(out_path, "r") as f:
+            metrics = json.load(f)
+    except (OSError, ValueError):
+        tail = "\n".join(proc.stdout.splitlines()[-15:])
+        metrics = {"status": "crashed", "error": f"exit code {proc.returncode}\n{tail}"}
+    finally:
+        Path(out_path).unlink(missing_ok=True)
+    metrics["process_wall_s"] = round(wall, 3)
+    return metrics
+
+
+def _median(runs: list) -> dict:
+    """Median of each numeric metric across repeats; other fields from the last run."""
+    merged = dict(runs[-1])
+    for key, value in runs[-1].items():
+        values = [r.get(key) for r in runs]
+        if isinstance(value, (int, float)) and all(isinstance(v, (int, float)) for v in values):
+            merged[key] = round(statistics.median(values), 3)
+    phases = {cat for r in runs for cat in r.get("phases_ms", {})}
+    merged["phases_ms"] = {cat: round(statistics.median(r.get("phases_ms", {}).get(cat, 0.0) for r in runs), 1)
+                           for cat in sorted(phases)}
+    return merged
+
+
+def run_suite(tasks_file=TASKS_FILE, repeat: int = 1, llm_latency_ms: int = 0, keep: bool = False,
+              stream: bool = False, capture_profile: str = None) -> dict:
+    from bench.site_server import start_site_server
+    from utils.mock_openai import start_mock_server
+
+    tasks = load_tasks(tasks_file)
+    recordings = {t["task"]: t["completion"] for t in tasks if t.get("completion")}
+    sites = start_site_server()
+    llm = start_mock_server(recordings=recordings, latency_ms=llm_latency_ms)
+    work_dir = Path(tempfile.mkdtemp(prefix="softlight-bench-"))
+    env = bench_env(work_dir, sites.base_url, llm.base_url)
+    if capture_profile:
+        env["CAPTURE_PROFILE"] = capture_profile
+    print(f"[blue] Benchmark: sites at {sites.base_url}, mock LLM at {llm.base_url}, scratch {work_dir}[/blue]")
+
+    results = {
+        "created": time.time(),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "settings": {"repeat": repeat, "llm_latency_ms": llm_latency_ms, "stream": stream,
+                     "capture_profile": capture_profile, "tasks_file": str(tasks_file)},
+        "tasks": {},
+    }
+    try:
+        for t in tasks:
+            runs = []
+            for i in range(repeat):
+                print(f"[cyan] {t['name']} ({i + 1}/{repeat})[/cyan]")
+                runs.append(_spawn("stream" if stream else "task", t["task"], env))
+            results["tasks"][t["name"]] = _median(runs)
+        llm_tasks = [t["task"] for t in tasks if t.get("completion")]
+        if llm_tasks:
+            print("[cyan] planning throughput[/cyan]")
+            results["throughput"] = _spawn("throughput", json.dumps(llm_tasks), env)
+    finally:
+        sites.shutdown()
+        llm.shutdown()
+        if not keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def _relative_change(current, baseline, higher_is_better: bool):
+    if not baseline:
+        return None
+    change = (current - baseline) / baseline
+    return -change if higher_is_better else change
+
+
+def compare(results: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """Metrics that got worse than the baseline by more than `threshold` and the noise floor."""
+    checks = []
+    for name, metrics in results.get("tasks", {}).items():
+        base = baseline.get("tasks", {}).get(name)
+        if base:
+            checks += [(f"{name}.{m}", metrics.get(m), base.get(m), spec) for m, spec in TASK_METRICS.items()]
+    base_tp = baseline.get("throughput", {})
+    checks += [(f"throughput.{m}", results.get("throughput", {}).get(m), base_tp.get(m), spec)
+               for m, spec in THROUGHPUT_METRICS.items()]
+
+    regressions = []
+    for label, current, base, (higher_is_better, floor) in checks:
+        if not isinstance(current, (int, float)) or not isinstance(base, (int, float)):
+            continue
+        change = _relative_change(current, base, higher_is_better)
+        if change is not None and change > threshold and abs(current - base) > floor:
+            regressions.append({"metric": label, "baseline": base, "current": current, "change": round(change, 3)})
+    return regressions
+
+
+def print_report(results: dict, regressions: list = None):
+    table = Table(title="Benchmark — per task (median)")
+    for col in ("Task", "Status", "Steps", "Run (s)", "Plan (ms)", "First action (ms)", "Top phases (ms)", "Screens (KB)", "KB/step", "RSS (MB)", "Browser RSS (MB)"):
+        table.add_column(col)
+    for name, m in results["tasks"].items():
+        top = sorted(m.get("phases_ms", {}).items(), key=lambda kv: -kv[1])[:3]
+        table.add_row(
+            name, str(m.get("status")), str(m.get("steps", "-")), str(m.get("run_wall_s", "-")),
+            str(m.get("plan_ms", "-")), str(m.get("first_action_ms", "-")), ", ".join(f"{c} {v:.0f}" for c, v in top) or "-",
+            f"{m.get('screenshot_bytes', 0) / 1024:.0f}", f"{m.get('bytes_per_step', 0) / 1024:.1f}",
+            str(m.get("peak_rss_mb", "-")),
+            str(m.get("peak_browser_rss_mb", "-")),
+        )
+    print(table)
+    tp = results.get("throughput", {})
+    print(f"Planning throughput: {tp.get('plans_per_minute', '-')} plans/min sequential, "
+          f"{tp.get('batch_plans_per_minute', '-')} plans/min batched")
+    for name, m in results["tasks"].items():
+        if m.get("error"):
+            print(f"[red]{name}: {m['error']}[/red]")
+
+    if regressions is None:
+        return
+    if not regressions:
+        print("[green] No regressions against the baseline[/green]")
+        return
+    table = Table(title="Regressions")
+    for col in ("Metric", "Baseline", "Current", "Worse by"):
+        table.add_column(col)
+    for r in regressions:
+        table.add_row(r["metric"], str(r["baseline"]), str(r["current"]), f"{r['change']:.0%}")
+    print(table)
+
+
+def save_json(data: dict, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def _worker_main(argv):
+    mode, payload, out_path = argv
+    if mode == "throughput":
+        metrics = throughput_worker(json.loads(payload))
+    else:
+        metrics = task_worker(payload, stream=mode == "stream")
+    save_json(metrics, Path(out_path))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        sys.path.insert(0, str(REPO_ROOT))
+        _worker_main(sys.argv[2:])
@@ -0,0 +1,136 @@
+# browser/network.py
+"""
+Network policy and HAR record/replay for browser contexts.
+
+NETWORK_MODE:
+  live    – go to the network, applying the per-app route policy (default)
+  record  – as live, and record the app's traffic into ~/.softlight/har/<app>.har
+  replay  – serve every request from the recorded HAR; anything missing is aborted (no network)
+  local   – serve every request from a local static mirror at LOCAL_SITES_URL, where
+            https://<host>/<path> maps to <LOCAL_SITES_URL>/<host>/<path> (see bench/site_server.py)
+Set NETWORK_POLICY=0 to disable resource blocking/stubbing.
+"""
+import base64
+import os
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import yaml
+
+NETWORK_MODE = os.getenv("NETWORK_MODE", "live")
+NETWORK_POLICY = os.getenv("NETWORK_POLICY", "1") != "0"
+HAR_DIR = Path(os.getenv("SOFTLIGHT_HAR_DIR", Path.home() / ".softlight" / "har"))
+LOCAL_SITES_URL = os.getenv("LOCAL_SITES_URL", "http://127.0.0.1:8090")
+POLICY_FILE = Path(__file__).with_name("network_policies.yaml")
+
+# 1x1 transparent PNG
+_PLACEHOLDER_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+)
+_STUBS = {
+    "image": ("image/png", _PLACEHOLDER_PNG),
+    "stylesheet": ("text/css", b""),
+    "script": ("application/javascript", b""),
+}
+
+_policies = None
+
+
+def load_policies(path=POLICY_FILE) -> dict:
+    global _policies
+    if _policies is None:
+        with open(path, "r") as f:
+            _policies = yaml.safe_load(f) or {}
+    return _policies
+
+
+def policy_for(app_name: str) -> dict:
+    """The default policy merged with the app's own entry (lists are concatenated)."""
+    policies = load_policies()
+    default, own = policies.get("default") or {}, policies.get(app_name) or {}
+    keys = ("block_resource_types", "stub_resource_types", "block_domains")
+    return {k: sorted(set(default.get(k, [])) | set(own.get(k, []))) for k in keys}
+
+
+def har_path(app_name: str) -> Path:
+    return HAR_DIR / f"{app_name}.har"
+
+
+class RoutePolicy:
+    """Route handler that aborts or stubs requests according to an app policy."""
+
+    def __init__(self, policy: dict):
+        self.block_types = set(policy.get("block_resource_types", []))
+        self.stub_types = set(policy.get("stub_resource_types", [])) - self.block_types
+        self.block_domains = tuple(policy.get("block_domains", []))
+        self.blocked = 0
+        self.stubbed = 0
+
+    def _blocked_host(self, url: str) -> bool:
+        host = urlsplit(url).hostname or ""
+        return any(host == d or host.endswith("." + d) for d in self.block_domains)
+
+    async def handle(self, route):
+        request = route.request
+        if request.resource_type in self.block_types or self._blocked_host(request.url):
+            self.blocked += 1
+            await route.abort()
+        elif request.resource_type in self.stub_types and request.resource_type in _STUBS:
+            self.stubbed += 1
+            content_type, body = _STUBS[request.resource_type]
+            await route.fulfill(status=200, content_type=content_type, body=body)
+        else:
+            # Next handler (HAR replay/record) or the network
+            await route.fallback()
+
+
+class LocalSites:
+    """Route handler that answers every request from a local mirror instead of the live host."""
+
+    def __init__(self, base_url: str = LOCAL_SITES_URL):
+        self.base_url = base_url.rstrip("/")
+
+    def local_url(self, url: str) -> str:
+        parts = urlsplit(url)
+        return f"{self.base_url}/{parts.hostname}{parts.path or '/'}" + (f"?{parts.query}" if parts.query else "")
+
+    async def handle(self, route):
+        try:
+            response = await route.fetch(url=self.local_url(route.request.url))
+        except Exception:
+            # Mirror unreachable: never fall through to the network
+            await route.abort()
+            return
+        await route.fulfill(response=response)
+
+
+async def apply_network_policy(context, app_name: str, mode: str = None):
+    """
+    Install HAR record/replay and the app's route policy on `context`.
+    Returns the RoutePolicy (for its counters), or None if no policy is active.
+    In record mode the HAR is written when the context closes.
+    """
+    mode = mode or NETWORK_MODE
+    path = har_path(app_name)
+    # Handlers run in reverse registration order: the HAR route goes first so the policy sees requests before it
+    if mode == "record":
+        HAR_DIR.mkdir(parents=True, exist_ok=True)
+        await context.route_from_har(str(path), update=True, update_content="embed")
+        print(f"[blue] Recording {app_name} traffic to {path}[/blue]")
+    elif mode == "replay":
+        if not path.exists():
+            raise FileNotFoundError(f"No HAR recorded for {app_name} at {path}; run once with NETWORK_MODE=record")
+        await context.route_from_har(str(path), not_found="abort")
+    elif mode == "local":
+        await context.route("**/*", LocalSites(LOCAL_SITES_URL).handle)
+    elif mode != "live":
+        raise ValueError(f"Unknown NETWORK_MODE '{mode}' (expected live, record, replay or local)")
+
+    if not NETWORK_POLICY:
+        return None
+    policy = policy_for(app_name)
+    if not any(policy.values()):
+        return None
+    route_policy = RoutePolicy(policy)
+    await context.route("**/*", route_policy.handle)
+    return route_policy
@@ -1,56 +1,63 @@
 # browser/playwright_setup.py
-import json, os
+import asyncio
+import os
 from pathlib import Path
 from playwright.async_api import async_playwright
 
+from browser.network import apply_network_policy
+from browser.state_store import get_state_store, seed_storage_state
+
 # Use consistent storage directories under ~/.softlight
 SOFTLIGHT_DIR = Path(os.path.expanduser("~/.softlight"))
-COOKIES_DIR = SOFTLIGHT_DIR / "cookies"
-STATE_DIR = SOFTLIGHT_DIR / "state"
-
-COOKIES_DIR.mkdir(parents=True, exist_ok=True)
-STATE_DIR.mkdir(parents=True, exist_ok=True)
+# HEADLESS=1 runs the single-run browser without a window (CI, benchmarks)
+HEADLESS = os.getenv("HEADLESS", "0") == "1"
 
 
 async def get_browser_context(app_name: str):
-    """Return a Playwright browser context that reuses full session state (cookies + localStorage)."""
-    cookie_path = COOKIES_DIR / f"{app_name}_cookies.json"
-    state_path = STATE_DIR / f"state_{app_name}.json"
+    """
+    Return a Playwright browser context seeded with the app's saved session state
+    (cookies + localStorage) through `storage_state`, so no page load is needed.
+    The fifth value is the state version the context was seeded from.
+    """
+    store = get_state_store()
+    version, _ = store.load(app_name)
 
     p = await async_playwright().start()
-    browser = await p.chromium.launch(headless=False)
+    browser = await p.chromium.launch(headless=HEADLESS)
 
-    # Load previous state if available
-    if state_path.exists():
-        context = await browser.new_context(storage_state=str(state_path))
-        print(f"[green] Loaded persisted state for {app_name}[/green]")
+    context = await browser.new_context(storage_state=store.seed_state(app_name))
+    if version:
+        print(f"[green] Loaded persisted state for {app_name} (v{version})[/green]")
     else:
-        context = await browser.new_context()
         print(f"[yellow] Created new browser context for {app_name}[/yellow]")
 
-    # Also restore cookies (for backward compatibility)
-    if cookie_path.exists():
-        try:
-            with open(cookie_path, "r") as f:
-                cookies = json.load(f)
-                await context.add_cookies(cookies)
-                print(f"[blue] Loaded saved cookies for {app_name}[/blue]")
-        except Exception as e:
-            print(f"[red] Couldn't load cookies: {e}[/red]")
+    # Resource blocking/stubbing and HAR record/replay (NETWORK_MODE)
+    await apply_network_policy(context, app_name)
 
     page = await context.new_page()
-    return p, browser, context, page, str(cookie_path)
-
-
-async def save_cookies_and_state(context, app_name: str, cookie_path: str):
-    """Save both cookies and full storage state for persistence."""
-    # Save cookies
-    cookies = await context.cookies()
-    with open(cookie_path, "w") as f:
-        json.dump(cookies, f)
-    print(f"[blue] Cookies saved to {cookie_path}[/blue]")
-
-    # Save Playwright state (localStorage + sessionStorage)
-    state_path = STATE_DIR / f"state_{app_name}.json"
-    await context.storage_state(path=str(state_path))
-    print(f"[green] State saved to {state_path}[/green]")
+    return p, browser, context, page, version
+
+
+async def save_cookies_and_state(context, app_name: str, base_version: int = None):
+    """Save cookies and localStorage of `context` to the state store (atomic, versioned)."""
+    storage_state = await context.storage_state()
+    # Locked file write; off the loop so other pooled runs keep going
+    version = await asyncio.to_thread(get_state_store().save, app_name, storage_state, base_version)
+    print(f"[green] State saved for {app_name} (v{version})[/green]")
+    return version
+
+
+async def seed_context(context, app_name: str):
+    """
+    Prepare an existing (e.g. pooled) context for `app_name`: network policy and persisted state.
+    Returns the state version it was seeded from, to pass to save_cookies_and_state() afterwards.
+    """
+    await apply_network_policy(context, app_name)
+    store = get_state_store()
+    version = None
+    try:
+        version, _ = store.load(app_name)
+        await seed_storage_state(context, store.seed_state(app_name))
+    except Exception as e:
+        print(f"[yellow] Couldn't seed pooled context for {app_name}: {e}[/yellow]")
+    return version
@@ -0,0 +1,204 @@
+# browser/pool.py
+import asyncio
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from rich import print
+
+BROWSER_POOL_BROWSERS = int(os.getenv("BROWSER_POOL_BROWSERS", "1"))
+BROWSER_POOL_CONTEXTS = int(os.getenv("BROWSER_POOL_CONTEXTS", "4"))
+# Attempts to refill a slot after a run before it is left for acquire() to recreate
+POOL_REFILL_ATTEMPTS = int(os.getenv("POOL_REFILL_ATTEMPTS", "3"))
+# Seconds a slot that could not be recreated sits out before acquire() tries it again
+POOL_DEAD_SLOT_RETRY_S = float(os.getenv("POOL_DEAD_SLOT_RETRY_S", "5"))
+
+
+@dataclass
+class PooledContext:
+    """A warm context + page handed out by the pool for one run."""
+    slot: int          # index of the browser that owns the context
+    context: object    # None for a dead slot, recreated by the next acquire()
+    page: object
+
+
+class BrowserPool:
+    """
+    In-process pool of pre-launched headless Chromium browsers with pre-created contexts.
+
+    acquire() hands out a warm context; on return the context is closed and a fresh
+    one is created in the background, so no state leaks between runs and the next
+    caller does not pay for a browser launch. A browser that has crashed is relaunched.
+    A slot whose refill keeps failing stays in the pool as a placeholder that acquire()
+    recreates; acquire() raises once no slot can be recreated.
+    """
+
+    def __init__(self, browsers=BROWSER_POOL_BROWSERS, contexts=BROWSER_POOL_CONTEXTS, headless=True, **launch_options):
+        self.browser_count = max(1, browsers)
+        self.context_count = max(1, contexts)
+        self.headless = headless
+        self.launch_options = launch_options
+        self._playwright = None
+        self._browsers = []
+        self._idle = None
+        self._slot_locks = []
+        self._background = set()
+        self._latencies = deque(maxlen=1000)
+        self.in_use = 0
+        self.acquisitions = 0
+        self.recycled = 0
+        self.dead = 0
+
+    async def start(self):
+        from playwright.async_api import async_playwright
+
+        started = time.perf_counter()
+        self._idle = asyncio.Queue()
+        self._playwright = await async_playwright().start()
+        self._browsers = [await self._launch() for _ in range(self.browser_count)]
+        self._slot_locks = [asyncio.Lock() for _ in self._browsers]
+        for i in range(self.context_count):
+            await self._idle.put(await self._new_lease(i % self.browser_count))
+        print(f"[green] Browser pool ready: {self.browser_count} browser(s), {self.context_count} warm context(s) "
+              f"in {time.perf_counter() - started:.1f}s[/green]")
+        return self
+
+    async def close(self):
+        for task in list(self._background):
+            task.cancel()
+        for browser in self._browsers:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._browsers, self._playwright = [], None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _launch(self):
+        return await self._playwright.chromium.launch(headless=self.headless, **self.launch_options)
+
+    async def _new_lease(self, slot: int) -> PooledContext:
+        async with self._slot_locks[slot]:
+            if not self._browsers[slot].is_connected():
+                print(f"[yellow] Pooled browser {slot} disconnected — relaunching[/yellow]")
+                self._browsers[slot] = await self._launch()
+        context = await self._browsers[slot].new_context()
+        page = await context.new_page()
+        return PooledContext(slot, context, page)
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Borrow a warm context for the duration of the `async with` block."""
+        started = time.perf_counter()
+        lease = await self._idle.get()
+        while lease.context is None:
+            lease = await self._revive(lease)
+        self._latencies.append(time.perf_counter() - started)
+        self.in_use += 1
+        self.acquisitions += 1
+        try:
+            yield lease
+        finally:
+            self.in_use -= 1
+            self._spawn(self._recycle(lease))
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _revive(self, placeholder: PooledContext) -> PooledContext:
+        """Recreate a dead slot; on failure wait for another lease, or raise if every slot is dead."""
+        try:
+            lease = await self._new_lease(placeholder.slot)
+        except Exception as e:
+            if self.dead >= self.context_count:
+                await self._idle.put(placeholder)
+                raise RuntimeError(f"Browser pool has no live contexts; recreating slot {placeholder.slot} "
+                                   f"failed: {e}") from e
+            print(f"[yellow] Browser pool slot {placeholder.slot} still down ({e})[/yellow]")
+            self._spawn(self._requeue_later(placeholder))
+            return await self._idle.get()
+        self.dead -= 1
+        print(f"[green] Browser pool slot {placeholder.slot} recreated[/green]")
+        return lease
+
+    async def _requeue_later(self, placeholder: PooledContext):
+        await asyncio.sleep(POOL_DEAD_SLOT_RETRY_S)
+        await self._idle.put(placeholder)
+
+    async def _recycle(self, lease: PooledContext):
+        try:
+            await lease.context.close()
+        except Exception:
+            pass
+        for attempt in range(max(1, POOL_REFILL_ATTEMPTS)):
+            try:
+                await self._idle.put(await self._new_lease(lease.slot))
+                self.recycled += 1
+                return
+            except Exception as e:
+                error = e
+                await asyncio.sleep(0.5 * 2 ** attempt)
+        # Keep the slot: the next acquire() that draws it tries again
+        print(f"[red] Could not refill browser pool slot {lease.slot}: {error}[/red]")
+        self.dead += 1
+        await self._idle.put(PooledContext(lease.slot, None, None))
+
+    def metrics(self) -> dict:
+        """Occupancy and acquisition-latency figures for dashboards and logs."""
+        latencies_ms = sorted(l * 1000 for l in self._latencies)
+
+        def pct(p):
+            return latencies_ms[min(len(latencies_ms) - 1, int(p * len(latencies_ms)))] if latencies_ms else 0.0
+
+        return {
+            "browsers": self.browser_count,
+            "contexts": self.context_count,
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "in_use": self.in_use,
+            "occupancy": self.in_use / self.context_count,
+            "acquisitions": self.acquisitions,
+            "recycled": self.recycled,
+            "dead": self.dead,
+            "acquire_ms_mean": statistics.fmean(latencies_ms) if latencies_ms else 0.0,
+            "acquire_ms_p50": pct(0.50),
+            "acquire_ms_p95": pct(0.95),
+            "acquire_ms_max": latencies_ms[-1] if latencies_ms else 0.0,
+        }
+
+
+class BrowserPoolService:
+    """
+    Runs a BrowserPool on its own event-loop thread so synchronous callers
+    (e.g. the Streamlit app) can share warm browsers across requests.
+    """
+
+    def __init__(self, **pool_options):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="browser-pool", daemon=True)
+        self.thread.start()
+        self.pool = BrowserPool(**pool_options)
+        self.submit(self.pool.start()).result()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the pool's loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def metrics(self) -> dict:
+        return self.pool.metrics()
+
+    def close(self):
+        self.submit(self.pool.close()).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
@@ -0,0 +1,161 @@
+# browser/session_snapshot.py
+"""
+Logged-in session snapshots.
+
+The first plan that starts with a login logs in once in a scratch context and
+saves the authenticated `storage_state`. Later plans for the same app and user
+get that session copied into their own context and skip the login steps: the
+plan starts at the post-login page instead. Snapshots are keyed by user and a hash
+of the password, so a plan logging in with other credentials (e.g. testing the
+invalid-password error) never lands on a saved valid session. Login-only plans are left alone
+because the login itself is what they capture.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from dsl.schema import DSLAction
+from browser.network import NETWORK_MODE, apply_network_policy
+from browser.state_store import seed_storage_state
+
+SNAPSHOT_DIR = Path(os.getenv("SOFTLIGHT_SNAPSHOT_DIR", Path.home() / ".softlight" / "snapshots"))
+SESSION_SNAPSHOT_TTL_MINUTES = float(os.getenv("SESSION_SNAPSHOT_TTL_MINUTES", "30"))
+# Set SESSION_SNAPSHOTS=0 to log in on every run
+SESSION_SNAPSHOTS = os.getenv("SESSION_SNAPSHOTS", "1") != "0"
+# A snapshot whose auth cookie expires within this margin is treated as expired
+_EXPIRY_MARGIN_S = 60
+
+LOGIN_SPECS = {
+    "saucedemo": {
+        "start_url": "https://www.saucedemo.com/",
+        "landing_url": "https://www.saucedemo.com/inventory.html",
+        "username": "#user-name",
+        "password": "#password",
+        "submit": "#login-button",
+        "success": ".inventory_list",
+        "auth_cookie": "session-username",
+    },
+}
+
+_locks = {}
+
+
+def _lock(key: str) -> asyncio.Lock:
+    if key not in _locks:
+        _locks[key] = asyncio.Lock()
+    return _locks[key]
+
+
+def credentials_key(username: str, password: str) -> str:
+    digest = hashlib.sha256(f"{username}\n{password}".encode("utf-8")).hexdigest()[:12]
+    return f"{username}_{digest}"
+
+
+def snapshot_path(app_name: str, username: str, password: str) -> Path:
+    return SNAPSHOT_DIR / f"{app_name}_{credentials_key(username, password)}.json"
+
+
+def is_valid(path: Path, spec: dict, ttl_minutes: float = SESSION_SNAPSHOT_TTL_MINUTES) -> bool:
+    """Snapshot exists, is younger than the TTL and still holds an unexpired auth cookie."""
+    if not path.exists() or time.time() - path.stat().st_mtime > ttl_minutes * 60:
+        return False
+    try:
+        with open(path, "r") as f:
+            state = json.load(f)
+    except Exception:
+        return False
+    for cookie in state.get("cookies", []):
+        if cookie.get("name") == spec["auth_cookie"]:
+            expires = cookie.get("expires", -1)
+            return expires == -1 or expires > time.time() + _EXPIRY_MARGIN_S
+    return False
+
+
+def split_login(plan, spec: dict):
+    """
+    Return (username, password, rest) when the plan opens with a login for `spec`
+    and does more than log in; otherwise None.
+    """
+    username = password = None
+    for i, step in enumerate(plan):
+        if step.action == "fill" and step.target == spec["username"]:
+            username = step.value
+        elif step.action == "fill" and step.target == spec["password"]:
+            password = step.value
+        elif step.action == "find_and_click" and step.target == spec["submit"]:
+            rest = list(plan[i + 1:])
+            if not username or not password or all(s.action in ("expect", "wait_for") for s in rest):
+                return None  # login-only plan: keep the login steps
+            return username, password, rest
+        elif not (step.action == "open" or step.action in ("expect", "wait_for")):
+            return None
+    return None
+
+
+async def _login(browser, app_name: str, spec: dict, username: str, password: str, path: Path):
+    context = await browser.new_context()
+    try:
+        # Never record the scratch login into the app's HAR
+        await apply_network_policy(context, app_name, "live" if NETWORK_MODE == "record" else NETWORK_MODE)
+        page = await context.new_page()
+        await page.goto(spec["start_url"], wait_until="domcontentloaded")
+        await page.fill(spec["username"], username)
+        await page.fill(spec["password"], password)
+        await page.click(spec["submit"])
+        await page.wait_for_selector(spec["success"], timeout=10000)
+        state = await context.storage_state()
+    finally:
+        await context.close()
+
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=SNAPSHOT_DIR, suffix=".json")
+    with os.fdopen(fd, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+    print(f"[green] Saved {app_name} session snapshot for {username}[/green]")
+
+
+async def ensure_snapshot(browser, app_name: str, username: str, password: str):
+    """Path of a valid snapshot for (app, user), logging in once if needed; None if login fails."""
+    spec = LOGIN_SPECS[app_name]
+    path = snapshot_path(app_name, username, password)
+    async with _lock(f"{app_name}/{credentials_key(username, password)}"):
+        if is_valid(path, spec):
+            return path
+        try:
+            await _login(browser, app_name, spec, username, password, path)
+        except Exception as e:
+            print(f"[yellow] Could not create {app_name} session snapshot: {e}[/yellow]")
+            return None
+    return path
+
+
+async def seed_from_snapshot(context, path: Path):
+    """Copy a snapshot's cookies and localStorage into an existing context without loading a page."""
+    with open(path, "r") as f:
+        await seed_storage_state(context, json.load(f))
+
+
+async def fork_session(context, app_name: str, plan):
+    """
+    If `plan` starts with a login it does not need to capture, seed `context` from the
+    app's session snapshot and return (plan without the login steps, True).
+    Otherwise return (plan, False) unchanged.
+    """
+    spec = LOGIN_SPECS.get(app_name)
+    if not SESSION_SNAPSHOTS or spec is None:
+        return plan, False
+    login = split_login(plan, spec)
+    if login is None:
+        return plan, False
+    username, password, rest = login
+    path = await ensure_snapshot(context.browser, app_name, username, password)
+    if path is None:
+        return plan, False
+    await seed_from_snapshot(context, path)
+    print(f"[green] Forked logged-in {app_name} session for {username}; skipping login steps[/green]")
+    return [DSLAction(action="open", target=spec["landing_url"])] + rest, True
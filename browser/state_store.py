@@ -0,0 +1,177 @@
+# browser/state_store.py
+"""
+Unified, versioned browser state per app (cookies + localStorage), replacing the
+separate ~/.softlight/cookies, state and localstorage files.
+
+A context is seeded without loading any page: new contexts get Playwright's
+`storage_state`; existing (pooled) contexts get add_cookies() plus an init script
+that restores localStorage on the first page load of each tab.
+
+Writes are atomic (temp file + rename) under a per-app lock that also works across
+processes. Every write bumps the version; a writer that started from an older
+version is merged into the newer state instead of overwriting it.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+SOFTLIGHT_DIR = Path(os.path.expanduser("~/.softlight"))
+STATE_STORE_DIR = Path(os.getenv("SOFTLIGHT_STATE_DIR", SOFTLIGHT_DIR / "state_store"))
+# Where the pre-store state, cookies and localstorage folders are imported from
+LEGACY_STATE_DIR = Path(os.getenv("SOFTLIGHT_LEGACY_DIR", SOFTLIGHT_DIR))
+
+# Per-app seeding rules. SauceDemo starts every run from a clean cart (its localStorage
+# is not restored); TodoMVC keeps its todo list between runs.
+APP_STATE = {
+    "saucedemo": {"origin": "https://www.saucedemo.com", "restore_local_storage": False},
+    "todomvc": {"origin": "https://demo.playwright.dev", "restore_local_storage": True},
+}
+
+# Restores localStorage once per tab; sessionStorage survives in-tab navigations, so later
+# page loads keep whatever the plan changed instead of being reset to the saved state.
+SEED_STORAGE_JS = """
+(origins) => {
+    const entry = origins.find((o) => o.origin === location.origin);
+    if (!entry || sessionStorage.getItem("__softlight_seeded")) return;
+    for (const {name, value} of entry.localStorage) localStorage.setItem(name, value);
+    sessionStorage.setItem("__softlight_seeded", "1");
+}
+"""
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def merge_storage_states(base: dict, newer: dict) -> dict:
+    """Cookies by (name, domain, path) and localStorage items by (origin, name); `newer` wins."""
+    cookies = {(c["name"], c.get("domain"), c.get("path")): c for c in base.get("cookies", [])}
+    cookies.update({(c["name"], c.get("domain"), c.get("path")): c for c in newer.get("cookies", [])})
+    origins = {o["origin"]: {i["name"]: i["value"] for i in o.get("localStorage", [])} for o in base.get("origins", [])}
+    for o in newer.get("origins", []):
+        origins.setdefault(o["origin"], {}).update({i["name"]: i["value"] for i in o.get("localStorage", [])})
+    return {
+        "cookies": list(cookies.values()),
+        "origins": [{"origin": origin, "localStorage": [{"name": k, "value": v} for k, v in items.items()]}
+                    for origin, items in origins.items()],
+    }
+
+
+class StateStore:
+    def __init__(self, root=STATE_STORE_DIR):
+        self.root = Path(root)
+
+    def _path(self, app_name: str) -> Path:
+        return self.root / f"{app_name}.json"
+
+    @contextmanager
+    def _locked(self, app_name: str):
+        with _thread_locks_guard:
+            thread_lock = _thread_locks.setdefault(app_name, threading.Lock())
+        with thread_lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(self.root / f"{app_name}.lock", "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self, app_name: str):
+        path = self._path(app_name)
+        if not path.exists():
+            return None
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"[yellow] Ignoring unreadable state for {app_name}: {e}[/yellow]")
+            return None
+
+    def load(self, app_name: str):
+        """(version, storage_state) for `app_name`; (0, None) if nothing is stored yet."""
+        record = self._read(app_name)
+        if record is None:
+            legacy = _legacy_state(app_name)
+            return (0, legacy) if legacy else (0, None)
+        return record.get("version", 0), record.get("storage_state")
+
+    def save(self, app_name: str, storage_state: dict, base_version: int = None) -> int:
+        """
+        Store a context's storage_state and return the new version. If another run
+        saved since `base_version` was loaded, the two states are merged.
+        """
+        with self._locked(app_name):
+            record = self._read(app_name) or {"version": 0, "storage_state": {}}
+            current = record.get("version", 0)
+            if base_version is not None and base_version != current and record.get("storage_state"):
+                storage_state = merge_storage_states(record["storage_state"], storage_state)
+            record = {"version": current + 1, "updated": time.time(), "storage_state": storage_state}
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".json")
+            with os.fdopen(fd, "w") as f:
+                json.dump(record, f)
+            os.replace(tmp_path, self._path(app_name))
+        return current + 1
+
+    def seed_state(self, app_name: str) -> dict:
+        """The stored state filtered by the app's seeding rules (usable as storage_state=)."""
+        _, state = self.load(app_name)
+        if not state:
+            return {"cookies": [], "origins": []}
+        rules = APP_STATE.get(app_name, {"restore_local_storage": True})
+        origins = state.get("origins", []) if rules["restore_local_storage"] else []
+        return {"cookies": state.get("cookies", []), "origins": origins}
+
+
+def _legacy_state(app_name: str):
+    """One-time import of the pre-store files (state_<app>.json, <app>_cookies.json, localstorage)."""
+    state = {"cookies": [], "origins": []}
+    legacy_state = LEGACY_STATE_DIR / "state" / f"state_{app_name}.json"
+    legacy_cookies = LEGACY_STATE_DIR / "cookies" / f"{app_name}_cookies.json"
+    try:
+        if legacy_state.exists():
+            with open(legacy_state, "r") as f:
+                state = merge_storage_states(state, json.load(f))
+        if legacy_cookies.exists():
+            with open(legacy_cookies, "r") as f:
+                state = merge_storage_states(state, {"cookies": json.load(f)})
+        origin = APP_STATE.get(app_name, {}).get("origin")
+        if origin:
+            legacy_local = LEGACY_STATE_DIR / "localstorage" / f"{origin.split('//', 1)[1]}_storage.json"
+            if legacy_local.exists():
+                with open(legacy_local, "r") as f:
+                    items = json.load(f) or {}
+                state = merge_storage_states(state, {"origins": [
+                    {"origin": origin, "localStorage": [{"name": k, "value": v} for k, v in items.items()]}
+                ]})
+    except Exception as e:
+        print(f"[yellow] Could not import legacy state for {app_name}: {e}[/yellow]")
+    return state if state["cookies"] or state["origins"] else None
+
+
+async def seed_storage_state(context, state: dict):
+    """Apply a storage_state to an existing context without loading a page."""
+    if state.get("cookies"):
+        await context.add_cookies(state["cookies"])
+    if any(o.get("localStorage") for o in state.get("origins", [])):
+        await context.add_init_script(script=f"({SEED_STORAGE_JS})({json.dumps(state['origins'])})")
+
+
+_store = None
+
+
+def get_state_store() -> StateStore:
+    global _store
+    if _store is None:
+        _store = StateStore()
+    return _store
@@ -0,0 +1,131 @@
+"""
+Plan optimizer: rewrites a DSL plan into an equivalent one with fewer browser round trips.
+
+Passes, in order:
+  1. normalize_selectors  – selector casing fixes applied once, not per step at execution time
+  2. drop_repeated_open   – `open` of the URL already loaded, with only read-only steps in between
+  3. merge_wait_expect    – `wait_for X` directly before `expect X` becomes one waiting expect
+  4. dedupe_expect        – back-to-back `expect`s of the same target
+  5. batch_new_todo       – consecutive `fill input.new-todo` + `press Enter` pairs become one batched fill
+
+Every rewrite is reported as a human-readable line so it can be logged.
+"""
+import os
+from typing import List, Tuple
+
+from dsl.schema import DSLAction
+
+# Set PLAN_OPTIMIZER=0 to skip the rewrite passes (selectors are still normalized)
+PLAN_OPTIMIZER = os.getenv("PLAN_OPTIMIZER", "1") != "0"
+
+# Steps that never change the page
+READ_ONLY_ACTIONS = {"expect", "wait_for"}
+NEW_TODO_INPUT = "input.new-todo"
+
+
+def normalize_selector(target: str) -> str:
+    target = (target or "").strip().replace("BUTTON:", "button:").replace("A.", "a.")
+    return target.replace(":HAS-TEXT", ":has-text")
+
+
+def _with(step: DSLAction, **changes) -> DSLAction:
+    return step.model_copy(update=changes)
+
+
+def _is_enter(step: DSLAction) -> bool:
+    return step.action == "press" and (step.target or "").strip().lower() in ("", "enter")
+
+
+def normalize_selectors(plan: List[DSLAction], log: List[str]) -> List[DSLAction]:
+    out = []
+    for i, step in enumerate(plan, 1):
+        if step.action in {"find_and_click", "expect", "fill"} and step.target:
+            target = normalize_selector(step.target)
+            if target != step.target:
+                log.append(f"step {i}: normalized selector {step.target!r} → {target!r}")
+                step = _with(step, target=target)
+        out.append(step)
+    return out
+
+
+def drop_repeated_open(plan: List[DSLAction], log: List[str]) -> List[DSLAction]:
+    out, current_url = [], None
+    for step in plan:
+        if step.action == "open":
+            if step.target and step.target == current_url and not step.extra:
+                log.append(f"dropped open {step.target} (already loaded)")
+                continue
+            current_url = step.target
+        elif step.action not in READ_ONLY_ACTIONS:
+            current_url = None  # the page may have navigated
+        out.append(step)
+    return out
+
+
+def merge_wait_expect(plan: List[DSLAction], log: List[str]) -> List[DSLAction]:
+    out = []
+    for step in plan:
+        prev = out[-1] if out else None
+        if (step.action == "expect" and prev is not None and prev.action == "wait_for"
+                and prev.target and normalize_selector(prev.target) == step.target):
+            extra = {**(prev.extra or {}), **(step.extra or {}), "wait": True}
+            out[-1] = _with(step, extra=extra)
+            log.append(f"merged wait_for + expect on {step.target!r} into one waiting expect")
+            continue
+        out.append(step)
+    return out
+
+
+def dedupe_expect(plan: List[DSLAction], log: List[str]) -> List[DSLAction]:
+    out = []
+    for step in plan:
+        prev = out[-1] if out else None
+        if (step.action == "expect" and prev is not None and prev.action == "expect"
+                and (prev.target, prev.value) == (step.target, step.value)):
+            if step.extra and step.extra != prev.extra:
+                out[-1] = _with(prev, extra={**(prev.extra or {}), **step.extra})
+            log.append(f"dropped duplicate expect on {step.target!r}")
+            continue
+        out.append(step)
+    return out
+
+
+def batch_new_todo(plan: List[DSLAction], log: List[str]) -> List[DSLAction]:
+    out, i = [], 0
+    while i < len(plan):
+        values = []
+        j = i
+        while (j + 1 < len(plan) and plan[j].action == "fill" and plan[j].target == NEW_TODO_INPUT
+               and not plan[j].extra and _is_enter(plan[j + 1])):
+            values.append(plan[j].value or "")
+            j += 2
+        if len(values) >= 2:
+            out.append(DSLAction(action="fill", target=NEW_TODO_INPUT, value=values[-1],
+                                 extra={"batch": values, "submit": "Enter"}))
+            log.append(f"batched {len(values)} fill + Enter pairs on {NEW_TODO_INPUT}")
+            i = j
+        else:
+            out.append(plan[i])
+            i += 1
+    return out
+
+
+# Rewrites that change the shape of the plan; normalize_selectors always runs before them
+PASSES = [drop_repeated_open, merge_wait_expect, dedupe_expect, batch_new_todo]
+
+
+def optimize_step(step: DSLAction) -> DSLAction:
+    """The lookahead-free subset of optimize_plan, for steps executed as they are streamed in."""
+    return normalize_selectors([step], [])[0]
+
+
+def optimize_plan(plan: List[DSLAction]) -> Tuple[List[DSLAction], List[str]]:
+    """Return (optimized plan, list of rewrites applied)."""
+    log = []
+    # Selector fixes used to be applied on every execution, so they do not depend on the flag
+    plan = normalize_selectors(list(plan), log)
+    if not PLAN_OPTIMIZER:
+        return plan, log
+    for rewrite in PASSES:
+        plan = rewrite(plan, log)
+    return plan, log
@@ -25,3 +25,25 @@ def load_dsl_from_dict(data: Union[list, DSLAction]) -> List[DSLAction]:
         else:
             raise TypeError(f"Unexpected step type in DSL plan: {type(step)}")
     return actions
+
+
+def dump_dsl_to_dicts(plan: List[DSLAction]) -> List[dict]:
+    """Serialize a DSL plan back to plain dicts (unset fields omitted)."""
+    return [step.model_dump(exclude_none=True) for step in plan]
+
+
+def dump_dsl_to_yaml(plan: List[DSLAction], path: str):
+    """Write a DSL plan to a YAML file that load_dsl_from_yaml can read back."""
+    with open(path, "w") as f:
+        yaml.safe_dump(dump_dsl_to_dicts(plan), f, sort_keys=False, allow_unicode=True)
+
+
+def infer_app_name(plan: List[DSLAction]) -> str:
+    """Derive the dataset app folder from the first URL the plan opens."""
+    first_url = next((step.target for step in plan if step.action == "open"), None)
+    if first_url:
+        if "saucedemo" in first_url:
+            return "saucedemo"
+        elif "todomvc" in first_url:
+            return "todomvc"
+    return "generic"
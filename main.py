@@ -1,18 +1,17 @@
 # main.py
+import re
+import sys
+import time
+from pathlib import Path
 import typer
-import os
+import yaml
 from dotenv import load_dotenv
 load_dotenv()
 from rich import print
-from agent.executor import run_executor
-import re
-from openai import OpenAI
-from rag.retriever import SimpleRetriever
-from dsl.parser import load_dsl_from_dict
-
+from dsl.parser import infer_app_name, dump_dsl_to_yaml
 
-# load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Heavy dependencies (openai, sentence-transformers/torch, playwright, PIL) are
+# imported lazily by the code paths that need them; see --profile-startup.
 
 # Import the new intelligent planner
 try:
@@ -25,42 +24,225 @@ except ImportError:
 app = typer.Typer(help="Agent B – Autonomous Browser Agent with RAG Planner")
 
 @app.command()
-def run(task: str):
+def run(
+    task: str,
+    stream: bool = typer.Option(False, "--stream", help="Stream the plan from the LLM and execute steps as they arrive"),
+):
+    from utils.tracing import TRACE_FILE, ensure_trace, span
+
     print(f"[bold blue]Agent B starting...[/bold blue]")
     print(f"Received task: [green]{task}[/green]\n")
 
-    # Phase 5: dynamic planning
-    if USE_LLM:
-        print("[cyan]Using LLM + RAG Planner to generate DSL plan...[/cyan]")
-        plan = generate_plan(task)
-    else:
-        print("[yellow]LLM planner not available – using fallback parser.[/yellow]")
-        from agent.task_parser import parse_task_to_plan
-        plan = parse_task_to_plan(task)
-
-    # Log the generated plan
-    print("[yellow]Generated DSL Plan:[/yellow]")
-    for step in plan:
-        print(f"  • [cyan]{step.action}[/cyan] → {step.target or ''} {step.value or ''}")
-
-    # Execute in browser
-    print("\n[magenta]Executing plan in browser...[/magenta]\n")
-    # run_executor(plan)
-
-    first_url = next((step.target for step in plan if step.action == "open"), None)
-
-    if first_url:
-        if "saucedemo" in first_url:
-            app_name = "saucedemo"
-        elif "todomvc" in first_url:
-            app_name = "todomvc"
+    # One trace covers planning and execution; the executor writes it into the run folder
+    with ensure_trace() as trace, span("main.run", "app", task=task):
+        if stream and USE_LLM:
+            # Browser launch and navigation overlap with plan generation
+            print("[cyan]Streaming the LLM + RAG plan into the executor...[/cyan]")
+            from agent.executor import run_executor_streamed
+            from agent.template_registry import get_registry
+
+            detected = get_registry().detect_app(task)
+            with span("execute", "app"):
+                result = run_executor_streamed(task, detected.app if detected else None)
         else:
-            app_name = "generic"
-    else:
-        app_name = "generic"
+            # Phase 5: dynamic planning
+            with span("plan", "plan"):
+                if USE_LLM:
+                    print("[cyan]Using LLM + RAG Planner to generate DSL plan...[/cyan]")
+                    plan = generate_plan(task)
+                else:
+                    print("[yellow]LLM planner not available – using fallback parser.[/yellow]")
+                    from agent.task_parser import parse_task_to_plan
+                    plan = parse_task_to_plan(task)
+
+            # Log the generated plan
+            print("[yellow]Generated DSL Plan:[/yellow]")
+            for step in plan:
+                print(f"  • [cyan]{step.action}[/cyan] → {step.target or ''} {step.value or ''}")
+
+            # Execute in browser
+            print("\n[magenta]Executing plan in browser...[/magenta]\n")
+            from agent.executor import run_executor
+
+            app_name = infer_app_name(plan)
+
+            with span("execute", "app"):
+                result = run_executor(plan, app_name, task_description=task)
+
+    # Re-save now that the enclosing spans are closed
+    if result is not None and result.run_dir:
+        trace.save(Path(result.run_dir) / TRACE_FILE)
+        print(f"[dim]Trace: {Path(result.run_dir) / TRACE_FILE} (python main.py profile {result.run_dir})[/dim]")
+    return result
+
+
+@app.command("plan-batch")
+def plan_batch(
+    tasks_file: Path = typer.Argument(..., help="Text file with one task per line (# comments allowed)"),
+    out_dir: Path = typer.Option(Path("plans"), help="Directory for the per-task YAML plans"),
+    concurrency: int = typer.Option(8, help="Maximum concurrent LLM requests"),
+    base_url: str = typer.Option(None, help="OpenAI-compatible endpoint, e.g. a local mock server"),
+):
+    """Plan every task in TASKS_FILE concurrently and write one YAML plan per task."""
+    from agent.planner import generate_plans
+
+    tasks = [line.strip() for line in tasks_file.read_text().splitlines()
+             if line.strip() and not line.strip().startswith("#")]
+    print(f"[bold blue]Planning {len(tasks)} task(s) from {tasks_file}...[/bold blue]")
+
+    started = time.perf_counter()
+    results = generate_plans(tasks, concurrency=concurrency, base_url=base_url)
+    elapsed = time.perf_counter() - started
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    index = []
+    for i, result in enumerate(results, 1):
+        entry = {"task": result.task, "source": result.source}
+        if result.plan is not None:
+            label = re.sub(r"[^a-zA-Z0-9]+", "_", result.task.lower()).strip("_")[:60] or "task"
+            plan_file = out_dir / f"{i:03d}_{label}.yaml"
+            dump_dsl_to_yaml(result.plan, plan_file)
+            entry.update({"plan_file": plan_file.name, "app": infer_app_name(result.plan), "status": "ok"})
+        else:
+            entry.update({"status": "failed", "error": result.error})
+            print(f"[red] Failed to plan '{result.task}': {result.error}[/red]")
+        index.append(entry)
+    with open(out_dir / "index.yaml", "w") as f:
+        yaml.safe_dump(index, f, sort_keys=False, allow_unicode=True)
+
+    sources = {}
+    for r in results:
+        sources[r.source or "failed"] = sources.get(r.source or "failed", 0) + 1
+    print(f"[green] Planned {len(tasks)} task(s) in {elapsed:.1f}s → {out_dir}/index.yaml {sources}[/green]")
+
+
+@app.command("run-batch")
+def run_batch(
+    plans_dir: Path = typer.Argument(..., help="Output folder of plan-batch (reads its index.yaml)"),
+    workers: int = typer.Option(4, help="Plans executed concurrently in the shared browser"),
+    headed: bool = typer.Option(False, help="Show the browser window"),
+):
+    """Execute every plan from a plan-batch folder concurrently in one Chromium process."""
+    from dsl.parser import load_dsl_from_yaml
+    from agent.executor import run_executor_batch
+
+    with open(plans_dir / "index.yaml", "r") as f:
+        index = yaml.safe_load(f) or []
+    jobs = [
+        (load_dsl_from_yaml(plans_dir / entry["plan_file"]), entry.get("app", "generic"), entry["task"])
+        for entry in index
+        if entry.get("status") == "ok"
+    ]
+    print(f"[bold blue]Executing {len(jobs)} plan(s) with {workers} worker(s)...[/bold blue]")
+    results = run_executor_batch(jobs, max_workers=workers, headless=not headed)
+    if any(r.status != "ok" for r in results):
+        raise typer.Exit(code=1)
+
+
+@app.command("compact-dataset")
+def compact_dataset_cmd(
+    dataset_root: Path = typer.Argument(Path("dataset"), help="Root folder of the captured runs"),
+):
+    """Fold new runs' step logs into the app-partitioned Parquet store under DATASET_ROOT/_parquet."""
+    from utils.run_store import compact_dataset, load_dataset
+
+    started = time.perf_counter()
+    compacted = compact_dataset(dataset_root)
+    frame = load_dataset(dataset_root)
+    print(f"[green] Compacted {compacted} run(s) in {time.perf_counter() - started:.1f}s — "
+          f"{len(frame)} step record(s) across {frame['app'].nunique()} app(s)[/green]")
+
+
+@app.command("runs")
+def list_runs(
+    app_name: str = typer.Option(None, "--app", help="Only runs of this app"),
+    task: str = typer.Option(None, help="Only runs of this exact task"),
+    status: str = typer.Option(None, help="ok, failed, error, running or unknown"),
+    limit: int = typer.Option(20, help="Maximum rows, newest first"),
+):
+    """List runs from the dataset catalog (dataset/catalog.sqlite)."""
+    from rich.table import Table
+    from utils.catalog import get_catalog
+
+    table = Table(title="Dataset runs")
+    for col in ("Started", "App", "Task", "Status", "Steps", "Wall time (s)", "Run folder"):
+        table.add_column(col)
+    for r in get_catalog().find_runs(app_name=app_name, task=task, status=status, limit=limit):
+        steps = f"{r['steps_executed']}/{r['steps_total']}" if r["steps_total"] is not None else "-"
+        wall = f"{r['wall_time']:.1f}" if r["wall_time"] is not None else "-"
+        table.add_row(time.strftime("%Y-%m-%d %H:%M", time.localtime(r["started_at"])), r["app"],
+                      (r["task"] or "")[:50], r["status"], steps, wall, r["run_dir"])
+    print(table)
+
+
+@app.command("bench")
+def bench(
+    tasks_file: Path = typer.Option(Path("bench/tasks.yaml"), help="Benchmark tasks with recorded completions"),
+    repeat: int = typer.Option(1, help="Runs per task (medians are reported)"),
+    baseline: Path = typer.Option(Path("bench/baselines/baseline.json"), help="Baseline JSON to compare against"),
+    threshold: float = typer.Option(0.20, help="Relative slowdown that counts as a regression"),
+    save_baseline: bool = typer.Option(False, "--save-baseline", help="Store this run as the new baseline"),
+    llm_latency_ms: int = typer.Option(0, help="Artificial latency of the mock LLM endpoint"),
+    keep: bool = typer.Option(False, help="Keep the scratch dataset/state folder"),
+    stream: bool = typer.Option(False, "--stream", help="Run the tasks with streamed planning (run --stream)"),
+    capture_profile: str = typer.Option(None, help="Screenshot encoding, e.g. webp:75:viewport (CAPTURE_PROFILE)"),
+):
+    """Run the offline end-to-end benchmark (local sites + mock LLM) and check for regressions."""
+    import json
+    from bench.suite import RESULTS_FILE, compare, print_report, run_suite, save_json
+
+    results = run_suite(tasks_file, repeat=repeat, llm_latency_ms=llm_latency_ms, keep=keep, stream=stream,
+                        capture_profile=capture_profile)
+    save_json(results, RESULTS_FILE)
+    if save_baseline:
+        save_json(results, baseline)
+        print_report(results)
+        print(f"[green] Baseline saved to {baseline}[/green]")
+        return
+    if not baseline.exists():
+        print_report(results)
+        print(f"[yellow] No baseline at {baseline}, so nothing was compared. Baselines are machine-specific "
+              f"and none is committed; record one on this machine with `python main.py bench --save-baseline` "
+              f"and re-run to check for regressions.[/yellow]")
+        return
+    with open(baseline, "r") as f:
+        regressions = compare(results, json.load(f), threshold)
+    print_report(results, regressions)
+    if regressions:
+        raise typer.Exit(1)
+
+
+@app.command("profile")
+def profile(
+    run: str = typer.Argument("latest", help="Run folder, trace.json, app name (its latest run) or 'latest'"),
+    top: int = typer.Option(15, help="Number of slowest spans to list"),
+):
+    """Break down a run's latency from its trace.json (phases, steps, slowest spans)."""
+    from utils.tracing import print_profile, resolve_trace_path
+
+    try:
+        path = resolve_trace_path(run)
+    except FileNotFoundError as e:
+        print(f"[red]{e}[/red]")
+        raise typer.Exit(1)
+    if not path.exists():
+        print(f"[red]No trace at {path} (runs before tracing was added have none)[/red]")
+        raise typer.Exit(1)
+    print_profile(path, top=top)
+
 
-    run_executor(plan, app_name, task_description=task)
+def _default_to_run(argv):
+    """Keep `python main.py "<task>"` working now that the CLI has several commands."""
+    commands = {c.name or c.callback.__name__.replace("_", "-") for c in app.registered_commands}
+    if len(argv) > 1 and argv[1] not in commands and not argv[1].startswith("-"):
+        return [argv[0], "run", *argv[1:]]
+    return argv
 
 
 if __name__ == "__main__":
+    if "--profile-startup" in sys.argv:
+        from utils.startup_profile import profile_startup
+        argv = [a for a in sys.argv if a != "--profile-startup"]
+        sys.exit(profile_startup(argv))
+    sys.argv = _default_to_run(sys.argv)
     app()
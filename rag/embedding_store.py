@@ -0,0 +1,84 @@
+# rag/embedding_store.py
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# Vectors live next to the rest of the agent's persistent state
+EMBEDDINGS_DIR = Path(os.getenv("SOFTLIGHT_EMBEDDINGS_DIR", Path.home() / ".softlight" / "embeddings"))
+
+
+def content_hash(text: str) -> str:
+    """Stable key for a piece of text (sha256 of its UTF-8 bytes)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Disk-backed cache of embedding vectors keyed by (model name, content hash).
+    All vectors for one model are kept in a single .npz so loading is one file read.
+    """
+
+    def __init__(self, model_name: str, root=EMBEDDINGS_DIR):
+        self.model_name = model_name
+        safe_model = re.sub(r"[^a-zA-Z0-9._-]+", "_", model_name)
+        self.path = Path(root) / f"{safe_model}.npz"
+        self._vectors = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with np.load(self.path) as data:
+                self._vectors = {key: data[key] for key in data.files}
+        except Exception as e:
+            print(f"[yellow] Ignoring unreadable embedding cache {self.path}: {e}[/yellow]")
+            self._vectors = {}
+
+    def __len__(self):
+        return len(self._vectors)
+
+    def get(self, key: str):
+        return self._vectors.get(key)
+
+    def put(self, key: str, vector):
+        self._vectors[key] = np.asarray(vector, dtype=np.float32)
+        self._dirty = True
+
+    def encode(self, texts, encode_fn) -> np.ndarray:
+        """
+        Return a (len(texts), dim) matrix of vectors for `texts`.
+        Only texts whose hash is not cached are passed to `encode_fn` (in one batch).
+        """
+        keys = [content_hash(t) for t in texts]
+        missing = [i for i, k in enumerate(keys) if k not in self._vectors]
+        if missing:
+            fresh = encode_fn([texts[i] for i in missing])
+            for i, vec in zip(missing, fresh):
+                self.put(keys[i], vec)
+            print(f"[blue] Encoded {len(missing)} new/changed document(s), {len(keys) - len(missing)} loaded from cache[/blue]")
+            self.save()
+        if not keys:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([self._vectors[k] for k in keys])
+
+    def save(self):
+        """Atomically rewrite the cache file if anything changed."""
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".npz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **self._vectors)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
@@ -0,0 +1,114 @@
+# rag/passage_index.py
+import hashlib
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Tuple
+
+import faiss
+import numpy as np
+
+INDEX_DIR = Path(os.getenv("SOFTLIGHT_INDEX_DIR", Path.home() / ".softlight" / "faiss"))
+
+# Corpus sizes at which "auto" switches from exact search to an ANN index
+FLAT_MAX_PASSAGES = 5000
+
+
+@dataclass
+class Passage:
+    """One retrievable chunk of a knowledge-base file."""
+    source: str   # KB file stem, e.g. "saucedemo"
+    index: int    # position of the chunk inside its source
+    text: str
+
+    @property
+    def id(self) -> str:
+        return f"{self.source}#{self.index}"
+
+
+def chunk_text(source: str, text: str, max_chars: int = 400, min_chars: int = 80) -> List[Passage]:
+    """
+    Split a KB document into passages.
+    Lines are packed up to `max_chars`. Blank lines and heading lines (ending in ":")
+    start a new passage unless the current one is still shorter than `min_chars`,
+    so titles stay attached to the paragraph they introduce.
+    """
+    passages, current = [], []
+
+    def flush():
+        chunk = "\n".join(current).strip()
+        if chunk:
+            passages.append(Passage(source, len(passages), chunk))
+        current.clear()
+
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line or line.endswith(":"):
+            if sum(len(l) + 1 for l in current) >= min_chars:
+                flush()
+            if not line:
+                continue
+        if current and sum(len(l) + 1 for l in current) + len(line) > max_chars:
+            flush()
+        current.append(line)
+    flush()
+    return passages
+
+
+class PassageIndex:
+    """
+    Inner-product FAISS index over L2-normalized passage vectors.
+    `index_type` is "flat", "ivf", "hnsw" or "auto" (flat for small corpora, IVF above FLAT_MAX_PASSAGES).
+    """
+
+    def __init__(self, passages: List[Passage], vectors: np.ndarray, index_type: str = "auto", cache_dir=INDEX_DIR):
+        self.passages = passages
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        n = len(passages)
+        if index_type == "auto":
+            index_type = "flat" if n <= FLAT_MAX_PASSAGES else "ivf"
+        self.index_type = index_type
+
+        if index_type == "flat" or n == 0:
+            # Exact search is already sub-millisecond at this size; nothing worth persisting
+            self.index = faiss.IndexFlatIP(vectors.shape[1] if n else 1)
+            if n:
+                self.index.add(vectors)
+            return
+
+        # ANN indexes are slower to build, so reuse one built from the same vectors
+        digest = hashlib.sha256(vectors.tobytes()).hexdigest()[:16]
+        cache_path = Path(cache_dir) / f"{index_type}_{n}_{digest}.index"
+        if cache_path.exists():
+            self.index = faiss.read_index(str(cache_path))
+        else:
+            self.index = self._build(index_type, vectors)
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            faiss.write_index(self.index, str(cache_path))
+        if index_type == "ivf":
+            self.index.nprobe = min(16, self.index.nlist)
+        elif index_type == "hnsw":
+            self.index.hnsw.efSearch = 64
+
+    @staticmethod
+    def _build(index_type: str, vectors: np.ndarray):
+        n, dim = vectors.shape
+        if index_type == "ivf":
+            nlist = max(1, min(int(4 * np.sqrt(n)), n // 39))
+            quantizer = faiss.IndexFlatIP(dim)
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            index.train(vectors)
+        elif index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = 80
+        else:
+            raise ValueError(f"Unknown FAISS index type: {index_type}")
+        index.add(vectors)
+        return index
+
+    def search(self, query_vector: np.ndarray, top_k: int = 3) -> List[Tuple[Passage, float]]:
+        if not self.passages:
+            return []
+        query = np.ascontiguousarray(query_vector, dtype=np.float32).reshape(1, -1)
+        scores, ids = self.index.search(query, min(top_k, len(self.passages)))
+        return [(self.passages[i], float(s)) for i, s in zip(ids[0], scores[0]) if i != -1]
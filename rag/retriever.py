@@ -1,9 +1,48 @@
+import os
 from pathlib import Path
-from sentence_transformers import SentenceTransformer, util
+
+from rag.embedding_store import EmbeddingStore
+from rag.passage_index import PassageIndex, chunk_text
+from utils.tracing import span
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Loaded models and retrievers are shared for the lifetime of the process
+_MODELS = {}
+_RETRIEVERS = {}
+
+
+def get_model(model_name: str = MODEL_NAME):
+    """Load a SentenceTransformer once per process."""
+    if model_name not in _MODELS:
+        # sentence-transformers pulls in torch, so only import it when a model is needed
+        with span("model.load", "rag", model=model_name):
+            from sentence_transformers import SentenceTransformer
+            _MODELS[model_name] = SentenceTransformer(model_name)
+    return _MODELS[model_name]
+
+
+def _kb_signature(kb_path):
+    """Cheap change detector for the knowledge base directory (names, sizes, mtimes)."""
+    return tuple(
+        (f.name, f.stat().st_size, f.stat().st_mtime_ns)
+        for f in sorted(Path(kb_path).glob("*.txt"))
+    )
+
+
+def get_retriever(kb_path="rag/knowledge_base"):
+    """Return a cached SimpleRetriever, rebuilding it only when the KB files change."""
+    signature = _kb_signature(kb_path)
+    cached = _RETRIEVERS.get(kb_path)
+    if cached is None or cached[0] != signature:
+        _RETRIEVERS[kb_path] = (signature, SimpleRetriever(kb_path))
+    return _RETRIEVERS[kb_path][1]
+
 
 class SimpleRetriever:
-    def __init__(self, kb_path="rag/knowledge_base"):
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
+    def __init__(self, kb_path="rag/knowledge_base", model_name=MODEL_NAME, store=None, index_type=None):
+        self.model = get_model(model_name)
+        self.store = store or EmbeddingStore(model_name)
         self.docs = {}
         for f in Path(kb_path).glob("*.txt"):
             text = f.read_text().strip()
@@ -11,13 +50,39 @@ class SimpleRetriever:
                 self.docs[f.stem] = text
         if not self.docs:
             print("[red] Warning: No knowledge base files found. Add .txt files in rag/knowledge_base[/red]")
+            return
+        self.passages = [p for source, text in self.docs.items() for p in chunk_text(source, text)]
+        # Only added or changed passages are encoded; the rest come from disk
+        with span("retriever.kb_encode", "rag", passages=len(self.passages)):
+            vectors = self.store.encode([p.text for p in self.passages], self._encode)
+        with span("retriever.index_build", "rag"):
+            self.index = PassageIndex(self.passages, vectors, index_type or os.getenv("RAG_INDEX_TYPE", "auto"))
+
+    def _encode(self, texts):
+        with span("retriever.encode", "rag", texts=len(texts)):
+            return self.model.encode(list(texts), convert_to_numpy=True, normalize_embeddings=True)
+
+    def embed(self, text):
+        """Normalized embedding of a single string (shared model, not cached)."""
+        return self._encode([text])[0]
 
-    def retrieve(self, query, top_k=2):
+    def embed_many(self, texts):
+        """Normalized embeddings of many strings in one batched encode."""
+        return self._encode(texts)
+
+    def retrieve_by_vector(self, query_vector, top_k=3):
+        """Like retrieve(), for a query that has already been embedded."""
         if not self.docs:
             return [("default", "No KB available.")]
-        all_texts, app_names = zip(*self.docs.items())
-        embeddings = self.model.encode(list(all_texts), convert_to_tensor=True)
-        query_emb = self.model.encode(query, convert_to_tensor=True)
-        scores = util.cos_sim(query_emb, embeddings)[0]
-        top_idx = scores.argsort(descending=True)[:top_k]
-        return [(app_names[i], all_texts[i]) for i in top_idx]
+        with span("retriever.search", "rag", top_k=top_k):
+            return [(p.id, p.text) for p, _ in self.index.search(query_vector, top_k)]
+
+    def search(self, query, top_k=3):
+        """Return the top-k (Passage, score) pairs for a query."""
+        if not self.docs:
+            return []
+        return self.index.search(self.embed(query), top_k)
+
+    def retrieve(self, query, top_k=3):
+        """Return the top-k passages as (source id, passage text) pairs, e.g. ("saucedemo#1", "...")."""
+        return self.retrieve_by_vector(self.embed(query), top_k) if self.docs else [("default", "No KB available.")]
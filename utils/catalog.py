@@ -0,0 +1,157 @@
+# utils/catalog.py
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DATASET_ROOT = Path(os.getenv("SOFTLIGHT_DATASET_DIR", "dataset"))
+CATALOG_FILE = "catalog.sqlite"
+
+_RUN_INDEX = re.compile(r"^run_(\d+)")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS app_counters (
+    app TEXT PRIMARY KEY,
+    next_index INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    app TEXT NOT NULL,
+    run_index INTEGER NOT NULL,
+    task TEXT,
+    run_dir TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL DEFAULT 'running',
+    steps_total INTEGER,
+    steps_executed INTEGER,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    wall_time REAL,
+    error TEXT,
+    UNIQUE (app, run_index)
+);
+CREATE INDEX IF NOT EXISTS idx_runs_app_started ON runs (app, started_at);
+CREATE INDEX IF NOT EXISTS idx_runs_task_status ON runs (task, status, started_at);
+CREATE INDEX IF NOT EXISTS idx_runs_status_started ON runs (status, started_at);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs (started_at);
+"""
+
+
+def sanitize_name(text: str):
+    text = re.sub(r"[^a-zA-Z0-9]+", "_", (text or "").lower()).strip("_")
+    return text[:60] if text else "run"
+
+
+class RunCatalog:
+    """
+    SQLite index of every run under `root` (dataset/catalog.sqlite).
+
+    Run numbers come from a per-app counter bumped inside a write transaction, so
+    concurrent runs (threads or processes) never get the same folder and starting a
+    run does not list the app directory. Lookups go through indexes on app, task,
+    status and start time.
+    """
+
+    def __init__(self, root=DATASET_ROOT):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.path = self.root / CATALOG_FILE
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; write transactions are opened explicitly with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _seed_app(self, conn, app_name: str) -> int:
+        """First run of an app seen by the catalog: register folders that predate it, once."""
+        app_dir = self.root / app_name
+        highest = 0
+        if app_dir.exists():
+            for run_dir in app_dir.iterdir():
+                match = _RUN_INDEX.match(run_dir.name)
+                if not match or not run_dir.is_dir():
+                    continue
+                index = int(match.group(1))
+                highest = max(highest, index)
+                conn.execute(
+                    "INSERT OR IGNORE INTO runs (app, run_index, run_dir, status, started_at) "
+                    "VALUES (?, ?, ?, 'unknown', ?)",
+                    (app_name, index, str(run_dir), run_dir.stat().st_mtime),
+                )
+        conn.execute("INSERT INTO app_counters (app, next_index) VALUES (?, ?)", (app_name, highest + 1))
+        return highest + 1
+
+    def allocate_run(self, app_name: str, task_description=None, steps_total=None) -> Path:
+        """Claim the next dataset/<app>/run_NN_<label> folder and record the run as 'running'."""
+        label = sanitize_name(task_description or "run")
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT next_index FROM app_counters WHERE app = ?", (app_name,)).fetchone()
+            index = row["next_index"] if row else self._seed_app(conn, app_name)
+            (self.root / app_name).mkdir(parents=True, exist_ok=True)
+            while True:
+                run_dir = self.root / app_name / f"run_{index:02d}_{label}"
+                try:
+                    run_dir.mkdir()
+                    break
+                except FileExistsError:
+                    # Folder created outside the catalog (e.g. copied in); skip its number
+                    index += 1
+            conn.execute("UPDATE app_counters SET next_index = ? WHERE app = ?", (index + 1, app_name))
+            conn.execute(
+                "INSERT INTO runs (app, run_index, task, run_dir, steps_total, started_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (app_name, index, task_description, str(run_dir), steps_total, time.time()),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return run_dir
+
+    def finish_run(self, run_dir, status: str, steps_executed=None, wall_time=None, error=None):
+        self._connect().execute(
+            "UPDATE runs SET status = ?, steps_executed = ?, wall_time = ?, error = ?, finished_at = ? "
+            "WHERE run_dir = ?",
+            (status, steps_executed, wall_time, error, time.time(), str(run_dir)),
+        )
+
+    def latest_run(self, app_name: str = None, status: str = None):
+        """Most recently started run, optionally for one app and/or status (dict or None)."""
+        rows = self.find_runs(app_name=app_name, status=status, limit=1)
+        return rows[0] if rows else None
+
+    def find_runs(self, app_name: str = None, task: str = None, status: str = None, limit: int = 50) -> list:
+        """Runs matching every given filter, newest first."""
+        clauses, params = [], []
+        for column, value in (("app", app_name), ("task", task), ("status", status)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            f"SELECT * FROM runs {where} ORDER BY started_at DESC LIMIT ?", (*params, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+
+_CATALOGS = {}
+_CATALOGS_LOCK = threading.Lock()
+
+
+def get_catalog(root=DATASET_ROOT) -> RunCatalog:
+    key = str(Path(root).resolve())
+    with _CATALOGS_LOCK:
+        if key not in _CATALOGS:
+            _CATALOGS[key] = RunCatalog(root)
+        return _CATALOGS[key]
@@ -5,26 +5,30 @@ import csv
 from datetime import datetime
 from pathlib import Path
 
+from utils.run_store import STEP_LOG, SUMMARY_FILE, SUMMARY_FIELDS, legacy_step_files, summary_row
+from utils.tracing import traced
+
+
+@traced("generate_summary", "summary")
 def generate_summary(run_dir: str):
     """
-    Aggregate all *.json metadata files in a run directory into dataset_summary.csv
+    Return the run's dataset_summary.csv. Runs with a steps.jsonl log already have an
+    incrementally written summary; older runs aggregate their per-step *.json files.
     """
     run_path = Path(run_dir)
-    summary_path = run_path / "dataset_summary.csv"
+    summary_path = run_path / SUMMARY_FILE
+
+    if (run_path / STEP_LOG).exists() and summary_path.exists():
+        print(f"Dataset summary up to date: {summary_path}")
+        return summary_path
 
     rows = []
-    for file in sorted(run_path.glob("*.json")):
+    for file in legacy_step_files(run_path):
         try:
             with open(file, "r") as f:
                 meta = json.load(f)
-            rows.append({
-                "step": meta.get("step"),
-                "action": meta.get("action"),
-                "file_name": file.stem + ".png",
-                "url": meta.get("url"),
-                "title": meta.get("title"),
-                "timestamp": meta.get("timestamp"),
-            })
+            meta.setdefault("file", file.stem + ".png")
+            rows.append(summary_row(meta))
         except Exception as e:
             print(f" Skipping {file.name}: {e}")
 
@@ -37,7 +41,7 @@ def generate_summary(run_dir: str):
 
     # Write summary CSV
     with open(summary_path, "w", newline="") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=rows[0].keys())
+        writer = csv.DictWriter(csvfile, fieldnames=SUMMARY_FIELDS)
         writer.writeheader()
         writer.writerows(rows)
 
@@ -47,5 +51,7 @@ def generate_summary(run_dir: str):
 
 # Quick test utility
 if __name__ == "__main__":
-    latest_run = sorted(Path("dataset/todomvc").glob("run_*"))[-1]
-    generate_summary(latest_run)
+    from utils.catalog import get_catalog
+    latest_run = get_catalog().latest_run("todomvc")
+    if latest_run:
+        generate_summary(latest_run["run_dir"])
@@ -0,0 +1,165 @@
+# utils/mock_openai.py
+"""
+Minimal OpenAI-compatible stand-in for offline planning runs.
+
+    python -m utils.mock_openai --port 8089 --recordings completions.yaml
+    python main.py plan-batch tasks.txt --base-url http://127.0.0.1:8089/v1
+
+`recordings` maps a task (or any substring of the prompt) to the completion text.
+Unmatched prompts get a trivial TodoMVC plan. Requests with `stream: true` get the
+completion as server-sent chunks (`--chunk-delay-ms` paces them like a real model).
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import yaml
+
+DEFAULT_COMPLETION = """- action: open
+  target: https://demo.playwright.dev/todomvc
+- action: expect
+  target: input.new-todo
+"""
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, recordings=None, latency_ms=0, rate_limit_every=0, chunk_chars=12, chunk_delay_ms=0):
+        super().__init__(address, _Handler)
+        self.recordings = recordings or {}
+        self.latency_ms = latency_ms
+        self.rate_limit_every = rate_limit_every
+        self.chunk_chars = max(1, chunk_chars)
+        self.chunk_delay_ms = chunk_delay_ms
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def completion_for(self, prompt: str) -> str:
+        task = re.search(r"^Task:\s*(.+)$", prompt, re.MULTILINE)
+        if task and task.group(1).strip() in self.recordings:
+            return self.recordings[task.group(1).strip()]
+        for key, completion in self.recordings.items():
+            if key in prompt:
+                return completion
+        return DEFAULT_COMPLETION
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: MockOpenAIServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, count: int, model: str, content: str, usage: dict = None):
+        """Server-sent events in the chat.completion.chunk format, ending with [DONE]."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        size = self.server.chunk_chars
+        pieces = [content[i:i + size] for i in range(0, len(content), size)]
+        deltas = [{"role": "assistant", "content": ""}] + [{"content": p} for p in pieces] + [{}]
+        for i, delta in enumerate(deltas):
+            chunk = {
+                "id": f"chatcmpl-mock-{count}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": "stop" if i == len(deltas) - 1 else None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if self.server.chunk_delay_ms and 0 < i < len(deltas) - 1:
+                time.sleep(self.server.chunk_delay_ms / 1000)
+        if usage is not None:
+            # stream_options.include_usage: a final chunk with no choices carries the usage
+            chunk = {"id": f"chatcmpl-mock-{count}", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": [], "usage": usage}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        with self.server.lock:
+            self.server.requests += 1
+            count = self.server.requests
+        if self.server.rate_limit_every and count % self.server.rate_limit_every == 0:
+            self._send_json(429, {"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_error"}},
+                            headers={"retry-after-ms": "200"})
+            return
+        if self.server.latency_ms:
+            time.sleep(self.server.latency_ms / 1000)
+
+        prompt = "\n".join(str(m.get("content", "")) for m in request.get("messages", []))
+        content = self.server.completion_for(prompt)
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                 "total_tokens": (len(prompt) + len(content)) // 4}
+        if request.get("stream"):
+            include_usage = (request.get("stream_options") or {}).get("include_usage")
+            self._send_stream(count, request.get("model", "mock"), content, usage if include_usage else None)
+            return
+        self._send_json(200, {
+            "id": f"chatcmpl-mock-{count}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+
+def start_mock_server(host="127.0.0.1", port=0, **kwargs) -> MockOpenAIServer:
+    """Start the mock server on a background thread (port 0 picks a free port)."""
+    server = MockOpenAIServer((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def load_recordings(path) -> dict:
+    if not path:
+        return {}
+    with open(path, "r") as f:
+        return yaml.safe_load(f) or {}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock OpenAI chat-completions endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--recordings", help="YAML mapping task/prompt substring -> completion text")
+    parser.add_argument("--latency-ms", type=int, default=0, help="Artificial latency per completion")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with HTTP 429")
+    parser.add_argument("--chunk-chars", type=int, default=12, help="Characters per streamed chunk")
+    parser.add_argument("--chunk-delay-ms", type=int, default=0, help="Delay between streamed chunks")
+    args = parser.parse_args()
+
+    server = MockOpenAIServer((args.host, args.port), recordings=load_recordings(args.recordings),
+                              latency_ms=args.latency_ms, rate_limit_every=args.rate_limit_every,
+                              chunk_chars=args.chunk_chars, chunk_delay_ms=args.chunk_delay_ms)
+    print(f"Mock OpenAI endpoint listening on {server.base_url}")
+    server.serve_forever()
@@ -0,0 +1,200 @@
+# utils/run_store.py
+import csv
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+STEP_LOG = "steps.jsonl"
+SUMMARY_FILE = "dataset_summary.csv"
+SUMMARY_FIELDS = ["step", "action", "file_name", "changed", "url", "title", "timestamp", "bytes"]
+
+# Per-step metadata files of runs written before steps.jsonl (NN_<label>.json); run folders
+# also hold trace.json and storage_state.json, which are not steps
+LEGACY_STEP_GLOB = "[0-9][0-9]_*.json"
+
+# Compacted, app-partitioned Parquet copy of every finished run
+PARQUET_DIR = "_parquet"
+COMPACTION_MANIFEST = "_compacted.json"
+
+
+def summary_row(record: dict) -> dict:
+    return {
+        "step": record.get("step"),
+        "action": record.get("action"),
+        "file_name": record.get("file"),
+        "changed": record.get("changed", True),
+        "url": record.get("url"),
+        "title": record.get("title"),
+        "timestamp": record.get("timestamp"),
+        "bytes": record.get("bytes"),
+    }
+
+
+class RunLog:
+    """
+    Append-only step log for one run (`steps.jsonl`), plus the CSV summary kept
+    up to date row by row. Safe to call from the capture worker threads.
+    """
+
+    def __init__(self, run_dir, app_name: str = None):
+        self.run_dir = Path(run_dir)
+        self.path = self.run_dir / STEP_LOG
+        self.summary_path = self.run_dir / SUMMARY_FILE
+        self.app_name = app_name or self.run_dir.parent.name
+        self.rows = []
+        self._lock = threading.Lock()
+        self._last_step = 0
+        self._out_of_order = False
+
+    def append(self, record: dict):
+        record = {"app": self.app_name, "run": self.run_dir.name, **record}
+        row = summary_row(record)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+            new_summary = not self.summary_path.exists()
+            with open(self.summary_path, "a", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+                if new_summary:
+                    writer.writeheader()
+                writer.writerow(row)
+            self.rows.append(row)
+            step = record.get("step") or 0
+            self._out_of_order = self._out_of_order or step < self._last_step
+            self._last_step = max(self._last_step, step)
+
+    def close(self):
+        """Captures finish out of order on the worker pool; re-sort the summary once if that happened."""
+        with self._lock:
+            if not self._out_of_order:
+                return
+            with open(self.summary_path, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+                writer.writeheader()
+                writer.writerows(sorted(self.rows, key=lambda r: r["step"] or 0))
+            self._out_of_order = False
+
+
+def legacy_step_files(run_dir) -> list:
+    return sorted(Path(run_dir).glob(LEGACY_STEP_GLOB))
+
+
+def read_run_records(run_dir) -> list:
+    """Step records of one run: steps.jsonl, or the per-step *.json files of older runs."""
+    run_dir = Path(run_dir)
+    log = run_dir / STEP_LOG
+    if log.exists():
+        with open(log, "r") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    records = []
+    for file in legacy_step_files(run_dir):
+        try:
+            with open(file, "r") as f:
+                meta = json.load(f)
+        except Exception:
+            continue
+        meta.setdefault("file", file.stem + ".png")
+        records.append({"app": run_dir.parent.name, "run": run_dir.name, **meta})
+    return records
+
+
+def _run_dirs(dataset_root: Path):
+    if not dataset_root.is_dir():
+        return
+    for app_dir in sorted(p for p in dataset_root.iterdir() if p.is_dir() and not p.name.startswith("_")):
+        for run_dir in sorted(p for p in app_dir.glob("run_*") if p.is_dir()):
+            yield app_dir.name, run_dir
+
+
+def _load_manifest(dataset_root: Path) -> dict:
+    path = dataset_root / COMPACTION_MANIFEST
+    if path.exists():
+        with open(path, "r") as f:
+            return json.load(f)
+    return {}
+
+
+def compact_dataset(dataset_root="dataset") -> int:
+    """
+    Fold every run not yet compacted into Parquet files partitioned by app
+    (dataset/_parquet/app=<app>/part-<ts>.parquet). Returns the number of runs compacted.
+    Runs are re-compacted only if their step log changed since the last compaction; the
+    app partitions holding their earlier rows are rewritten without them.
+    """
+    import pandas as pd
+
+    dataset_root = Path(dataset_root)
+    if not dataset_root.is_dir():
+        return 0
+    manifest = _load_manifest(dataset_root)
+    batches = {}
+    superseded = {}
+    for app_name, run_dir in _run_dirs(dataset_root):
+        log = run_dir / STEP_LOG
+        source = log if log.exists() else run_dir
+        key = f"{app_name}/{run_dir.name}"
+        stamp = source.stat().st_mtime_ns
+        if manifest.get(key) == stamp:
+            continue
+        records = read_run_records(run_dir)
+        if records:
+            batches.setdefault(app_name, []).extend(records)
+            if key in manifest:
+                superseded.setdefault(app_name, set()).add(run_dir.name)
+            manifest[key] = stamp
+
+    part = time.strftime("%Y%m%d%H%M%S")
+    for app_name, records in batches.items():
+        frame = pd.DataFrame.from_records(records).drop(columns=["app"], errors="ignore")
+        out_dir = dataset_root / PARQUET_DIR / f"app={app_name}"
+        out_dir.mkdir(parents=True, exist_ok=True)
+        old_parts = sorted(out_dir.glob("*.parquet")) if app_name in superseded else []
+        if old_parts:
+            # Fold the partition into one part without the re-compacted runs' earlier rows
+            kept = pd.read_parquet(old_parts)
+            kept = kept[~kept["run"].isin(superseded[app_name])].drop(columns=["app"], errors="ignore")
+            frame = pd.concat([kept, frame], ignore_index=True)
+        new_part = out_dir / f"part-{part}-{os.getpid()}.parquet"
+        frame.astype({c: "string" for c in frame.columns if frame[c].dtype == object}).to_parquet(new_part, index=False)
+        for old in old_parts:
+            if old != new_part:
+                old.unlink()
+
+    tmp = dataset_root / (COMPACTION_MANIFEST + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, dataset_root / COMPACTION_MANIFEST)
+    return sum(len({r["run"] for r in records}) for records in batches.values())
+
+
+def load_dataset(dataset_root="dataset", include_uncompacted: bool = True):
+    """
+    Load every step record under `dataset_root` as one pandas DataFrame.
+    Compacted runs come from a single Parquet dataset read; runs written since the
+    last compaction are appended from their step logs. Re-compacted runs keep their latest rows.
+    """
+    import pandas as pd
+
+    dataset_root = Path(dataset_root)
+    frames = []
+    parquet_root = dataset_root / PARQUET_DIR
+    if parquet_root.exists() and any(parquet_root.rglob("*.parquet")):
+        frames.append(pd.read_parquet(parquet_root))
+
+    if include_uncompacted and dataset_root.exists():
+        manifest = _load_manifest(dataset_root)
+        fresh = []
+        for app_name, run_dir in _run_dirs(dataset_root):
+            if f"{app_name}/{run_dir.name}" not in manifest:
+                fresh.extend(read_run_records(run_dir))
+        if fresh:
+            frames.append(pd.DataFrame.from_records(fresh))
+
+    if not frames:
+        return pd.DataFrame(columns=["app", "run", *SUMMARY_FIELDS])
+    frame = pd.concat(frames, ignore_index=True)
+    frame["app"] = frame["app"].astype(str)
+    # A run also present in its step log (or in a part left by an interrupted rewrite) keeps its latest rows
+    return frame.drop_duplicates(subset=["app", "run", "step"], keep="last").reset_index(drop=True)
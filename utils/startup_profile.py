@@ -0,0 +1,67 @@
+# utils/startup_profile.py
+import re
+import subprocess
+import sys
+
+from rich import print
+from rich.table import Table
+
+# `python -X importtime` line: "import time: <self us> | <cumulative us> | <indent><module>"
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$")
+
+# Dependencies that should only be loaded on the code path that needs them
+HEAVY_MODULES = ["torch", "sentence_transformers", "faiss", "openai", "playwright", "PIL", "imagehash", "pandas"]
+
+
+def parse_importtime(lines):
+    """Parse `-X importtime` stderr lines into dicts (module, self_us, cumulative_us, depth)."""
+    records = []
+    for line in lines:
+        m = _IMPORT_LINE.match(line)
+        if m:
+            records.append({
+                "module": m.group(4),
+                "self_us": int(m.group(1)),
+                "cumulative_us": int(m.group(2)),
+                "depth": (len(m.group(3)) - 1) // 2,
+            })
+    return records
+
+
+def profile_startup(argv, top: int = 20) -> int:
+    """
+    Re-run this CLI under `python -X importtime` and report import cost per module.
+    Program output is passed through untouched; only the import timings are collected.
+    """
+    proc = subprocess.Popen(
+        [sys.executable, "-X", "importtime", *argv],
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    timing_lines = []
+    for line in proc.stderr:
+        if line.startswith("import time:"):
+            timing_lines.append(line)
+        else:
+            sys.stderr.write(line)
+    returncode = proc.wait()
+
+    records = parse_importtime(timing_lines)
+    top_level = sorted((r for r in records if r["depth"] == 0), key=lambda r: -r["cumulative_us"])
+    total_ms = sum(r["cumulative_us"] for r in top_level) / 1000
+
+    table = Table(title=f"Startup imports (total {total_ms:.0f} ms, {len(records)} modules)")
+    table.add_column("Module")
+    table.add_column("Cumulative (ms)", justify="right")
+    table.add_column("Self (ms)", justify="right")
+    for r in top_level[:top]:
+        table.add_row(r["module"], f"{r['cumulative_us'] / 1000:.1f}", f"{r['self_us'] / 1000:.1f}")
+    print(table)
+
+    loaded = {r["module"].split(".")[0] for r in records}
+    heavy = [m for m in HEAVY_MODULES if m in loaded]
+    if heavy:
+        print(f"[yellow]Heavy dependencies loaded on this path: {', '.join(heavy)}[/yellow]")
+    else:
+        print("[green]No heavy dependencies were loaded on this path.[/green]")
+    return returncode
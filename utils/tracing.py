@@ -0,0 +1,236 @@
+# utils/tracing.py
+"""
+Lightweight span tracing for agent runs.
+
+Spans are recorded into the trace bound to the current context (contextvars, so
+concurrent runs in one event loop keep separate traces) and written as Chrome
+trace-event JSON (`trace.json` in the run folder). Open it in chrome://tracing or
+Perfetto, or summarise it with `python main.py profile <run>`.
+
+    with span("llm.completion", "llm", model=PLANNER_MODEL):
+        ...
+
+Outside an active trace, span() costs one context-variable lookup.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+TRACE_FILE = "trace.json"
+
+_current = contextvars.ContextVar("softlight_trace", default=None)
+
+
+class Trace:
+    def __init__(self):
+        self.events = []
+        self.origin = time.perf_counter()
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def add(self, name: str, cat: str, start: float, end: float, args: dict):
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": round((start - self.origin) * 1e6, 1),
+            "dur": round((end - start) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def save(self, path):
+        with self._lock:
+            events = list(self.events)
+        threads = {e["tid"] for e in events}
+        names = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+                  "args": {"name": "main" if tid == threading.main_thread().ident else f"worker-{tid}"}}
+                 for tid in threads]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": names + events, "displayTimeUnit": "ms",
+                       "otherData": {"started_at": self.started_at}}, f)
+        return path
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def ensure_trace():
+    """Yield the active trace, or start one for the duration of the block."""
+    trace = _current.get()
+    if trace is not None:
+        yield trace
+        return
+    trace = Trace()
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str, cat: str = "app", **args):
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, cat, start, time.perf_counter(), args)
+
+
+def begin_span(name: str, cat: str = "app", **args):
+    """Non-block form of span(): returns a callable that ends the span (extra kwargs become args)."""
+    trace = _current.get()
+    if trace is None:
+        return lambda **more: None
+    start = time.perf_counter()
+    return lambda **more: trace.add(name, cat, start, time.perf_counter(), {**args, **more})
+
+
+def traced(name: str = None, cat: str = "app"):
+    """Decorator form of span() for sync and async functions."""
+    def decorate(fn):
+        label = name or fn.__qualname__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*a, **kw):
+                with span(label, cat):
+                    return await fn(*a, **kw)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*a, **kw):
+            with span(label, cat):
+                return fn(*a, **kw)
+        return wrapper
+    return decorate
+
+
+# ─────────────────────────────────────────────
+# Reporting
+# ─────────────────────────────────────────────
+def load_trace(path) -> list:
+    with open(path, "r") as f:
+        return [e for e in json.load(f).get("traceEvents", []) if e.get("ph") == "X"]
+
+
+def self_times(events: list) -> list:
+    """
+    Pair each span with its self time: its duration minus the spans directly nested in it
+    on the same thread. Spans of concurrent tasks on one event loop can overlap without
+    nesting, so a span only counts as a child of the innermost span that contains it
+    entirely; self time is clamped at zero where concurrent children overlap each other.
+    """
+    out = []
+    by_thread = {}
+    for e in events:
+        by_thread.setdefault(e["tid"], []).append(e)
+    for spans in by_thread.values():
+        spans.sort(key=lambda e: (e["ts"], -e["dur"]))
+        open_spans = []
+        for e in spans:
+            end = e["ts"] + e["dur"]
+            still_open = []
+            for entry in open_spans:
+                if e["ts"] >= entry[0]["ts"] + entry[0]["dur"]:
+                    out.append((entry[0], max(0.0, entry[1])))
+                else:
+                    still_open.append(entry)
+            open_spans = still_open
+            # Innermost = latest-starting open span that also ends no earlier than this one
+            for entry in reversed(open_spans):
+                if entry[0]["ts"] + entry[0]["dur"] >= end:
+                    entry[1] -= e["dur"]
+                    break
+            open_spans.append([e, e["dur"]])
+        out.extend((entry[0], max(0.0, entry[1])) for entry in open_spans)
+    return out
+
+
+def main_thread_id(events: list):
+    """The thread that opened the first span (the event loop / CLI thread)."""
+    return min(events, key=lambda e: e["ts"])["tid"]
+
+
+def phase_times(events: list) -> dict:
+    """Self time in microseconds per span category on the main thread."""
+    main_tid = main_thread_id(events)
+    phases = {}
+    for e, own in self_times(events):
+        if e["tid"] == main_tid:
+            phases[e["cat"]] = phases.get(e["cat"], 0.0) + own
+    return phases
+
+
+def print_profile(path, top: int = 15):
+    """Print latency by phase (self time per category), by step and the slowest spans."""
+    from rich import print
+    from rich.table import Table
+
+    events = load_trace(path)
+    if not events:
+        print(f"[yellow]No spans in {path}[/yellow]")
+        return
+    wall = max(e["ts"] + e["dur"] for e in events) - min(e["ts"] for e in events)
+    main_tid = main_thread_id(events)
+
+    phases = phase_times(events)
+    table = Table(title=f"{path} — wall time {wall / 1000:.0f} ms")
+    for col in ("Phase", "Self time (ms)", "% of wall"):
+        table.add_column(col)
+    for cat, own in sorted(phases.items(), key=lambda kv: -kv[1]):
+        table.add_row(cat, f"{own / 1000:.1f}", f"{own / wall:.0%}" if wall else "-")
+    workers = sum(e["dur"] for e in events if e["tid"] != main_tid and e["cat"] != "step")
+    if workers:
+        table.add_row("[dim]off-loop workers[/dim]", f"[dim]{workers / 1000:.1f}[/dim]", "[dim]overlapped[/dim]")
+    print(table)
+
+    steps = sorted((e for e in events if e["cat"] == "step"), key=lambda e: e["ts"])
+    if steps:
+        table = Table(title="Steps")
+        for col in ("Step", "Target", "Duration (ms)", "Locate", "Capture"):
+            table.add_column(col)
+        for s in steps:
+            inner = [e for e in events if e["tid"] == s["tid"] and e is not s
+                     and s["ts"] <= e["ts"] and e["ts"] + e["dur"] <= s["ts"] + s["dur"]]
+            locate = sum(e["dur"] for e in inner if e["cat"] == "locate")
+            capture = sum(e["dur"] for e in inner if e["name"] == "capture_state")
+            table.add_row(s["name"], str(s["args"].get("target", ""))[:40], f"{s['dur'] / 1000:.1f}",
+                          f"{locate / 1000:.1f}", f"{capture / 1000:.1f}")
+        print(table)
+
+    table = Table(title=f"Slowest spans (top {top})")
+    for col in ("Span", "Phase", "Duration (ms)"):
+        table.add_column(col)
+    for e in sorted(events, key=lambda e: -e["dur"])[:top]:
+        table.add_row(e["name"], e["cat"], f"{e['dur'] / 1000:.1f}")
+    print(table)
+
+
+def resolve_trace_path(run: str) -> Path:
+    """`run` may be a run folder, a trace file, an app name (its latest run) or 'latest'."""
+    path = Path(run)
+    if path.is_file():
+        return path
+    if path.is_dir():
+        return path / TRACE_FILE
+    from utils.catalog import get_catalog
+    latest = get_catalog().latest_run(None if run == "latest" else run)
+    if latest is None:
+        raise FileNotFoundError(f"No run folder or catalogued app named '{run}'")
+    return Path(latest["run_dir"]) / TRACE_FILE